@@ -0,0 +1,58 @@
+"""Backend application package.
+
+    from api import create_app
+    app = create_app()
+
+config holds the environment settings, services the lazily built provider
+clients and caches, and meal_plan / detection / jobs / history / images /
+health / metrics the blueprints.
+"""
+import os
+import logging
+from typing import Optional, Dict
+
+from flask import Flask
+from flask_cors import CORS
+
+from api import config
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(overrides: Optional[Dict] = None) -> Flask:
+    """Build the Flask app; no provider client is created until first used."""
+    logging.basicConfig(level=logging.INFO)
+
+    app = Flask(__name__)
+    CORS(app, origins=config.CORS_ORIGINS, supports_credentials=True, methods=["GET", "POST", "DELETE", "OPTIONS"])
+    app.config['UPLOAD_FOLDER'] = config.UPLOAD_FOLDER
+    # Werkzeug rejects larger bodies with 413 before parsing the multipart form
+    app.config['MAX_CONTENT_LENGTH'] = config.DETECT_BATCH_MAX_BYTES + 64 * 1024
+    if overrides:
+        app.config.update(overrides)
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    from instrumentation import REGISTRY
+    REGISTRY.configure(config.METRICS_ENABLED, config.METRICS_DIR)
+
+    from api import meal_plan, detection, jobs, history, images, health
+    app.register_blueprint(meal_plan.bp)
+    app.register_blueprint(detection.bp)
+    app.register_blueprint(jobs.bp)
+    app.register_blueprint(history.bp)
+    app.register_blueprint(images.bp)
+    app.register_blueprint(health.bp)
+    if config.METRICS_ENABLED:
+        from api import metrics
+        app.register_blueprint(metrics.bp)
+
+    from rate_limit import RateLimited
+    from api.throttle import rate_limited_response
+    app.register_error_handler(RateLimited, rate_limited_response)
+
+    logger.info("API keys loaded: %s", {
+        "TOGETHER_API_KEY": bool(config.TOGETHER_API_KEY),
+        "GOOGLE_API_KEY": bool(config.API_KEY)
+    })
+    return app
@@ -0,0 +1,84 @@
+"""Caller identity from the Supabase session token.
+
+The frontend signs in with Supabase and sends its access token as
+`Authorization: Bearer <jwt>`. Tokens are HS256 JWTs signed with the
+project's JWT secret (SUPABASE_JWT_SECRET); the user id is the `sub` claim.
+Verification needs only hmac/hashlib, so no JWT library is required. Without
+a configured secret every token is rejected: per-user data fails closed.
+"""
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from flask import g, request, jsonify
+
+from api.config import SUPABASE_JWT_SECRET, SUPABASE_JWT_AUDIENCE, AUTH_LEEWAY
+
+logger = logging.getLogger(__name__)
+
+
+class AuthError(ValueError):
+    pass
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_token(token: str, secret: Optional[str], audience: Optional[str] = None, leeway: float = 0) -> Dict:
+    """Check an HS256 JWT's signature, expiry and audience; returns its claims or raises AuthError."""
+    if not secret:
+        raise AuthError("Authentication is not configured")
+    try:
+        header_b64, claims_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        claims = json.loads(_b64decode(claims_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError:
+        # Wrong segment count, bad base64 or bad JSON
+        raise AuthError("Malformed token")
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        raise AuthError("Unsupported token algorithm")
+    expected = hmac.new(secret.encode(), f"{header_b64}.{claims_b64}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise AuthError("Invalid token signature")
+    if not isinstance(claims, dict):
+        raise AuthError("Malformed token")
+
+    now = time.time()
+    expires = claims.get("exp")
+    if not isinstance(expires, (int, float)) or expires + leeway < now:
+        raise AuthError("Token expired")
+    not_before = claims.get("nbf")
+    if isinstance(not_before, (int, float)) and not_before - leeway > now:
+        raise AuthError("Token not yet valid")
+    if audience:
+        audiences = claims.get("aud")
+        if audience not in (audiences if isinstance(audiences, list) else [audiences]):
+            raise AuthError("Token audience mismatch")
+    if not isinstance(claims.get("sub"), str) or not claims["sub"]:
+        raise AuthError("Token has no subject")
+    return claims
+
+
+def current_user_id() -> Optional[str]:
+    """The verified `sub` of this request's bearer token, or None (the reason is kept for user_required)."""
+    if "auth_user_id" not in g:
+        g.auth_user_id, g.auth_error = None, "Authorization: Bearer token required"
+        header = request.headers.get("Authorization", "")
+        scheme, _, token = header.partition(" ")
+        if scheme.lower() == "bearer" and token.strip():
+            try:
+                claims = verify_token(token.strip(), SUPABASE_JWT_SECRET, SUPABASE_JWT_AUDIENCE, AUTH_LEEWAY)
+                g.auth_user_id = claims["sub"]
+            except AuthError as e:
+                g.auth_error = str(e)
+    return g.auth_user_id
+
+
+def user_required():
+    return jsonify({"error": g.get("auth_error") or "Authorization: Bearer token required"}), 401
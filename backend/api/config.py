@@ -0,0 +1,190 @@
+"""Settings read from the environment (and .env) once at import.
+
+Only os and dotenv are imported here so that loading the config stays cheap;
+nothing is created on disk and no clients are built until they are used.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration for Together.ai (OpenAI-compatible API)
+TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
+TOGETHER_API_BASE = os.getenv("TOGETHER_API_BASE", "https://api.together.xyz/v1")
+
+# Configuration for Google Gemini
+API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
+
+UPLOAD_FOLDER = 'uploads'
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", 15 * 1024 * 1024))
+DETECT_BATCH_MAX_IMAGES = int(os.getenv("DETECT_BATCH_MAX_IMAGES", 20))
+DETECT_BATCH_MAX_BYTES = int(os.getenv("DETECT_BATCH_MAX_BYTES", 60 * 1024 * 1024))
+# Images per multi-image Gemini call, and how many such calls run at once
+DETECT_BATCH_GROUP_SIZE = int(os.getenv("DETECT_BATCH_GROUP_SIZE", 4))
+DETECT_BATCH_CONCURRENCY = int(os.getenv("DETECT_BATCH_CONCURRENCY", 4))
+
+# Together.ai models for meal plans with USD per million tokens and size
+MODEL_CATALOG = {
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free": {"cost": 0.0, "size": "large"},
+    "mistralai/Mixtral-8x7B-Instruct-v0.1": {"cost": 0.6, "size": "large"},
+    "meta-llama/Llama-3.3-70B-Instruct-Turbo": {"cost": 0.88, "size": "large"},
+    "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": {"cost": 0.18, "size": "small"}
+}
+# "model[=cost[:size]],..." in fallback order; catalog entries fill in cost and size
+MEAL_PLAN_MODELS = os.getenv("MEAL_PLAN_MODELS", ",".join(MODEL_CATALOG))
+VALID_MODELS = [entry.split("=")[0].strip() for entry in MEAL_PLAN_MODELS.split(",") if entry.strip()]
+
+# Pooled keep-alive clients shared by all requests in a process
+UPSTREAM_OPTIONS = {
+    "pool_size": int(os.getenv("UPSTREAM_POOL_SIZE", 20)),
+    "connect_timeout": float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 5)),
+    "read_timeout": float(os.getenv("UPSTREAM_READ_TIMEOUT", 60)),
+    "http2": os.getenv("UPSTREAM_HTTP2", "1") == "1"
+}
+
+# Bounded concurrency per upstream so one slow provider cannot absorb every worker
+TOGETHER_MAX_CONCURRENT = int(os.getenv("TOGETHER_MAX_CONCURRENT", 100))
+GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", 100))
+UPSTREAM_ACQUIRE_TIMEOUT = float(os.getenv("UPSTREAM_ACQUIRE_TIMEOUT", 30))
+
+# Meal plan cache: several variants per bucketed target/diet/region/goal key
+PLAN_CACHE_BACKEND = os.getenv("PLAN_CACHE_BACKEND", "memory")
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(UPLOAD_FOLDER, "meal_plans.sqlite3"))
+PLAN_CACHE_MAX_KEYS = int(os.getenv("PLAN_CACHE_MAX_KEYS", 2048))
+PLAN_CACHE_VARIANTS = int(os.getenv("PLAN_CACHE_VARIANTS", 3))
+PLAN_CACHE_FRESH_TTL = float(os.getenv("PLAN_CACHE_FRESH_TTL", 7 * 86400))
+PLAN_CACHE_STALE_TTL = float(os.getenv("PLAN_CACHE_STALE_TTL", 30 * 86400))
+
+# Images are downscaled and re-encoded before being sent to Gemini
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", 1024))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")
+
+FOOD_DB_MIN_SIMILARITY = float(os.getenv("FOOD_DB_MIN_SIMILARITY", 0.55))
+
+# Store the static prefix of each prompt template as Gemini cached content
+# (renewed every GEMINI_CONTEXT_CACHE_TTL seconds). Gemini only caches prompts
+# above a model-specific minimum size; smaller prefixes are sent inline as
+# the system instruction either way.
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+GEMINI_CONTEXT_CACHE_TTL = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 3600))
+
+# Ask both providers for JSON-only output constrained to the response schemas
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"
+
+# Detection result cache (memory LRU + optional JSON files under UPLOAD_FOLDER)
+DETECT_CACHE_MAX_ENTRIES = int(os.getenv("DETECT_CACHE_MAX_ENTRIES", 512))
+DETECT_CACHE_TTL = float(os.getenv("DETECT_CACHE_TTL", 86400))
+DETECT_CACHE_DISK = os.getenv("DETECT_CACHE_DISK", "1") == "1"
+DETECT_CACHE_MAX_DISK_BYTES = int(os.getenv("DETECT_CACHE_MAX_DISK_BYTES", 64 * 1024 * 1024))
+
+# Perceptual-hash index for re-photographed / recompressed images (-1 disables)
+NEAR_DUP_THRESHOLD = int(os.getenv("NEAR_DUP_THRESHOLD", 6))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", 5000))
+
+# Token buckets per user and per upstream model; 0 disables a limit. The
+# sqlite backend shares buckets between all workers on the host.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(UPLOAD_FOLDER, "rate_limits.sqlite3"))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", 10))
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", 5))
+TOGETHER_RATE_PER_MINUTE = float(os.getenv("TOGETHER_RATE_PER_MINUTE", 60))
+TOGETHER_RATE_BURST = float(os.getenv("TOGETHER_RATE_BURST", 10))
+GEMINI_RATE_PER_MINUTE = float(os.getenv("GEMINI_RATE_PER_MINUTE", 60))
+GEMINI_RATE_BURST = float(os.getenv("GEMINI_RATE_BURST", 10))
+# Pause for an upstream that answers 429 without a Retry-After header
+UPSTREAM_THROTTLE_BACKOFF = float(os.getenv("UPSTREAM_THROTTLE_BACKOFF", 10))
+
+# Supabase session tokens (Authorization: Bearer) identify the user for the
+# meal history and the per-user rate limit; see api/auth.py. The secret is the
+# project's JWT secret; without it no token verifies.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+# Clock skew tolerated on exp/nbf, in seconds
+AUTH_LEEWAY = float(os.getenv("AUTH_LEEWAY", 30))
+
+# Resilience around each upstream call: an overall deadline per call, bounded
+# retries with decorrelated jitter for timeouts/5xx, optional hedging after
+# the recent p95 latency, and a circuit breaker that fails fast with 503
+TOGETHER_DEADLINE = float(os.getenv("TOGETHER_DEADLINE", 45))
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", 30))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 3))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.2))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 5))
+# Hedging doubles the provider calls for slow requests, so it is opt-in
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0") == "1"
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 2))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+
+# Meal plan model routing: ROUTING_POLICY is cost, latency or order. A model
+# is skipped while more than ROUTING_MAX_ERROR_RATE of its calls in the last
+# ROUTING_WINDOW seconds failed or its recent p95 exceeds the latency budget.
+# Each model in the chain gets at most ROUTING_MODEL_DEADLINE seconds of the
+# overall TOGETHER_DEADLINE.
+ROUTING_POLICY = os.getenv("ROUTING_POLICY", "cost")
+ROUTING_LATENCY_BUDGET = float(os.getenv("ROUTING_LATENCY_BUDGET", 20))
+ROUTING_MAX_ERROR_RATE = float(os.getenv("ROUTING_MAX_ERROR_RATE", 0.5))
+ROUTING_MIN_SAMPLES = int(os.getenv("ROUTING_MIN_SAMPLES", 5))
+ROUTING_WINDOW = float(os.getenv("ROUTING_WINDOW", 300))
+ROUTING_MAX_MODELS = int(os.getenv("ROUTING_MAX_MODELS", 3))
+ROUTING_MODEL_DEADLINE = float(os.getenv("ROUTING_MODEL_DEADLINE", 20))
+# Send requests without health conditions to small models first
+ROUTING_SMALL_FOR_SIMPLE = os.getenv("ROUTING_SMALL_FOR_SIMPLE", "0") == "1"
+
+# Asynchronous detection jobs (POST /api/detect-food?async=1), run by
+# detection_worker.py processes sharing this SQLite queue
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(UPLOAD_FOLDER, "jobs.sqlite3"))
+JOB_BLOB_DIR = os.getenv("JOB_BLOB_DIR", os.path.join(UPLOAD_FOLDER, "jobs"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# A job whose worker has not finished within the lease is handed to another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", 1000))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 3600))
+# Longest a GET /api/jobs/<id>?wait=N long-poll is held open
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", 30))
+
+# Server-side meal history with per-user daily/weekly nutrient rollups
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(UPLOAD_FOLDER, "meal_history.sqlite3"))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 20))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 100))
+
+# Resized copies of detection uploads for the history pages: "name=longest
+# edge" per rendition, encoded as JPEG plus WebP/AVIF where Pillow supports
+# them, by RENDITION_WORKERS background threads per process
+RENDITIONS_ENABLED = os.getenv("RENDITIONS_ENABLED", "1") == "1"
+RENDITION_DIR = os.getenv("RENDITION_DIR", os.path.join(UPLOAD_FOLDER, "renditions"))
+RENDITION_SIZES = {
+    name.strip(): int(edge)
+    for name, edge in (entry.split("=") for entry in os.getenv("RENDITION_SIZES", "thumb=240,detail=1024").split(","))
+}
+RENDITION_QUALITY = int(os.getenv("RENDITION_QUALITY", 80))
+RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", 2))
+RENDITION_MAX_PENDING = int(os.getenv("RENDITION_MAX_PENDING", 64))
+# How long a rendition request waits for a build still running in the same process
+RENDITION_WAIT = float(os.getenv("RENDITION_WAIT", 2))
+# Renditions are only built for saved meals and removed with their last meal;
+# a periodic cleanup also drops orphans and the oldest images beyond the cap
+RENDITION_MAX_BYTES = int(os.getenv("RENDITION_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+RENDITION_CLEANUP_INTERVAL = float(os.getenv("RENDITION_CLEANUP_INTERVAL", 3600))
+
+# Record/replay of Together.ai and Gemini calls (see cassettes.py): "capture"
+# saves every response under a hash of the normalized request, "replay"
+# serves them from disk without any network call. A replay miss is an
+# upstream 404, or with UPSTREAM_CASSETTE_MISS=any another recording of the
+# same endpoint. Recorded latencies are slept for, times the scale (0 = none).
+UPSTREAM_CASSETTE_MODE = os.getenv("UPSTREAM_CASSETTE_MODE", "off")
+UPSTREAM_CASSETTE_DIR = os.getenv("UPSTREAM_CASSETTE_DIR", os.path.join(UPLOAD_FOLDER, "cassettes"))
+UPSTREAM_CASSETTE_MISS = os.getenv("UPSTREAM_CASSETTE_MISS", "error")
+UPSTREAM_CASSETTE_LATENCY_SCALE = float(os.getenv("UPSTREAM_CASSETTE_LATENCY_SCALE", 0))
+
+# Prometheus metrics on /metrics. Set METRICS_DIR when running several
+# workers so each one writes its values there and any worker can serve the
+# merged totals (the directory is cleared when gunicorn starts).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR", "")
@@ -0,0 +1,527 @@
+"""Food detection endpoints (single image and multi-image batches)."""
+import io
+import json
+import logging
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, request, jsonify
+from PIL import Image
+
+from api import services
+from api.config import (
+    ALLOWED_EXTENSIONS, MAX_IMAGE_BYTES, IMAGE_MAX_EDGE, IMAGE_QUALITY, IMAGE_FORMAT,
+    STRUCTURED_OUTPUT, DETECT_BATCH_MAX_IMAGES, DETECT_BATCH_GROUP_SIZE, DETECT_BATCH_CONCURRENCY, GEMINI_MODEL,
+    RENDITIONS_ENABLED, RENDITION_SIZES
+)
+from api.auth import current_user_id, user_required
+from api.images import image_urls
+from api.metrics import error_cause
+from api.throttle import limit_user, upstream_call, rate_limited_response
+from image_preprocess import preprocess_image
+from instrumentation import timed, CACHE_LOOKUPS, ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_TOKENS
+from job_queue import QueueFull
+from meal_history import parse_consumed_at
+from near_duplicate import dhash
+from prompt_templates import DETECTION_PROMPT, DETECTION_BATCH_PROMPT
+from rate_limit import RateLimited
+from response_decoding import (
+    decode_json, gemini_schema, DETECTION_SPEC, DETECTION_BATCH_SPEC,
+    validate_detection, validate_detection_batch
+)
+from result_cache import image_digest, make_cache_key, normalize_description
+from upload_ingest import ingest_upload, sniff_image_header, UploadTooLarge
+from upstream_limits import UpstreamBusy
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("detection", __name__)
+
+DETECTION_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": gemini_schema(DETECTION_SPEC)
+} if STRUCTURED_OUTPUT else None
+DETECTION_BATCH_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": gemini_schema(DETECTION_BATCH_SPEC)
+} if STRUCTURED_OUTPUT else None
+
+# ==============================================
+# Helper Functions for Food Detection
+# ==============================================
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def validate_image(file_stream):
+    """Validate and convert file stream (bytes or file object) to PIL Image."""
+    try:
+        if isinstance(file_stream, (bytes, bytearray, memoryview)):
+            file_stream = io.BytesIO(file_stream)
+        image = Image.open(file_stream)
+        
+        # Basic image validation
+        if image.width > 5000 or image.height > 5000:
+            raise ValueError("Image dimensions too large")
+            
+        return image
+    except Exception as e:
+        logger.error(f"Image validation error: {str(e)}")
+        raise ValueError("Invalid image file")
+
+def detection_parts(image_blob, description: Optional[str] = None):
+    """Parts sent after the template's static prefix: the image, then the user's notes"""
+    parts = [image_blob]
+    if description:
+        parts.append(DETECTION_PROMPT.render(notes=description))
+    return parts
+
+class UploadError(ValueError):
+    """An uploaded image was rejected; carries the HTTP status to return"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def prepare_upload(file):
+    """Ingest, validate and preprocess one upload; returns (image, image_blob)"""
+    try:
+        with timed("detection", "upload_read"):
+            file_stream, file_size = ingest_upload(file, MAX_IMAGE_BYTES)
+    except UploadTooLarge as e:
+        raise UploadError(str(e), 413)
+
+    try:
+        with timed("detection", "validate_image"):
+            sniff_image_header(file_stream)
+            image = validate_image(file_stream)
+    except ValueError as e:
+        raise UploadError(str(e))
+
+    # Downscale and strip metadata before hashing and upload
+    try:
+        with timed("detection", "preprocess"):
+            return preprocess_image(
+                image, file_size,
+                max_edge=IMAGE_MAX_EDGE, quality=IMAGE_QUALITY, fmt=IMAGE_FORMAT
+            )
+    except Exception as e:
+        logger.error(f"Image preprocessing error: {str(e)}")
+        raise UploadError("Invalid image file")
+
+def detection_cache_keys(image, description):
+    """Pixel digest (the image id), exact cache key, perceptual hash and near-duplicate context"""
+    digest = image_digest(image)
+    return {
+        "image_id": digest,
+        "cache_key": make_cache_key(digest, description, DETECTION_PROMPT.key),
+        "phash": dhash(image),
+        "near_context": f"{DETECTION_PROMPT.key}:{normalize_description(description)}"
+    }
+
+def find_cached_detection(keys):
+    """Exact hit from the result cache, else a near-duplicate hit, else None"""
+    with timed("detection", "cache_lookup"):
+        cached = services.detection_cache().get(keys["cache_key"])
+        near = None
+        if cached is None:
+            near = services.near_duplicate_index().lookup(keys["phash"], keys["near_context"])
+
+    if cached is not None:
+        logger.info("Food detection cache hit")
+        CACHE_LOOKUPS.inc(cache="detection", result="exact")
+        return {**cached, "cache": "exact"}
+    if near is not None:
+        distance, near_result = near
+        logger.info(f"Food detection near-duplicate hit (distance {distance})")
+        CACHE_LOOKUPS.inc(cache="detection", result="near")
+        return {**near_result, "cache": "near"}
+    CACHE_LOOKUPS.inc(cache="detection", result="miss")
+    return None
+
+def queue_renditions(image, image_id):
+    """Build a saved meal's thumbnail and detail renditions off the request thread"""
+    if RENDITIONS_ENABLED:
+        services.rendition_store().submit(image_id, image)
+
+def image_fields(image_id):
+    """Rendition URLs for a response; the renditions may still be building"""
+    if not (RENDITIONS_ENABLED and image_id):
+        return {}
+    return {"image_id": image_id, "images": image_urls(image_id, RENDITION_SIZES)}
+
+def store_detection(keys, result):
+    services.detection_cache().set(keys["cache_key"], result)
+    services.near_duplicate_index().add(keys["phash"], keys["near_context"], result)
+
+def finalize_detection(result):
+    """Fill nutrients, totals and meal name for one schema-validated detection"""
+    # Nutrients come from the local table; the LLM only names and weighs items
+    services.food_db().compute(result["foods"])
+    result["total"] = {
+        "calories": round(sum(f.get("calories", 0) for f in result["foods"]), 1),
+        "protein_g": round(sum(f.get("protein_g", 0) for f in result["foods"]), 1),
+        "carbs_g": round(sum(f.get("carbs_g", 0) for f in result["foods"]), 1),
+        "fats_g": round(sum(f.get("fats_g", 0) for f in result["foods"]), 1)
+    }
+
+    # Add meal name if not provided
+    if "meal_name" not in result:
+        result["meal_name"] = " + ".join(f.get("name", "unknown") for f in result["foods"][:3])
+        if len(result["foods"]) > 3:
+            result["meal_name"] += " + more"
+    return result
+
+def build_batch_body(descriptions) -> str:
+    """Variable part of the batch prompt: the image count and any per-image notes."""
+    notes = [f'- Image {i + 1}: "{d}"' for i, d in enumerate(descriptions) if d]
+    return DETECTION_BATCH_PROMPT.render(
+        count=len(descriptions),
+        notes="\n\nUser notes per image:\n" + "\n".join(notes) if notes else ""
+    )
+
+def call_gemini(template, parts, generation_config):
+    """One rate-limited, concurrency-bounded Gemini call with deadline, retries and breaker"""
+    with upstream_call(services.gemini_rate_limiter(), GEMINI_MODEL), \
+            timed("detection", "gemini_call"), UPSTREAM_IN_FLIGHT.track(upstream="gemini"):
+        # The template prefix is sent as cached content when possible, else as the system instruction.
+        # Each attempt holds a limiter slot until it returns, even past the deadline
+        response = services.gemini_resilience().call(
+            lambda timeout: services.gemini_prefix_cache().generate(
+                template, parts, generation_config=generation_config, timeout=timeout
+            ),
+            limiter=services.gemini_limiter()
+        )
+    usage = response.payload.get("usageMetadata") or {}
+    UPSTREAM_TOKENS.inc(usage.get("promptTokenCount", 0), upstream="gemini", model=GEMINI_MODEL, kind="prompt")
+    UPSTREAM_TOKENS.inc(usage.get("cachedContentTokenCount", 0), upstream="gemini", model=GEMINI_MODEL,
+                        kind="cached_prompt")
+    UPSTREAM_TOKENS.inc(usage.get("candidatesTokenCount", 0), upstream="gemini", model=GEMINI_MODEL, kind="completion")
+    return response
+
+class DetectionParseError(ValueError):
+    """Gemini output could not be turned into a detection; keeps the raw text for debugging"""
+
+    def __init__(self, message, raw_response=None):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+def detect_pending(description, keys, image_blob):
+    """Gemini call, parse and cache store for one image that missed the caches"""
+    parts = detection_parts(image_blob, description)
+    logger.info("Calling Gemini API for food detection")
+    # Identical concurrent uploads share one call; each caller parses its own copy
+    response_text, _ = services.detection_flights().do(
+        keys["cache_key"],
+        lambda: call_gemini(DETECTION_PROMPT, parts, DETECTION_GENERATION_CONFIG).text
+    )
+    try:
+        with timed("detection", "parse"):
+            result = finalize_detection(decode_json(response_text, validate_detection))
+    except ValueError as e:
+        raise DetectionParseError(str(e), response_text)
+    store_detection(keys, result)
+    return result
+
+def enqueue_detection(description, keys, image_blob, history=None):
+    """Queue a cache miss for detection_worker.py; 202 with the job's status URL"""
+    try:
+        job_id = services.job_queue().enqueue(
+            "detect_food",
+            {"description": description, "keys": keys, "mime_type": image_blob["mime_type"], "history": history},
+            image_blob["data"],
+            owner=current_user_id()
+        )
+    except QueueFull as e:
+        ERRORS.inc(operation="detection", cause="queue_full")
+        logger.warning(f"Detection queue full: {str(e)}")
+        return jsonify({"error": "Food detection service busy"}), 503
+    status_url = f"/api/jobs/{job_id}"
+    response = jsonify({"job_id": job_id, "status": "queued", "status_url": status_url})
+    response.headers["Location"] = status_url
+    return response, 202
+
+def run_detection_job(job):
+    """Worker side of an async detection; returns the result stored on the job"""
+    payload = job["payload"]
+    if job["blob"] is None:
+        raise DetectionParseError("Queued image is missing")
+    # Another request (or an earlier attempt) may have filled the caches meanwhile
+    result = find_cached_detection(payload["keys"])
+    if result is None:
+        image_blob = {"mime_type": payload["mime_type"], "data": job["blob"]}
+        result = detect_pending(payload["description"], payload["keys"], image_blob)
+    image_id = payload["keys"].get("image_id")
+    return save_to_history(result, payload.get("history"), image_id, lambda: Image.open(io.BytesIO(job["blob"])))
+
+def history_options():
+    """How to save the result to the caller's meal history (form field save=1), or None"""
+    if request.form.get('save') != '1':
+        return None
+    consumed_at = request.form.get('consumed_at') or None
+    # Checked before any Gemini call so a bad timestamp cannot waste one
+    parse_consumed_at(consumed_at)
+    return {
+        "user_id": current_user_id(),
+        "meal_type": request.form.get('meal_type') or None,
+        "image_path": request.form.get('image_path') or None,
+        "consumed_at": consumed_at
+    }
+
+def save_to_history(result, options, image_id=None, load_image=None):
+    """Store a detection in the meal history; the response carries the new meal_id.
+
+    Renditions are only built for saved meals that show the upload itself, and
+    live as long as a meal refers to them (see api/history.py).
+    """
+    if options is None:
+        return result
+    # Without a path of its own the meal shows the upload's renditions
+    image_path = options["image_path"] or (image_id if RENDITIONS_ENABLED else None)
+    with timed("detection", "history_save"):
+        meal = services.meal_history().add_meal(options["user_id"], {
+            "meal_name": result.get("meal_name"),
+            "foods": result.get("foods"),
+            "total": result.get("total"),
+            "meal_type": options["meal_type"],
+            "consumed_at": options["consumed_at"],
+            "image_path": image_path
+        })
+    if image_id and image_path == image_id and load_image is not None:
+        queue_renditions(load_image(), image_id)
+        return {**result, "meal_id": meal["id"], **image_fields(image_id)}
+    return {**result, "meal_id": meal["id"]}
+
+def rate_limited_error(e):
+    return {"error": "Too many requests", "retry_after": int(e.retry_after_header)}
+
+def batch_error(e):
+    """Per-image error entry of a batch response"""
+    if isinstance(e, ValueError):
+        return {"error": f"Failed to parse detection results: {str(e)}"}
+    if isinstance(e, RateLimited):
+        return rate_limited_error(e)
+    if isinstance(e, UpstreamBusy):
+        return {"error": "Food detection service busy"}
+    logger.error(f"Food detection error: {str(e)}")
+    return {"error": "Food detection service unavailable"}
+
+def detect_group(group):
+    """Detect a group of pending images with one multi-image call.
+
+    Returns [(index, result_or_error)]. The call holds each image's
+    detection_flights key, so identical uploads arriving meanwhile wait for
+    it, and an image already in flight elsewhere joins that call instead.
+    If the combined response cannot be matched up with the images, each
+    image is retried on its own.
+    """
+    flights = services.detection_flights()
+    led = flights.lead(item["keys"]["cache_key"] for item in group)
+    own = [item for item in group if item["keys"]["cache_key"] in led]
+    # Flight results are single-image detection JSON; every caller parses its own copy
+    texts, errors = {}, {}
+    try:
+        if len(own) > 1:
+            try:
+                parts = [build_batch_body([item["description"] for item in own])]
+                parts.extend(item["blob"] for item in own)
+                logger.info(f"Calling Gemini API for {len(own)} images")
+                response = call_gemini(DETECTION_BATCH_PROMPT, parts, DETECTION_BATCH_GENERATION_CONFIG)
+                parsed = decode_json(response.text, validate_detection_batch)
+                if len(parsed) != len(own):
+                    raise ValueError(f"Expected {len(own)} results, got {len(parsed)}")
+                texts = {item["keys"]["cache_key"]: json.dumps(entry) for item, entry in zip(own, parsed)}
+                for key, text in texts.items():
+                    flights.finish(key, result=text)
+            except ValueError as e:
+                logger.warning(f"Batch detection response unusable, retrying images one by one: {str(e)}")
+            except Exception as e:
+                # Rate limits, a busy upstream or an outage apply to every image in the call
+                for item in own:
+                    errors[item["keys"]["cache_key"]] = e
+                    flights.finish(item["keys"]["cache_key"], error=e)
+
+        for item in own:
+            key = item["keys"]["cache_key"]
+            if key in texts or key in errors:
+                continue
+            try:
+                texts[key] = call_gemini(DETECTION_PROMPT, detection_parts(item["blob"], item["description"]),
+                                         DETECTION_GENERATION_CONFIG).text
+                flights.finish(key, result=texts[key])
+            except Exception as e:
+                errors[key] = e
+                flights.finish(key, error=e)
+    finally:
+        # Never leave waiters hanging on a key this call claimed
+        for key in led - texts.keys() - errors.keys():
+            flights.finish(key, error=RuntimeError("Batch detection was interrupted"))
+
+    results = []
+    for item in group:
+        key = item["keys"]["cache_key"]
+        try:
+            if key in led:
+                if key in errors:
+                    raise errors[key]
+                result = finalize_detection(decode_json(texts[key], validate_detection))
+                store_detection(item["keys"], result)
+            else:
+                # Another request is already detecting this image; share its call
+                result = detect_pending(item["description"], item["keys"], item["blob"])
+        except Exception as e:
+            result = batch_error(e)
+        results.append((item["index"], result))
+    return results
+
+# ==============================================
+# API Endpoints
+# ==============================================
+
+@bp.route('/api/detect-food', methods=['POST'])
+def detect_food():
+    """Endpoint for food detection; ?async=1 queues cache misses and returns a job id.
+
+    With form field save=1 (and optional meal_type, image_path, consumed_at)
+    the result is also saved to the caller's meal history.
+    """
+    try:
+        # The app-wide body limit is sized for batches; single uploads stay tighter
+        if request.content_length and request.content_length > MAX_IMAGE_BYTES + 64 * 1024:
+            return jsonify({"error": "Image file too large"}), 413
+
+        # Check if file was uploaded
+        if 'image' not in request.files:
+            return jsonify({"error": "No image file provided"}), 400
+            
+        file = request.files['image']
+        description = request.form.get('description', '')
+        
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        try:
+            history = history_options()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if history is not None and not history["user_id"]:
+            return user_required()
+            
+        if file and allowed_file(file.filename):
+            # Ingest, validate and downscale without copying the upload
+            try:
+                image, image_blob = prepare_upload(file)
+            except UploadError as e:
+                ERRORS.inc(operation="detection", cause="invalid_upload")
+                return jsonify({"error": str(e)}), e.status_code
+                
+            # Serve repeated uploads (exact or near-duplicate) from the caches
+            keys = detection_cache_keys(image, description)
+            cached = find_cached_detection(keys)
+            if cached is not None:
+                return jsonify(save_to_history(cached, history, keys["image_id"], lambda: image))
+
+            limit_user()
+            if request.args.get('async') == '1':
+                return enqueue_detection(description, keys, image_blob, history)
+
+            try:
+                result = detect_pending(description, keys, image_blob)
+                return jsonify(save_to_history(result, history, keys["image_id"], lambda: image))
+            except DetectionParseError as e:
+                ERRORS.inc(operation="detection", cause="parse_error")
+                logger.error(f"Failed to parse Gemini response: {str(e)}")
+                logger.error(f"Response content: {e.raw_response}")
+                return jsonify({
+                    "error": "Failed to parse detection results",
+                    "details": str(e),
+                    "raw_response": e.raw_response
+                }), 500
+
+        return jsonify({"error": "Invalid file type"}), 400
+        
+    except RateLimited as e:
+        ERRORS.inc(operation="detection", cause="rate_limited")
+        return rate_limited_response(e)
+
+    except UpstreamBusy as e:
+        ERRORS.inc(operation="detection", cause=error_cause(e))
+        logger.warning(str(e))
+        return jsonify({"error": "Food detection service busy"}), 503
+
+    except Exception as e:
+        ERRORS.inc(operation="detection", cause=error_cause(e))
+        logger.error(f"Food detection error: {str(e)}")
+        return jsonify({"error": "Food detection service unavailable"}), 500
+
+@bp.route('/api/detect-food/batch', methods=['POST'])
+def detect_food_batch():
+    """Detect food in several images, packing them into multi-image Gemini calls."""
+    try:
+        files = request.files.getlist('images')
+        descriptions = request.form.getlist('descriptions')
+        if not files:
+            return jsonify({"error": "No image files provided"}), 400
+        if len(files) > DETECT_BATCH_MAX_IMAGES:
+            return jsonify({"error": f"At most {DETECT_BATCH_MAX_IMAGES} images per batch"}), 400
+
+        results = [None] * len(files)
+        pending = {}
+        duplicates = {}
+        for index, file in enumerate(files):
+            description = descriptions[index] if index < len(descriptions) else ''
+            if not file.filename or not allowed_file(file.filename):
+                results[index] = {"error": "Invalid file type"}
+                continue
+            try:
+                image, image_blob = prepare_upload(file)
+            except UploadError as e:
+                results[index] = {"error": str(e)}
+                continue
+
+            keys = detection_cache_keys(image, description)
+            cached = find_cached_detection(keys)
+            if cached is not None:
+                results[index] = cached
+            elif keys["cache_key"] in pending:
+                # The same image and description twice in one batch is detected once
+                duplicates[index] = pending[keys["cache_key"]]["index"]
+            else:
+                pending[keys["cache_key"]] = {"index": index, "blob": image_blob, "description": description,
+                                              "keys": keys}
+
+        pending = list(pending.values())
+        groups = [pending[i:i + DETECT_BATCH_GROUP_SIZE] for i in range(0, len(pending), DETECT_BATCH_GROUP_SIZE)]
+        if groups:
+            # One token per upstream call this batch will make
+            limit_user(cost=len(groups))
+            with ThreadPoolExecutor(max_workers=min(DETECT_BATCH_CONCURRENCY, len(groups))) as executor:
+                for group_results in executor.map(detect_group, groups):
+                    for index, result in group_results:
+                        results[index] = result
+        for index, first in duplicates.items():
+            results[index] = results[first]
+
+        return jsonify({
+            "results": [{"index": i, **r} for i, r in enumerate(results)],
+            "error_count": sum(1 for r in results if "error" in r)
+        })
+
+    except RateLimited as e:
+        ERRORS.inc(operation="detection_batch", cause="rate_limited")
+        return rate_limited_response(e)
+
+    except UpstreamBusy as e:
+        ERRORS.inc(operation="detection_batch", cause=error_cause(e))
+        logger.warning(str(e))
+        return jsonify({"error": "Food detection service busy"}), 503
+
+    except Exception as e:
+        ERRORS.inc(operation="detection_batch", cause=error_cause(e))
+        logger.error(f"Batch food detection error: {str(e)}")
+        return jsonify({"error": "Food detection service unavailable"}), 500
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": "Image file too large"}), 413
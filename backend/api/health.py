@@ -0,0 +1,61 @@
+"""Health endpoint; reports only services this process has already built."""
+from flask import Blueprint, jsonify
+
+from api import services
+from api.config import TOGETHER_API_KEY, API_KEY, VALID_MODELS, STRUCTURED_OUTPUT, UPSTREAM_CASSETTE_MODE, \
+    SUPABASE_JWT_SECRET
+from prompt_templates import TEMPLATES
+
+bp = Blueprint("health", __name__)
+
+
+def service_info(service):
+    # Reporting must not construct a client or load the food table
+    return service().info() if service.loaded else {"initialized": False}
+
+
+@bp.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        "status": "healthy",
+        "services": {
+            "openai_configured": bool(TOGETHER_API_KEY),
+            "gemini_configured": bool(API_KEY),
+            "auth_configured": bool(SUPABASE_JWT_SECRET),
+            "valid_models": VALID_MODELS,
+            "structured_output": STRUCTURED_OUTPUT,
+            "upstream_cassette_mode": UPSTREAM_CASSETTE_MODE,
+            "prompt_templates": {name: template.key for name, template in TEMPLATES.items()}
+        },
+        "detection_cache": service_info(services.detection_cache),
+        "near_duplicate_index": service_info(services.near_duplicate_index),
+        "food_db": service_info(services.food_db),
+        "upstreams": {
+            "together": service_info(services.together_limiter),
+            "gemini": service_info(services.gemini_limiter)
+        },
+        "meal_plan_cache": service_info(services.meal_plan_cache),
+        "upstream_clients": {
+            "together": service_info(services.together_client),
+            "gemini": service_info(services.gemini_client)
+        },
+        "gemini_prefix_cache": service_info(services.gemini_prefix_cache),
+        "upstream_cassette": service_info(services.upstream_cassette) if UPSTREAM_CASSETTE_MODE != "off" else {},
+        "rate_limits": {
+            "user": service_info(services.user_rate_limiter),
+            "together": service_info(services.together_rate_limiter),
+            "gemini": service_info(services.gemini_rate_limiter)
+        },
+        "resilience": {
+            "together": service_info(services.together_resilience),
+            "gemini": service_info(services.gemini_resilience)
+        },
+        "model_routing": service_info(services.meal_plan_router),
+        "job_queue": service_info(services.job_queue),
+        "meal_history": service_info(services.meal_history),
+        "renditions": service_info(services.rendition_store),
+        "coalescing": {
+            "meal_plan": service_info(services.meal_plan_flights),
+            "detection": service_info(services.detection_flights)
+        }
+    })
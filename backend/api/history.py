@@ -0,0 +1,102 @@
+"""Per-user meal history: saved meals, keyset-paginated listing and nutrient rollups."""
+import logging
+from datetime import date
+
+from flask import Blueprint, request, jsonify
+
+from api import services
+from api.auth import current_user_id, user_required
+from api.config import HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, RENDITIONS_ENABLED, RENDITION_SIZES
+from api.images import image_urls
+from meal_history import MealNotFound
+from renditions import IMAGE_ID_RE
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("history", __name__)
+
+
+def with_images(meal):
+    """Add rendition URLs to a meal whose image_path is an uploaded image's id."""
+    if meal["image_path"] and IMAGE_ID_RE.match(meal["image_path"]):
+        meal["images"] = image_urls(meal["image_path"], RENDITION_SIZES)
+    return meal
+
+
+@bp.route('/api/history', methods=['GET'])
+def list_history():
+    """Newest meals first with their foods; follow next_cursor for older pages."""
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        meals, next_cursor = services.meal_history().list_meals(
+            user_id, limit, cursor=request.args.get('cursor'), meal_type=request.args.get('meal_type')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"meals": [with_images(meal) for meal in meals], "next_cursor": next_cursor})
+
+
+@bp.route('/api/history', methods=['POST'])
+def save_meal():
+    """Save a meal (the fields of a detection result plus meal_type, image_path, consumed_at)."""
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        meal = services.meal_history().add_meal(user_id, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(with_images(meal)), 201
+
+
+@bp.route('/api/history/<int:meal_id>', methods=['GET'])
+def get_meal(meal_id):
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    try:
+        return jsonify(with_images(services.meal_history().get_meal(user_id, meal_id)))
+    except MealNotFound:
+        return jsonify({"error": "Meal not found"}), 404
+
+
+@bp.route('/api/history/<int:meal_id>', methods=['DELETE'])
+def delete_meal(meal_id):
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    try:
+        image_path = services.meal_history().delete_meal(user_id, meal_id)
+    except MealNotFound:
+        return jsonify({"error": "Meal not found"}), 404
+    # Renditions live as long as some meal shows them
+    if (RENDITIONS_ENABLED and image_path and IMAGE_ID_RE.match(image_path)
+            and not services.meal_history().image_in_use(image_path)):
+        services.rendition_store().remove(image_path)
+    return "", 204
+
+
+@bp.route('/api/history/rollups', methods=['GET'])
+def history_rollups():
+    """?period=day|week&from=YYYY-MM-DD&to=YYYY-MM-DD; one row per period with meals."""
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    period = request.args.get('period', 'day')
+    start, end = request.args.get('from'), request.args.get('to')
+    try:
+        for value in filter(None, (start, end)):
+            date.fromisoformat(value)
+    except ValueError:
+        return jsonify({"error": "from and to must be YYYY-MM-DD dates"}), 400
+    try:
+        rollups = services.meal_history().rollups(user_id, period, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"period": period, "rollups": rollups})
@@ -0,0 +1,122 @@
+"""Meal photo renditions (list thumbnail, detail size) of saved meals.
+
+Like /api/history these need the caller's Supabase token: an image is only
+served to users with a meal showing it. Rendition files are named by the
+hash of their bytes, so their URLs cannot be guessed without the image.
+"""
+from flask import Blueprint, request, jsonify, send_file
+
+from api import services
+from api.auth import current_user_id, user_required
+from api.config import RENDITION_WAIT
+from renditions import MIME_TYPES, FORMAT_PREFERENCE, FILE_NAME_RE
+
+bp = Blueprint("images", __name__)
+
+# Content-addressed files never change (cached privately: the responses need auth)
+IMMUTABLE_MAX_AGE = 365 * 86400
+# The negotiated URL stays the same if renditions are ever rebuilt
+NEGOTIATED_MAX_AGE = 86400
+
+
+def image_urls(image_id, renditions):
+    return {name: f"/api/images/{image_id}/{name}" for name in renditions}
+
+
+def pick_format(formats):
+    """Best format the client accepts (?format= wins over the Accept header)."""
+    wanted = request.args.get('format')
+    if wanted:
+        return wanted if wanted in formats else None
+    # Browsers list the modern formats they decode explicitly; */* only promises JPEG
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    for fmt in FORMAT_PREFERENCE:
+        if fmt in formats and (fmt == "jpg" or MIME_TYPES[fmt] in accepted):
+            return fmt
+    return None
+
+
+def send_rendition(file_name, max_age, immutable=False):
+    store = services.rendition_store()
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(
+        store.file_path(file_name), mimetype=MIME_TYPES[file_name.rsplit(".", 1)[1]],
+        conditional=True, etag=file_name.split(".")[0], max_age=max_age
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+@bp.route('/api/images/<image_id>', methods=['GET'])
+def get_image(image_id):
+    """Sizes and per-format file URLs of an image's renditions."""
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    if not services.meal_history().user_has_image(user_id, image_id):
+        return not_found()
+    manifest = services.rendition_store().manifest(image_id, wait=RENDITION_WAIT)
+    if manifest is None:
+        return not_ready()
+    return jsonify({
+        "image_id": image_id,
+        "renditions": {
+            name: {
+                "url": f"/api/images/{image_id}/{name}",
+                "width": rendition["width"],
+                "height": rendition["height"],
+                "files": {fmt: {"url": f"/api/images/files/{variant['file']}", "bytes": variant["bytes"]}
+                          for fmt, variant in rendition["formats"].items()}
+            }
+            for name, rendition in manifest.items()
+        }
+    })
+
+
+@bp.route('/api/images/<image_id>/<rendition>', methods=['GET'])
+def get_rendition(image_id, rendition):
+    """One rendition in the best format the client accepts."""
+    user_id = current_user_id()
+    if not user_id:
+        return user_required()
+    if not services.meal_history().user_has_image(user_id, image_id):
+        return not_found()
+    manifest = services.rendition_store().manifest(image_id, wait=RENDITION_WAIT)
+    if manifest is None:
+        return not_ready()
+    if rendition not in manifest:
+        return jsonify({"error": f"Unknown rendition {rendition}", "renditions": list(manifest)}), 404
+    formats = manifest[rendition]["formats"]
+    fmt = pick_format(formats)
+    if fmt is None:
+        return jsonify({"error": "No acceptable format", "formats": list(formats)}), 406
+    response = send_rendition(formats[fmt]["file"], NEGOTIATED_MAX_AGE)
+    response.vary.add("Accept")
+    return response
+
+
+@bp.route('/api/images/files/<name>', methods=['GET'])
+def get_file(name):
+    """A rendition file by its content hash; cacheable forever."""
+    if not current_user_id():
+        return user_required()
+    if not FILE_NAME_RE.match(name):
+        return not_found()
+    try:
+        return send_rendition(name, IMMUTABLE_MAX_AGE, immutable=True)
+    except FileNotFoundError:
+        return not_found()
+
+
+def not_found():
+    return jsonify({"error": "Image not found"}), 404
+
+
+def not_ready():
+    # Unknown ids and images still being processed by another worker look the same
+    response = jsonify({"error": "Image not found"})
+    response.headers["Retry-After"] = "1"
+    return response, 404
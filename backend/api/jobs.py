@@ -0,0 +1,43 @@
+"""Status of asynchronous jobs queued by the detection endpoint."""
+import math
+
+from flask import Blueprint, request, jsonify
+
+from api import services
+from api.auth import current_user_id, user_required
+from api.config import JOB_MAX_WAIT
+
+bp = Blueprint("jobs", __name__)
+
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and result; ?wait=N long-polls up to N seconds for it to finish.
+
+    A job queued by a signed-in user (its result may carry a meal_id) is only
+    visible to that user, like /api/history; anonymous jobs to anyone with the id.
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    wait = min(max(wait, 0.0), JOB_MAX_WAIT)
+
+    queue = services.job_queue()
+    job = queue.get(job_id)
+    if job is not None and job["owner"] is not None and job["owner"] != current_user_id():
+        if not current_user_id():
+            return user_required()
+        job = None
+    if job is not None and wait and job["status"] not in ("done", "failed"):
+        job = queue.wait(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    del job["owner"]
+    response = jsonify(job)
+    if job["status"] not in ("done", "failed"):
+        # Hint for clients that poll instead of long-polling
+        response.headers["Retry-After"] = "1"
+    return response
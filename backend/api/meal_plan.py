@@ -0,0 +1,398 @@
+"""Meal plan and nutrition requirement endpoints."""
+import json
+import time
+import logging
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+
+from api import services
+from api.metrics import error_cause
+from api.config import STRUCTURED_OUTPUT, TOGETHER_DEADLINE, ROUTING_MODEL_DEADLINE
+from api.throttle import limit_user, upstream_call, rate_limited_response
+from instrumentation import timed, CACHE_LOOKUPS, ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_TOKENS
+from meal_stream import IncrementalSectionParser
+from nutrition import calculate_nutrition_requirements
+from plan_cache import canonical_diet, plan_cache_key
+from prompt_templates import MEAL_PLAN_PROMPT
+from rate_limit import RateLimited
+from response_decoding import (
+    decode_json, json_schema, MEAL_PLAN_SPEC,
+    validate_meal_plan, validate_meal_section, validate_nutrition_summary
+)
+from upstream_limits import UpstreamBusy
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("meal_plan", __name__)
+
+# ==============================================
+# Helper Functions for Meal Planning
+# ==============================================
+
+def calculate_totals(plan):
+    """Calculate nutrition totals if not provided by AI"""
+    meals = ["breakfast", "lunch", "snacks", "dinner"]
+    totals = {
+        "total_calories": 0,
+        "total_protein": 0,
+        "total_carbs": 0,
+        "total_fat": 0
+    }
+    
+    for meal in meals:
+        for item in plan.get(meal, []):
+            totals["total_calories"] += item.get("calories", 0)
+            totals["total_protein"] += item.get("protein", 0)
+            totals["total_carbs"] += item.get("carbs", 0)
+            totals["total_fat"] += item.get("fat", 0)
+    
+    return totals
+
+MEAL_SECTIONS = ["breakfast", "lunch", "snacks", "dinner"]
+MEAL_PLAN_PARAMS = {"temperature": 0.7, "max_tokens": 2000}
+if STRUCTURED_OUTPUT:
+    MEAL_PLAN_PARAMS["response_format"] = {"type": "json_object", "schema": json_schema(MEAL_PLAN_SPEC)}
+
+def resolve_nutrition_targets(data):
+    """Use explicit targets from the request, else derive them from the profile"""
+    if all(k in data for k in ['calories', 'protein', 'carbs', 'fat']):
+        return {
+            "calories": int(data['calories']),
+            "protein": int(data['protein']),
+            "carbs": int(data['carbs']),
+            "fat": int(data['fat'])
+        }
+    return calculate_nutrition_requirements(data)
+
+def is_simple_request(data):
+    """No health conditions to plan around; small models may serve these"""
+    return not str(data.get("health_conditions") or "").strip()
+
+def build_meal_plan_prompt(data, nutrition):
+    """Chat messages for the given targets: the static template prefix, then this request's variables"""
+    return MEAL_PLAN_PROMPT.messages(
+        diet=canonical_diet(data.get("meal_preference")),
+        region=data.get("region", "South Indian"),
+        calories=nutrition['calories'],
+        protein=nutrition['protein'],
+        carbs=nutrition['carbs'],
+        fat=nutrition['fat'],
+        health_conditions=data.get("health_conditions", "") or "None",
+        goal=data.get("goal", "balanced")
+    )
+
+class MealPlanError(ValueError):
+    """LLM output could not be turned into a meal plan; keeps the raw text for debugging"""
+
+    def __init__(self, message, raw_response=None):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+def request_model_plan(model, messages, deadline):
+    """Call one Together.ai model and parse/validate the meal plan it returns"""
+    logger.debug(f"Requesting a meal plan from {model}")
+    with upstream_call(services.together_rate_limiter(), model), \
+            timed("meal_plan", "llm_call"), UPSTREAM_IN_FLIGHT.track(upstream="together"):
+        # Deadline, retries on timeouts/5xx and a circuit breaker per model; each attempt
+        # holds a limiter slot until it returns, even past the deadline
+        response = services.together_resilience().call(
+            lambda timeout: services.together_client().chat_completion(
+                model=model,
+                messages=messages,
+                timeout=timeout,
+                **MEAL_PLAN_PARAMS
+            ),
+            key=model,
+            deadline=deadline,
+            limiter=services.together_limiter()
+        )
+    usage = response.get("usage") or {}
+    UPSTREAM_TOKENS.inc(usage.get("prompt_tokens", 0), upstream="together", model=model, kind="prompt")
+    # Reported by providers that reuse a cached prompt prefix
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    UPSTREAM_TOKENS.inc(cached, upstream="together", model=model, kind="cached_prompt")
+    UPSTREAM_TOKENS.inc(usage.get("completion_tokens", 0), upstream="together", model=model, kind="completion")
+    content = response["choices"][0]["message"]["content"]
+    logger.debug(f"Meal plan response from {model}: {len(content)} chars")
+
+    try:
+        # Validates the sections and coerces every number in one pass
+        with timed("meal_plan", "parse"):
+            plan_dict = decode_json(content, validate_meal_plan)
+    except ValueError as e:
+        raise MealPlanError(str(e), content)
+
+    with timed("meal_plan", "postprocess"):
+        if not plan_dict.get('nutrition_summary'):
+            plan_dict['nutrition_summary'] = calculate_totals(plan_dict)
+    return plan_dict
+
+def request_meal_plan(messages, simple=False):
+    """Walk the routed model chain until one returns a valid plan within the deadline"""
+    # httpx is only imported once an upstream is called
+    from model_router import outcome_for
+    from resilience import CircuitOpen, DeadlineExceeded
+    from upstream_client import UpstreamError
+
+    router = services.meal_plan_router()
+    deadline_at = time.monotonic() + TOGETHER_DEADLINE
+    error = None
+    for model in router.plan(simple):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        start = time.monotonic()
+        try:
+            plan_dict = request_model_plan(model, messages, min(ROUTING_MODEL_DEADLINE, remaining))
+        except (RateLimited, CircuitOpen) as e:
+            # Throttled or tripped before the call; says nothing new about the model
+            error = e
+            continue
+        except (UpstreamError, DeadlineExceeded, ValueError) as e:
+            router.record(model, time.monotonic() - start, outcome_for(e))
+            logger.warning(f"Meal plan from {model} failed ({str(e)[:200]}); falling back")
+            error = e
+            continue
+        router.record(model, time.monotonic() - start, "ok")
+        return plan_dict
+    raise error or DeadlineExceeded(f"No meal plan within {TOGETHER_DEADLINE:.0f}s")
+
+# ==============================================
+# API Endpoints
+# ==============================================
+
+@bp.route('/generate-meal-plan', methods=['POST'])
+def generate_meal_plan():
+    data = request.get_json()
+    # Field names only: profiles include health conditions
+    logger.debug(f"Meal plan request with fields {sorted(data) if isinstance(data, dict) else type(data).__name__}")
+    content = None  # Initialize content variable
+
+    try:
+        # Determine nutrition values
+        with timed("meal_plan", "targets"):
+            nutrition = resolve_nutrition_targets(data)
+        with timed("meal_plan", "prompt_build"):
+            prompt = build_meal_plan_prompt(data, nutrition)
+        simple = is_simple_request(data)
+
+        # Serve a rotating cached variant for this target bucket when available
+        with timed("meal_plan", "cache_lookup"):
+            cache_key = plan_cache_key(nutrition, data)
+            cached_plan, cache_status = services.meal_plan_cache().get(cache_key)
+        CACHE_LOOKUPS.inc(cache="meal_plan", result=cache_status or "miss")
+        if cached_plan is not None:
+            if cache_status == "stale":
+                services.meal_plan_cache().refresh_async(cache_key, lambda: request_meal_plan(prompt, simple))
+            return jsonify({
+                "plan": cached_plan,
+                "nutrition_requirements": nutrition,
+                "cache": cache_status
+            })
+
+        try:
+            limit_user()
+            # Identical concurrent requests share one upstream call
+            plan_dict, shared = services.meal_plan_flights().do(cache_key, lambda: request_meal_plan(prompt, simple))
+            if not shared:
+                services.meal_plan_cache().add(cache_key, plan_dict)
+
+            return jsonify({
+                "plan": plan_dict,
+                "nutrition_requirements": nutrition
+            })
+
+        except RateLimited as e:
+            ERRORS.inc(operation="meal_plan", cause="rate_limited")
+            return rate_limited_response(e)
+
+        except UpstreamBusy as e:
+            ERRORS.inc(operation="meal_plan", cause=error_cause(e))
+            return jsonify({"error": "Meal plan service busy", "message": str(e)}), 503
+
+        except Exception as e:
+            ERRORS.inc(operation="meal_plan", cause=error_cause(e))
+            if isinstance(e, MealPlanError):
+                content = e.raw_response
+            return jsonify({
+                "error": "AI response processing failed",
+                "message": str(e),
+                "debug_info": {
+                    "prompt": prompt,
+                    "response": content if content else "No response generated"
+                }
+            }), 500
+
+    except Exception as e:
+        ERRORS.inc(operation="meal_plan", cause="invalid_request")
+        return jsonify({
+            "error": "Request processing failed",
+            "message": str(e),
+            "debug_info": {
+                "input_data": data,
+                "prompt": prompt if 'prompt' in locals() else "Prompt not generated"
+            }
+        }), 400
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def sse_error(e):
+    ERRORS.inc(operation="meal_plan_stream", cause=error_cause(e))
+    if isinstance(e, RateLimited):
+        return sse_event("error", {"error": "Too many requests", "message": str(e),
+                                   "retry_after": int(e.retry_after_header)})
+    if isinstance(e, UpstreamBusy):
+        return sse_event("error", {"error": "Meal plan service busy", "message": str(e)})
+    logger.error(f"Meal plan stream failed: {str(e)}")
+    return sse_event("error", {"error": "AI response processing failed", "message": str(e)})
+
+def stream_model_sections(model, messages, plan_dict, parser, acquire=True):
+    """Stream one model's plan into plan_dict, yielding each meal section once it is complete"""
+    # A stream is never retried once sections have been sent; only the breaker applies
+    with upstream_call(services.together_rate_limiter(), model, acquire=acquire), \
+            services.together_limiter().slot(), services.together_resilience().guard(model) as timeout, \
+            timed("meal_plan_stream", "llm_stream"), UPSTREAM_IN_FLIGHT.track(upstream="together"):
+        for delta in services.together_client().stream_chat_completion(
+            model=model,
+            messages=messages,
+            timeout=min(ROUTING_MODEL_DEADLINE, timeout),
+            **MEAL_PLAN_PARAMS
+        ):
+            for key, value in parser.feed(delta):
+                if key in MEAL_SECTIONS:
+                    value = validate_meal_section(value, f"$.{key}")
+                    plan_dict[key] = value
+                    yield key, value
+                elif key == "nutrition_summary":
+                    plan_dict[key] = validate_nutrition_summary(value, f"$.{key}")
+                else:
+                    plan_dict[key] = value
+
+    missing = [meal for meal in MEAL_SECTIONS if meal not in plan_dict]
+    if missing:
+        raise ValueError(f"Missing required meal sections: {', '.join(missing)}")
+
+@bp.route('/generate-meal-plan/stream', methods=['POST'])
+def generate_meal_plan_stream():
+    """Stream each meal section as a server-sent event as soon as it is complete."""
+    data = request.get_json()
+    try:
+        nutrition = resolve_nutrition_targets(data)
+        prompt = build_meal_plan_prompt(data, nutrition)
+        simple = is_simple_request(data)
+    except Exception as e:
+        return jsonify({"error": "Request processing failed", "message": str(e)}), 400
+
+    cache_key = plan_cache_key(nutrition, data)
+    cached_plan, cache_status = services.meal_plan_cache().get(cache_key)
+    CACHE_LOOKUPS.inc(cache="meal_plan", result=cache_status or "miss")
+    if cached_plan is not None and cache_status == "stale":
+        services.meal_plan_cache().refresh_async(cache_key, lambda: request_meal_plan(prompt, simple))
+    models = []
+    if cached_plan is None:
+        models = services.meal_plan_router().plan(simple)
+        # Checked before the stream starts so the client gets a real 429
+        try:
+            limit_user()
+            services.together_rate_limiter().acquire(models[0])
+        except RateLimited as e:
+            return rate_limited_response(e)
+
+    def generate():
+        from model_router import outcome_for
+        from resilience import CircuitOpen, DeadlineExceeded
+        from upstream_client import UpstreamError
+
+        yield sse_event("requirements", nutrition)
+        if cached_plan is not None:
+            for meal in MEAL_SECTIONS:
+                yield sse_event("meal", {"meal": meal, "items": cached_plan.get(meal, [])})
+            yield sse_event("summary", cached_plan['nutrition_summary'])
+            yield sse_event("done", {"plan": cached_plan, "nutrition_requirements": nutrition, "cache": cache_status})
+            return
+
+        router = services.meal_plan_router()
+        for attempt, model in enumerate(models):
+            plan_dict = {}
+            parser = IncrementalSectionParser()
+            sent = False
+            start = time.monotonic()
+            try:
+                for meal, items in stream_model_sections(model, prompt, plan_dict, parser, acquire=attempt > 0):
+                    sent = True
+                    yield sse_event("meal", {"meal": meal, "items": items})
+            except Exception as e:
+                if isinstance(e, (UpstreamError, DeadlineExceeded, ValueError)):
+                    router.record(model, time.monotonic() - start, outcome_for(e))
+                # Sections already sent cannot be taken back, so fall back only before the first one
+                retryable = isinstance(e, (UpstreamError, DeadlineExceeded, ValueError, RateLimited, CircuitOpen))
+                if sent or not retryable or attempt == len(models) - 1:
+                    yield sse_error(e)
+                    return
+                logger.warning(f"Meal plan stream from {model} failed ({str(e)[:200]}); falling back")
+                continue
+            router.record(model, time.monotonic() - start, "ok")
+            break
+
+        if not plan_dict.get('nutrition_summary'):
+            plan_dict['nutrition_summary'] = calculate_totals(plan_dict)
+        if parser.finished:
+            services.meal_plan_cache().add(cache_key, plan_dict)
+        else:
+            # Every meal arrived but the stream was cut before the closing brace
+            logger.warning(f"Meal plan stream from {model} was truncated; not caching it")
+
+        yield sse_event("summary", plan_dict['nutrition_summary'])
+        yield sse_event("done", {"plan": plan_dict, "nutrition_requirements": nutrition})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@bp.route('/calculate-requirements', methods=['POST'])
+def calculate_requirements():
+    try:
+        data = request.get_json()
+        requirements = calculate_nutrition_requirements(data)
+        return jsonify(requirements)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@bp.route('/calculate-requirements/bulk', methods=['POST'])
+def calculate_requirements_bulk():
+    """Requirements for many profiles: a JSON array, or NDJSON in and out."""
+    # numpy is only imported once this endpoint is used
+    from bulk_nutrition import calculate_nutrition_requirements_bulk_json, BulkValidationError
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        def rows():
+            for line_number, line in enumerate(request.stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield BulkValidationError(f"Invalid JSON on line {line_number}: {str(e)}")
+
+        def generate():
+            for lines, _ in calculate_nutrition_requirements_bulk_json(rows()):
+                yield "\n".join(lines) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("profiles")
+    if not isinstance(data, list):
+        return jsonify({"error": "Expected a JSON array of profiles"}), 400
+
+    # Result rows are already JSON text, so the body is assembled rather than jsonify'd
+    results, error_count = [], 0
+    for lines, errors in calculate_nutrition_requirements_bulk_json(data):
+        results.extend(lines)
+        error_count += errors
+    body = '{"results": [' + ", ".join(results) + '], "error_count": ' + str(error_count) + '}'
+    return Response(body, mimetype='application/json')
@@ -0,0 +1,62 @@
+"""Prometheus /metrics endpoint and the per-request HTTP metrics."""
+import time
+
+from flask import Blueprint, Response, request, g
+
+from instrumentation import REGISTRY, HTTP_REQUESTS, HTTP_SECONDS, HTTP_IN_FLIGHT
+from rate_limit import RateLimited
+from resilience import CircuitOpen, DeadlineExceeded
+from upstream_limits import UpstreamBusy
+
+bp = Blueprint("metrics", __name__)
+
+
+def endpoint_label() -> str:
+    # The route name, never the raw path, so ids in URLs do not create new series
+    return request.endpoint or "unmatched"
+
+
+def error_cause(e: Exception) -> str:
+    """Bounded label for app_errors_total"""
+    # httpx is only imported once an upstream has been used
+    from upstream_client import UpstreamError
+
+    if isinstance(e, RateLimited):
+        return "rate_limited"
+    if isinstance(e, CircuitOpen):
+        return "circuit_open"
+    if isinstance(e, UpstreamBusy):
+        return "busy"
+    if isinstance(e, DeadlineExceeded):
+        return "timeout"
+    if isinstance(e, UpstreamError):
+        return f"upstream_{e.status_code // 100}xx" if e.status_code else "upstream_unreachable"
+    if isinstance(e, ValueError):
+        return "parse_error"
+    return "internal"
+
+
+@bp.before_app_request
+def start_request():
+    g.metrics_start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(endpoint=endpoint_label())
+
+
+@bp.after_app_request
+def record_request(response):
+    endpoint = endpoint_label()
+    HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    HTTP_SECONDS.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+    return response
+
+
+@bp.teardown_app_request
+def finish_request(error=None):
+    if "metrics_start" in g:
+        HTTP_IN_FLIGHT.dec(endpoint=endpoint_label())
+    REGISTRY.maybe_flush()
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
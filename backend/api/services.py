@@ -0,0 +1,214 @@
+"""Shared per-process services, each built on first use.
+
+Nothing here is constructed at import: a worker forked from a preloaded
+master builds its own HTTP pools (never sharing sockets with siblings), and a
+process that only serves meal plans never imports httpx for Gemini or numpy
+for the food table. Each getter returns the same instance on every call.
+"""
+import os
+import threading
+from typing import Callable
+
+from api import config
+
+
+class Lazy:
+    """Call `factory` once, on first use, and keep the result."""
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+
+def _upstream_cassette():
+    if config.UPSTREAM_CASSETTE_MODE == "off":
+        return None
+    from cassettes import Cassette
+    return Cassette(config.UPSTREAM_CASSETTE_DIR, config.UPSTREAM_CASSETTE_MODE, miss=config.UPSTREAM_CASSETTE_MISS,
+                    latency_scale=config.UPSTREAM_CASSETTE_LATENCY_SCALE)
+
+
+def _together_client():
+    from upstream_client import TogetherClient
+    return TogetherClient(config.TOGETHER_API_KEY, base_url=config.TOGETHER_API_BASE, cassette=upstream_cassette(),
+                          **config.UPSTREAM_OPTIONS)
+
+
+def _gemini_client():
+    from upstream_client import GeminiClient
+    return GeminiClient(config.API_KEY, model=config.GEMINI_MODEL, base_url=config.GEMINI_API_BASE,
+                        cassette=upstream_cassette(), **config.UPSTREAM_OPTIONS)
+
+
+def _gemini_prefix_cache():
+    from upstream_client import GeminiPrefixCache
+    return GeminiPrefixCache(gemini_client, enabled=config.GEMINI_CONTEXT_CACHE, ttl=config.GEMINI_CONTEXT_CACHE_TTL)
+
+
+def _together_limiter():
+    from upstream_limits import UpstreamLimiter
+    return UpstreamLimiter("together", config.TOGETHER_MAX_CONCURRENT, acquire_timeout=config.UPSTREAM_ACQUIRE_TIMEOUT)
+
+
+def _gemini_limiter():
+    from upstream_limits import UpstreamLimiter
+    return UpstreamLimiter("gemini", config.GEMINI_MAX_CONCURRENT, acquire_timeout=config.UPSTREAM_ACQUIRE_TIMEOUT)
+
+
+def _meal_plan_cache():
+    from plan_cache import PlanCache, create_plan_store
+    return PlanCache(
+        create_plan_store(config.PLAN_CACHE_BACKEND, path=config.PLAN_CACHE_PATH, max_keys=config.PLAN_CACHE_MAX_KEYS),
+        variants=config.PLAN_CACHE_VARIANTS,
+        fresh_ttl=config.PLAN_CACHE_FRESH_TTL,
+        stale_ttl=config.PLAN_CACHE_STALE_TTL,
+        max_keys=config.PLAN_CACHE_MAX_KEYS
+    )
+
+
+def _food_db():
+    # Per-100 g nutrition for common Indian dishes (memory-mapped, shared across workers)
+    from food_db import FoodDatabase
+    return FoodDatabase(min_similarity=config.FOOD_DB_MIN_SIMILARITY)
+
+
+def _detection_cache():
+    from result_cache import ResultCache
+    return ResultCache(
+        max_entries=config.DETECT_CACHE_MAX_ENTRIES,
+        ttl=config.DETECT_CACHE_TTL,
+        disk_dir=os.path.join(config.UPLOAD_FOLDER, "cache") if config.DETECT_CACHE_DISK else None,
+        max_disk_bytes=config.DETECT_CACHE_MAX_DISK_BYTES
+    )
+
+
+def _near_duplicate_index():
+    from near_duplicate import NearDuplicateIndex
+    return NearDuplicateIndex(threshold=config.NEAR_DUP_THRESHOLD, max_entries=config.NEAR_DUP_MAX_ENTRIES)
+
+
+def _rate_limit_store():
+    from rate_limit import create_bucket_store
+    return create_bucket_store(config.RATE_LIMIT_BACKEND, path=config.RATE_LIMIT_PATH)
+
+
+def _user_rate_limiter():
+    from rate_limit import TokenBucketLimiter
+    return TokenBucketLimiter("user", config.USER_RATE_PER_MINUTE, config.USER_RATE_BURST, rate_limit_store())
+
+
+def _together_rate_limiter():
+    from rate_limit import TokenBucketLimiter
+    return TokenBucketLimiter("together", config.TOGETHER_RATE_PER_MINUTE, config.TOGETHER_RATE_BURST,
+                              rate_limit_store())
+
+
+def _gemini_rate_limiter():
+    from rate_limit import TokenBucketLimiter
+    return TokenBucketLimiter("gemini", config.GEMINI_RATE_PER_MINUTE, config.GEMINI_RATE_BURST, rate_limit_store())
+
+
+def _meal_plan_flights():
+    from single_flight import SingleFlight
+    return SingleFlight("meal_plan")
+
+
+def _detection_flights():
+    from single_flight import SingleFlight
+    return SingleFlight("detection")
+
+
+def _resilient_caller(name, deadline, max_concurrent):
+    from resilience import ResilientCaller, CircuitBreaker
+    return ResilientCaller(
+        name,
+        deadline=deadline,
+        # One thread per limiter slot, and as many again for hedges
+        max_workers=2 * max_concurrent,
+        queue_timeout=config.UPSTREAM_ACQUIRE_TIMEOUT,
+        max_attempts=config.RETRY_MAX_ATTEMPTS,
+        base_delay=config.RETRY_BASE_DELAY,
+        max_delay=config.RETRY_MAX_DELAY,
+        hedge=config.HEDGE_REQUESTS,
+        hedge_min_delay=config.HEDGE_MIN_DELAY,
+        breaker=CircuitBreaker(name, config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+    )
+
+
+def _together_resilience():
+    return _resilient_caller("together", config.TOGETHER_DEADLINE, config.TOGETHER_MAX_CONCURRENT)
+
+
+def _gemini_resilience():
+    return _resilient_caller("gemini", config.GEMINI_DEADLINE, config.GEMINI_MAX_CONCURRENT)
+
+
+def _meal_plan_router():
+    from model_router import ModelRouter, parse_routes
+    return ModelRouter(
+        parse_routes(config.MEAL_PLAN_MODELS, config.MODEL_CATALOG),
+        policy=config.ROUTING_POLICY,
+        latency_budget=config.ROUTING_LATENCY_BUDGET,
+        max_error_rate=config.ROUTING_MAX_ERROR_RATE,
+        min_samples=config.ROUTING_MIN_SAMPLES,
+        window=config.ROUTING_WINDOW,
+        max_models=config.ROUTING_MAX_MODELS,
+        small_for_simple=config.ROUTING_SMALL_FOR_SIMPLE
+    )
+
+
+def _job_queue():
+    from job_queue import JobQueue
+    return JobQueue(config.JOB_QUEUE_PATH, config.JOB_BLOB_DIR, max_attempts=config.JOB_MAX_ATTEMPTS,
+                    lease_seconds=config.JOB_LEASE_SECONDS, max_queued=config.JOB_MAX_QUEUED)
+
+
+def _meal_history():
+    from meal_history import MealHistory
+    return MealHistory(config.HISTORY_DB_PATH)
+
+
+def _rendition_store():
+    from renditions import RenditionStore
+    return RenditionStore(config.RENDITION_DIR, config.RENDITION_SIZES, quality=config.RENDITION_QUALITY,
+                          workers=config.RENDITION_WORKERS, max_pending=config.RENDITION_MAX_PENDING,
+                          in_use=lambda image_id: meal_history().image_in_use(image_id),
+                          max_bytes=config.RENDITION_MAX_BYTES, cleanup_interval=config.RENDITION_CLEANUP_INTERVAL)
+
+
+upstream_cassette = Lazy(_upstream_cassette)
+together_client = Lazy(_together_client)
+gemini_client = Lazy(_gemini_client)
+gemini_prefix_cache = Lazy(_gemini_prefix_cache)
+together_limiter = Lazy(_together_limiter)
+gemini_limiter = Lazy(_gemini_limiter)
+meal_plan_cache = Lazy(_meal_plan_cache)
+food_db = Lazy(_food_db)
+detection_cache = Lazy(_detection_cache)
+near_duplicate_index = Lazy(_near_duplicate_index)
+rate_limit_store = Lazy(_rate_limit_store)
+user_rate_limiter = Lazy(_user_rate_limiter)
+together_rate_limiter = Lazy(_together_rate_limiter)
+gemini_rate_limiter = Lazy(_gemini_rate_limiter)
+meal_plan_flights = Lazy(_meal_plan_flights)
+detection_flights = Lazy(_detection_flights)
+together_resilience = Lazy(_together_resilience)
+gemini_resilience = Lazy(_gemini_resilience)
+meal_plan_router = Lazy(_meal_plan_router)
+job_queue = Lazy(_job_queue)
+meal_history = Lazy(_meal_history)
+rendition_store = Lazy(_rendition_store)
@@ -0,0 +1,51 @@
+"""Rate limiting helpers shared by the blueprints.
+
+Per-user buckets are charged only for work that reaches an upstream (cache
+hits are free); per-upstream buckets are charged for every provider call and
+drained when the provider itself answers 429, so retries back off together.
+"""
+from contextlib import contextmanager
+
+from flask import request, jsonify
+
+from api import services
+from api.auth import current_user_id
+from api.config import UPSTREAM_THROTTLE_BACKOFF
+from rate_limit import RateLimited
+
+
+def client_key() -> str:
+    """The verified token subject; anonymous or unverifiable callers share their address's bucket."""
+    user_id = current_user_id()
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+
+def limit_user(cost: float = 1) -> None:
+    """Charge the caller's bucket; raises RateLimited when it is empty."""
+    services.user_rate_limiter().acquire(client_key(), cost)
+
+
+@contextmanager
+def upstream_call(rate_limiter, key: str, acquire: bool = True):
+    """Take a token for one upstream call and turn a provider 429 into RateLimited.
+
+    Pass acquire=False when the token was already taken up front (streams).
+    """
+    from upstream_client import UpstreamError
+
+    if acquire:
+        rate_limiter.acquire(key)
+    try:
+        yield
+    except UpstreamError as e:
+        if e.status_code != 429:
+            raise
+        retry_after = e.retry_after or UPSTREAM_THROTTLE_BACKOFF
+        rate_limiter.penalize(key, retry_after)
+        raise RateLimited(f"{rate_limiter.name} is throttling requests", retry_after) from e
+
+
+def rate_limited_response(e: RateLimited):
+    response = jsonify({"error": "Too many requests", "message": str(e), "retry_after": int(e.retry_after_header)})
+    response.headers["Retry-After"] = e.retry_after_header
+    return response, 429
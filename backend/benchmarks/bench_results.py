@@ -0,0 +1,96 @@
+"""Shared result format for load_test.py and microbenchmarks.py.
+
+Every run is written as one JSON document:
+
+    {"benchmark": "load_test", "name": "mixed", "meta": {...commit, host...},
+     "results": {"<case>": {"p50_ms": ..., "rps": ..., ...}}, ...}
+
+so compare_results.py can diff any two runs of the same benchmark, e.g. the
+same scenario before and after a commit.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    ordered = sorted(seconds)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0
+    }
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_meta() -> Dict:
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv[1:]
+    }
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of one process from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid and its children (gunicorn master plus workers)."""
+    pids = [pid]
+    try:
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        # The command name may contain spaces; the ppid follows the closing parenthesis
+                        if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                            pids.append(int(entry))
+                except (OSError, ValueError, IndexError):
+                    continue
+    except OSError:
+        pass
+    return pids
+
+
+def write_results(benchmark: str, name: str, results: Dict, output: Optional[str] = None, **extra) -> str:
+    document = {"benchmark": benchmark, "name": name, "meta": run_meta(), "results": results, **extra}
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = document["meta"]["commit"] or "nogit"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{benchmark}-{name}-{commit}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    return output
@@ -0,0 +1,120 @@
+"""Throughput of the vectorized bulk requirements path vs the scalar function.
+
+Times the scalar function, the bulk dict iterator and the bulk JSON lines
+(what the /calculate-requirements/bulk endpoint serves) against a row loop
+that also json.dumps each result. Equivalence with the scalar function is
+covered by tests/test_bulk_nutrition.py; a quick check still runs first.
+
+    python benchmarks/bulk_requirements.py --rows 100000 --check-rows 20000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from nutrition import ACTIVITY_MULTIPLIERS, GOAL_ADJUSTMENTS, calculate_nutrition_requirements  # noqa: E402
+from bulk_nutrition import (  # noqa: E402
+    calculate_nutrition_requirements_bulk, calculate_nutrition_requirements_bulk_json
+)
+
+
+def random_profile(rng):
+    profile = {}
+    fields = {
+        "weight": lambda: rng.choice([rng.uniform(30, 200), rng.randint(30, 200), str(rng.randint(30, 200)), "70.5"]),
+        "height": lambda: rng.choice([rng.uniform(120, 220), rng.randint(120, 220), "175"]),
+        "age": lambda: rng.choice([rng.randint(10, 90), str(rng.randint(10, 90)), rng.uniform(10, 90)]),
+        "gender": lambda: rng.choice(["male", "female", "other"]),
+        "activity_level": lambda: rng.choice(list(ACTIVITY_MULTIPLIERS) + ["unknown"]),
+        "goal": lambda: rng.choice(list(GOAL_ADJUSTMENTS) + ["unknown"]),
+    }
+    for name, make in fields.items():
+        # Missing fields exercise the defaults
+        if rng.random() < 0.9:
+            profile[name] = make()
+    roll = rng.random()
+    if roll < 0.01:
+        profile["weight"] = "heavy"
+    elif roll < 0.02:
+        profile["age"] = "30.5"
+    elif roll < 0.025:
+        profile["weight"] = None
+    elif roll < 0.03:
+        profile["height"] = "nan"
+    elif roll < 0.035:
+        return ["not", "a", "profile"]
+    return profile
+
+
+def numeric_profile(rng):
+    """Typical export from the profiles table: numbers only, no malformed rows."""
+    return {
+        "weight": round(rng.uniform(40, 130), 1),
+        "height": rng.randint(145, 200),
+        "age": rng.randint(16, 80),
+        "gender": rng.choice(["male", "female"]),
+        "activity_level": rng.choice(list(ACTIVITY_MULTIPLIERS)),
+        "goal": rng.choice(list(GOAL_ADJUSTMENTS)),
+    }
+
+
+def scalar(profile):
+    try:
+        return calculate_nutrition_requirements(profile)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def check(profiles):
+    bulk = list(calculate_nutrition_requirements_bulk(profiles))
+    lines = [line for batch, _ in calculate_nutrition_requirements_bulk_json(profiles) for line in batch]
+    assert len(bulk) == len(lines) == len(profiles)
+    for profile, got, line in zip(profiles, bulk, lines):
+        expected = scalar(profile)
+        if got != expected or line != json.dumps(expected):
+            raise AssertionError(f"Mismatch for {profile!r}: bulk {got!r} / {line} != scalar {expected!r}")
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--check-rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check([random_profile(rng) for _ in range(args.check_rows)])
+    check([numeric_profile(rng) for _ in range(args.check_rows)])
+    # Small batches mixing both kinds exercise the row-wise fallback per batch
+    check([rng.choice([random_profile, numeric_profile])(rng) for _ in range(args.check_rows)])
+    print(f"equivalence: {3 * args.check_rows} random profiles match the scalar function")
+
+    for name, make in (("numeric", numeric_profile), ("mixed", random_profile)):
+        profiles = [make(rng) for _ in range(args.rows)]
+        runs = {
+            "scalar": lambda: [scalar(profile) for profile in profiles],
+            "bulk": lambda: list(calculate_nutrition_requirements_bulk(profiles)),
+            "scalar+json": lambda: [json.dumps(scalar(profile)) for profile in profiles],
+            "bulk json": lambda: list(calculate_nutrition_requirements_bulk_json(profiles)),
+        }
+        seconds = {label: best_of(run) for label, run in runs.items()}
+        for label, elapsed in seconds.items():
+            baseline = seconds["scalar+json" if "json" in label else "scalar"]
+            print(f"{name:>7} {label:>11}: {args.rows / elapsed:12,.0f} rows/s ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Replay lookup speed of a cassette pack (cassettes.py) as it grows.
+
+Records --recordings synthetic chat completions through Cassette in capture
+mode, packs them and then replays random recorded requests the way
+UpstreamClient does (normalize, hash, binary search of the memory-mapped
+index, JSON decode of the body), from --threads threads:
+
+    python benchmarks/cassette_replay.py
+    python benchmarks/cassette_replay.py --recordings 200000 --lookups 100000 --threads 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cassettes import Cassette, write_pack  # noqa: E402
+from prompt_templates import MEAL_PLAN_PROMPT, SAMPLE_VARIABLES  # noqa: E402
+
+PLAN = '{"breakfast": [{"name": "Idli", "calories": 210, "protein": 6, "carbs": 42, "fat": 1}], ' \
+       '"lunch": [], "snacks": [], "dinner": []}'
+
+
+def request(i):
+    variables = dict(SAMPLE_VARIABLES[MEAL_PLAN_PROMPT.name], calories=1200 + i)
+    return {"model": "meta-llama/Llama-3.3-70B-Instruct-Turbo", "messages": MEAL_PLAN_PROMPT.messages(**variables),
+            "temperature": 0.7, "max_tokens": 2000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cassette-")
+    capture = Cassette(directory, "capture")
+    start = time.perf_counter()
+    for i in range(args.recordings):
+        response = {"choices": [{"message": {"role": "assistant", "content": PLAN}}], "usage": {"id": i}}
+        capture.record("together", "/chat/completions", request(i), response, 1500.0)
+    print(f"captured {args.recordings} in {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    write_pack(capture.capture_path, capture.pack_path)
+    print(f"packed in {time.perf_counter() - start:.2f} s: {os.path.getsize(capture.pack_path) / 2 ** 20:.1f} MiB")
+
+    rng = random.Random(1)
+    payloads = [request(rng.randrange(args.recordings)) for _ in range(args.lookups)]
+    replay = Cassette(directory, "replay")
+
+    def lookup(payload):
+        return replay.replay("together", "/chat/completions", payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for _ in pool.map(lookup, payloads, chunksize=256):
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"{args.lookups} replays on {args.threads} threads: {args.lookups / elapsed:,.0f}/s, "
+          f"{elapsed / args.lookups * 1e6:.1f} us each; "
+          f"{replay.info()}")
+
+
+if __name__ == "__main__":
+    main()
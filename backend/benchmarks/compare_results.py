@@ -0,0 +1,74 @@
+"""Diff two benchmark result files (load_test.py or microbenchmarks.py output).
+
+Prints every case and metric found in both runs with the relative change,
+and flags regressions beyond --threshold: lower is better for latencies
+and timings, higher is better for throughput (rps, per_s). Exits 1 when
+anything regressed, so it can gate a CI job:
+
+    python benchmarks/compare_results.py results/load_test-mixed-abc1234-*.json results/load_test-mixed-def5678-*.json
+    python benchmarks/compare_results.py --latest load_test-mixed --threshold 5
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_results import RESULTS_DIR  # noqa: E402
+
+HIGHER_IS_BETTER = ("rps", "per_s")
+# Counts and knobs, not performance
+SKIPPED = ("requests", "ok", "calls_per_round")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(before, after, threshold):
+    rows, regressions = [], 0
+    for case, metrics in before["results"].items():
+        if case not in after["results"]:
+            continue
+        for metric, old in metrics.items():
+            new = after["results"][case].get(metric)
+            if metric in SKIPPED or not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+            regressed = worse > threshold
+            regressions += regressed
+            rows.append((case, metric, old, new, change, regressed))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="before and after result files")
+    parser.add_argument("--latest", metavar="PREFIX", help="compare the two newest results/<PREFIX>-*.json files")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    files = args.files
+    if args.latest:
+        files = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{args.latest}-*.json")), key=os.path.getmtime)[-2:]
+    if len(files) != 2:
+        parser.error("need exactly two result files")
+    before, after = load(files[0]), load(files[1])
+    if before["benchmark"] != after["benchmark"]:
+        parser.error(f"cannot compare {before['benchmark']} with {after['benchmark']} results")
+
+    print(f"before: {before['name']} @ {before['meta']['commit']}{' (dirty)' if before['meta']['dirty'] else ''}")
+    print(f"after:  {after['name']} @ {after['meta']['commit']}{' (dirty)' if after['meta']['dirty'] else ''}")
+    rows, regressions = compare(before, after, args.threshold)
+    for case, metric, old, new, change, regressed in rows:
+        print(f"{case:>58} {metric:>12} {old:12.2f} -> {new:12.2f}  {change:+7.1f}%{'  REGRESSION' if regressed else ''}")
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
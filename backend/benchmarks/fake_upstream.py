@@ -0,0 +1,231 @@
+"""Local stand-in for Together.ai and Gemini that replays recorded responses.
+
+Serves the endpoints the backend calls, with latencies drawn from a
+configurable distribution, so load tests never spend provider quota:
+
+    POST /v1/chat/completions                    Together.ai (also stream=true, as SSE)
+    POST /v1beta/models/<model>:generateContent  Gemini (one object per image for batches)
+    POST /v1beta/cachedContents                  Gemini context caches
+    GET  /stats                                  calls and errors per upstream
+
+Responses come from data/raw_responses.json: only the clean recordings by
+default, or every recorded shape (fences, preambles, truncation...) with
+--replay all to exercise the repair and fallback paths. Latencies:
+
+    fixed:0.5              always 0.5 s
+    uniform:0.2:1.5        uniform between 0.2 and 1.5 s
+    lognormal:0.8:4        median 0.8 s, p99 4 s (the usual LLM shape)
+
+    python benchmarks/fake_upstream.py --port 8089 --together-latency lognormal:1.5:6
+    TOGETHER_API_BASE=http://127.0.0.1:8089/v1 GEMINI_API_BASE=http://127.0.0.1:8089/v1beta python model.py
+
+The first line printed is the URL the server listens on (handy with --port 0).
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "raw_responses.json")
+
+
+class Latency:
+    """Seconds per call from a "kind:arg:arg" spec."""
+
+    def __init__(self, spec: str):
+        kind, *args = spec.split(":")
+        self.spec = spec
+        self.kind = kind
+        self.args = [float(arg) for arg in args]
+        if kind == "lognormal":
+            median, p99 = self.args
+            # p99 of a lognormal is median * exp(2.326 sigma)
+            self.mu, self.sigma = math.log(median), math.log(p99 / median) / 2.326
+        elif kind not in ("fixed", "uniform"):
+            raise ValueError(f"Unknown latency distribution {kind}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.args)
+        return rng.lognormvariate(self.mu, self.sigma)
+
+
+def load_recordings(replay: str):
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    if replay == "clean":
+        corpus = [entry for entry in corpus if entry["label"].startswith("clean")]
+    recordings = {}
+    for entry in corpus:
+        recordings.setdefault(entry["kind"], []).append(entry["text"])
+    return recordings
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set by make_server
+    recordings = {}
+    latency = {}
+    error_rate = 0.0
+    stream_chunks = 20
+    stats = {}
+    lock = threading.Lock()
+    rng = random.Random()
+
+    def _count(self, upstream, outcome):
+        with self.lock:
+            counts = self.stats.setdefault(upstream, {"calls": 0, "errors": 0})
+            counts["calls"] += 1
+            if outcome != "ok":
+                counts["errors"] += 1
+
+    def _pick(self, kind):
+        with self.lock:
+            return self.rng.choice(self.recordings[kind])
+
+    def _delay(self, upstream):
+        with self.lock:
+            return self.latency[upstream].sample(self.rng), self.rng.random() < self.error_rate
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The backend gave up on the call (deadline) and closed the connection
+            pass
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.lock:
+                return self._reply(200, self.stats)
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            return self._together(request)
+        if self.path.endswith(":generateContent"):
+            return self._gemini(request)
+        if self.path.endswith("/cachedContents"):
+            return self._reply(200, {"name": f"cachedContents/fake-{abs(hash(json.dumps(request)))}",
+                                     "expireTime": "2099-01-01T00:00:00Z"})
+        self._reply(404, {"error": "not found"})
+
+    def _together(self, request):
+        delay, fail = self._delay("together")
+        text = self._pick("meal_plan")
+        if fail:
+            time.sleep(delay / 4)
+            self._count("together", "error")
+            return self._reply(503, {"error": {"message": "fake upstream error"}})
+        if request.get("stream"):
+            return self._stream(text, delay)
+        time.sleep(delay)
+        self._count("together", "ok")
+        self._reply(200, {
+            "choices": [{"message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 250, "completion_tokens": len(text) // 4}
+        })
+
+    def _stream(self, text, delay):
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = max(1, len(text) // self.stream_chunks)
+            for i in range(0, len(text), size):
+                time.sleep(delay / self.stream_chunks)
+                chunk = json.dumps({"choices": [{"delta": {"content": text[i:i + size]}}]})
+                self._write_chunk(f"data: {chunk}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+            self._count("together", "ok")
+        except OSError:
+            self._count("together", "aborted")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _gemini(self, request):
+        delay, fail = self._delay("gemini")
+        time.sleep(delay)
+        if fail:
+            self._count("gemini", "error")
+            return self._reply(503, {"error": {"message": "fake upstream error"}})
+        parts = [part for content in request.get("contents", []) for part in content.get("parts", [])]
+        images = sum(1 for part in parts if "inline_data" in part)
+        if images > 1:
+            # Batches need one object per image; stitch clean single results together
+            text = "[" + ", ".join(self._pick("detection").strip() for _ in range(images)) + "]"
+        else:
+            text = self._pick("detection")
+        self._count("gemini", "ok")
+        self._reply(200, {
+            "candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 180 + 258 * images, "candidatesTokenCount": len(text) // 4}
+        })
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def make_server(host="127.0.0.1", port=0, together_latency="lognormal:1.5:6", gemini_latency="lognormal:1:4",
+                error_rate=0.0, replay="clean", stream_chunks=20, seed=None):
+    handler = type("ConfiguredFakeUpstream", (FakeUpstreamHandler,), {
+        "recordings": load_recordings(replay),
+        "latency": {"together": Latency(together_latency), "gemini": Latency(gemini_latency)},
+        "error_rate": error_rate,
+        "stream_chunks": stream_chunks,
+        "stats": {},
+        "lock": threading.Lock(),
+        "rng": random.Random(seed)
+    })
+    return QuietServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--together-latency", default="lognormal:1.5:6")
+    parser.add_argument("--gemini-latency", default="lognormal:1:4")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with 503")
+    parser.add_argument("--replay", choices=["clean", "all"], default="clean")
+    parser.add_argument("--stream-chunks", type=int, default=20)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.together_latency, args.gemini_latency,
+                         args.error_rate, args.replay, args.stream_chunks, args.seed)
+    print(f"http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
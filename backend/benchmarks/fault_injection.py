@@ -0,0 +1,169 @@
+"""Resilience layer against a local fault-injecting upstream.
+
+Starts an OpenAI-compatible /chat/completions server on localhost whose
+behaviour is switched per scenario, and drives a real TogetherClient through
+ResilientCaller (resilience.py) with and without the layer:
+
+    healthy     every call answers in ~20 ms
+    slow_tail   3% of calls take 1.5 s (hedging cuts the tail)
+    flaky       30% of calls answer 503 (retries with jitter recover them)
+    outage      every call fails for 2 s, then the upstream recovers
+                (the breaker fails fast, then a probe closes it)
+    hang        calls never answer within the deadline
+
+    python benchmarks/fault_injection.py
+    python benchmarks/fault_injection.py --scenario slow_tail --requests 400 --concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from upstream_client import TogetherClient  # noqa: E402
+from resilience import ResilientCaller, CircuitBreaker, CircuitOpen  # noqa: E402
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "{}"}}]
+}).encode()
+
+
+class FaultyUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    scenario = "healthy"
+    started = 0.0
+    hits = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with FaultyUpstreamHandler.lock:
+            FaultyUpstreamHandler.hits += 1
+        scenario = FaultyUpstreamHandler.scenario
+        status, delay = 200, 0.02
+        if scenario == "slow_tail" and random.random() < 0.03:
+            delay = 1.5
+        elif scenario == "flaky" and random.random() < 0.3:
+            status = 503
+        elif scenario == "outage" and time.monotonic() - FaultyUpstreamHandler.started < 2:
+            status = 503
+        elif scenario == "hang":
+            delay = 5
+        time.sleep(delay)
+
+        body = COMPLETION if status == 200 else b'{"error": "unavailable"}'
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up (deadline) and closed the connection
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Resets from abandoned (timed out or hedged) connections are expected
+        pass
+
+
+def start_server():
+    server = QuietServer(("127.0.0.1", 0), FaultyUpstreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run(name, scenario, base_url, requests, concurrency, caller=None):
+    client = TogetherClient("fake-key", base_url=base_url, http2=False, read_timeout=10)
+    FaultyUpstreamHandler.scenario = scenario
+    FaultyUpstreamHandler.started = time.monotonic()
+    FaultyUpstreamHandler.hits = 0
+    outcomes = {"ok": 0, "error": 0, "fast_fail": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            if caller is None:
+                client.chat_completion("fake", [])
+            else:
+                caller.call(lambda timeout: client.chat_completion("fake", [], timeout=timeout))
+            outcome = "ok"
+        except CircuitOpen:
+            outcome = "fast_fail"
+        except Exception:
+            outcome = "error"
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(time.perf_counter() - start)
+        if scenario == "outage":
+            # Spread the calls over the outage and the recovery
+            time.sleep(0.05)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    latencies.sort()
+    print(f"{name:>24}: ok {outcomes['ok']:4d}  error {outcomes['error']:4d}  fast-fail {outcomes['fast_fail']:4d}  "
+          f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  upstream hits {FaultyUpstreamHandler.hits:4d}  "
+          f"{elapsed:5.1f} s")
+    if caller is not None:
+        info = caller.info()
+        print(f"{'':>24}  retries {info['retries']}  hedges {info['hedges']} (won {info['hedge_wins']})  "
+              f"deadline exceeded {info['deadline_exceeded']}  circuit {info['circuit']}")
+
+
+def make_caller(scenario):
+    # Five failures in a row are a real possibility at a 30% error rate
+    breaker = CircuitBreaker("fake", failure_threshold=10 if scenario == "flaky" else 5, reset_timeout=0.5)
+    if scenario == "slow_tail":
+        return ResilientCaller("fake", deadline=5, hedge=True, hedge_min_delay=0.1,
+                               hedge_min_samples=10, breaker=breaker)
+    if scenario == "hang":
+        return ResilientCaller("fake", deadline=0.5, max_attempts=2, breaker=breaker)
+    return ResilientCaller("fake", deadline=5, base_delay=0.05, max_delay=0.5, breaker=breaker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["healthy", "slow_tail", "flaky", "outage", "hang"], action="append")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    # Retry warnings would drown the report
+    logging.basicConfig(level=logging.ERROR)
+
+    server, base_url = start_server()
+    for scenario in args.scenario or ["healthy", "slow_tail", "flaky", "outage", "hang"]:
+        requests = min(args.requests, 8) if scenario == "hang" else args.requests
+        print(f"--- {scenario}")
+        run("direct", scenario, base_url, requests, args.concurrency)
+        run("resilient", scenario, base_url, requests, args.concurrency, make_caller(scenario))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Meal history reads: keyset pages and rollups vs the per-meal queries they replace.
+
+Fills a temporary MealHistory (meal_history.py) with months of meals for one
+user among many, then times:
+
+    page        a 20-meal page: meals then one foods query per meal (N+1)
+                vs the single joined keyset query, at the newest page and deep
+                in the history (OFFSET vs cursor)
+    dashboard   30 days of totals: summing every food row vs reading the
+                daily_rollups rows
+
+Each statement is charged --rtt-ms of simulated network round trip, as the
+frontend pays against Supabase; with --rtt-ms 0 only SQLite's own cost is left.
+
+    python benchmarks/history_queries.py
+    python benchmarks/history_queries.py --days 730 --meals-per-day 5 --users 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from meal_history import MealHistory  # noqa: E402
+
+PAGE = 20
+
+
+def fill(history, users, days, meals_per_day, rng):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for user in range(users):
+        # The measured user logs every meal; the others add volume to the tables
+        count = days * meals_per_day if user == 0 else rng.randint(0, days)
+        for i in range(count):
+            moment = start + timedelta(minutes=rng.randint(0, days * 1440))
+            foods = [{"name": f"food{rng.randint(0, 200)}", "weight_g": rng.randint(50, 300),
+                      "calories": rng.uniform(50, 400), "protein_g": rng.uniform(0, 30),
+                      "carbs_g": rng.uniform(0, 60), "fats_g": rng.uniform(0, 20)}
+                     for _ in range(rng.randint(1, 5))]
+            history.add_meal(f"user{user}", {"meal_name": f"meal {i}", "consumed_at": moment.isoformat(),
+                                             "foods": foods})
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class RemoteConnection:
+    """Sleeps one round trip before every statement."""
+
+    def __init__(self, conn, rtt):
+        self.conn = conn
+        self.rtt = rtt
+
+    def execute(self, *args):
+        if self.rtt:
+            time.sleep(self.rtt)
+        return self.conn.execute(*args)
+
+
+def n_plus_one_page(conn, user, offset):
+    meals = conn.execute(
+        "SELECT id, meal_name, calories FROM meals WHERE user_id = ? ORDER BY consumed_ts DESC, id DESC"
+        " LIMIT ? OFFSET ?", (user, PAGE, offset)
+    ).fetchall()
+    return [(meal, conn.execute("SELECT * FROM meal_foods WHERE meal_id = ? ORDER BY position", (meal[0],)).fetchall())
+            for meal in meals]
+
+
+def summed_days(conn, user, first_day):
+    return conn.execute(
+        "SELECT m.day, COUNT(DISTINCT m.id), SUM(f.calories), SUM(f.protein_g), SUM(f.carbs_g), SUM(f.fats_g)"
+        " FROM meals m JOIN meal_foods f ON f.meal_id = m.id WHERE m.user_id = ? AND m.day >= ? GROUP BY m.day",
+        (user, first_day)
+    ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--meals-per-day", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated round trip per statement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = MealHistory(os.path.join(tmp, "history.sqlite3"))
+        start = time.perf_counter()
+        fill(history, args.users, args.days, args.meals_per_day, random.Random(7))
+        print(f"filled {history.info()} in {time.perf_counter() - start:.1f} s")
+        user = "user0"
+        conn = history._conn = RemoteConnection(history._conn, args.rtt_ms / 1000)
+
+        total = args.days * args.meals_per_day
+        deep = (total // 2) // PAGE * PAGE
+        # Walk to the deep page once to get its cursor
+        cursor, skipped = None, 0
+        while skipped < deep:
+            _, cursor = history.list_meals(user, PAGE, cursor)
+            skipped += PAGE
+
+        print("--- page of 20 meals with foods")
+        for name, offset, page_cursor in (("newest", 0, None), (f"offset {deep}", deep, cursor)):
+            slow = timeit(lambda: n_plus_one_page(conn, user, offset), args.repeat)
+            fast = timeit(lambda: history.list_meals(user, PAGE, page_cursor), args.repeat)
+            print(f"{name:>14}: N+1 {slow * 1000:7.2f} ms   joined keyset {fast * 1000:7.2f} ms   "
+                  f"{slow / fast:5.1f}x")
+
+        print("--- last 30 days of totals")
+        last = conn.execute("SELECT MAX(day) FROM meals WHERE user_id = ?", (user,)).fetchone()[0]
+        first_day = (datetime.fromisoformat(last) - timedelta(days=29)).date().isoformat()
+        slow = timeit(lambda: summed_days(conn, user, first_day), args.repeat)
+        fast = timeit(lambda: history.rollups(user, "day", first_day), args.repeat)
+        print(f"{'daily':>14}: sum foods {slow * 1000:7.2f} ms   rollups {fast * 1000:7.2f} ms   {slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Cost of a timed() stage with metrics enabled and disabled.
+
+    python benchmarks/instrumentation_overhead.py --iterations 1000000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from instrumentation import REGISTRY, timed, timed_stage  # noqa: E402
+
+
+def baseline():
+    pass
+
+
+@timed_stage("benchmark", "decorated")
+def decorated():
+    pass
+
+
+def with_block():
+    with timed("benchmark", "block"):
+        pass
+
+
+def measure(name, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>28}: {elapsed / iterations * 1e9:7.1f} ns/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500000)
+    args = parser.parse_args()
+
+    measure("empty function", baseline, args.iterations)
+    for enabled in (False, True):
+        REGISTRY.configure(enabled)
+        state = "enabled" if enabled else "disabled"
+        measure(f"with timed() ({state})", with_block, args.iterations)
+        measure(f"@timed_stage ({state})", decorated, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""Load test the backend end to end against the fake upstream.
+
+Reads a scenario file (see scenarios/), starts fake_upstream.py and a
+gunicorn server wired to it, then drives a weighted mix of requests with
+asyncio + httpx, either closed-loop (`concurrency` clients sending back to
+back) or open-loop (`rate` Poisson arrivals per second). After the warmup,
+every request's latency and time to first byte is recorded; the report has
+p50/p95/p99, throughput and errors per request type, the server's RSS
+(gunicorn master plus workers, sampled every 0.5 s) and the upstream call
+counts. Results are written as JSON to results/ for compare_results.py.
+
+    python benchmarks/load_test.py benchmarks/scenarios/mixed.json
+    python benchmarks/load_test.py benchmarks/scenarios/detect_food.json --concurrency 64 --duration 60
+    python benchmarks/load_test.py benchmarks/scenarios/calculate_requirements.json --target http://127.0.0.1:5050
+
+With --target nothing is started: the scenario runs against that server
+(give --server-pid to sample its RSS) and its own upstreams.
+"""
+import io
+import os
+import hmac
+import sys
+import json
+import time
+import base64
+import hashlib
+import random
+import signal
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_results import latency_summary, process_tree, rss_mb, write_results  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..")
+
+# Limits that would otherwise throttle the load generator itself
+SERVER_ENV = {
+    "TOGETHER_API_KEY": "fake-key",
+    "GOOGLE_API_KEY": "fake-key",
+    "UPSTREAM_HTTP2": "0",
+    "USER_RATE_PER_MINUTE": "0",
+    "TOGETHER_RATE_PER_MINUTE": "0",
+    "GEMINI_RATE_PER_MINUTE": "0",
+    "PLAN_CACHE_BACKEND": "memory",
+    "DETECT_CACHE_DISK": "0",
+    "LOG_LEVEL": "warning"
+}
+# Signs the load generator's user tokens; the spawned server verifies with it
+JWT_SECRET = "load-test-secret"
+
+
+# ==============================================
+# Request mix
+# ==============================================
+
+def user_token(user_id, secret):
+    """An HS256 access token like Supabase's, valid for a day."""
+    def b64(data):
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    header = b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    claims = b64(json.dumps({"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 86400}).encode())
+    signature = b64(hmac.new(secret.encode(), f"{header}.{claims}".encode(), hashlib.sha256).digest())
+    return f"{header}.{claims}.{signature}"
+
+
+def make_images(count, size, rng):
+    """Distinct JPEGs; how many there are decides the detection cache hit rate."""
+    from PIL import Image
+
+    images = []
+    for _ in range(count):
+        x, y = rng.uniform(-2, 0.5), rng.uniform(-1.2, 1.2)
+        fractal = Image.effect_mandelbrot((size, size * 3 // 4), (x, y, x + 0.5, y + 0.4), 64)
+        noise = Image.effect_noise((size, size * 3 // 4), rng.uniform(10, 60))
+        gradient = Image.linear_gradient("L").resize((size, size * 3 // 4))
+        buffer = io.BytesIO()
+        Image.merge("RGB", (fractal, noise, gradient)).save(buffer, "JPEG", quality=88)
+        images.append(buffer.getvalue())
+    return images
+
+
+class RequestMix:
+    """Builds requests from the scenario's weighted request specs."""
+
+    def __init__(self, specs, seed=None, jwt_secret=JWT_SECRET):
+        self.rng = random.Random(seed)
+        self.jwt_secret = jwt_secret
+        self.tokens = {}
+        self.specs = specs
+        self.weights = [spec.get("weight", 1) for spec in specs]
+        self.images = {}
+        for spec in specs:
+            image = spec.get("image")
+            if image:
+                self.images[spec["name"]] = make_images(image.get("distinct", 20), image.get("size", 1024), self.rng)
+
+    def next(self):
+        spec = self.rng.choices(self.specs, self.weights)[0]
+        request = {"method": spec.get("method", "POST"), "url": spec["path"], "headers": dict(spec.get("headers", {}))}
+        if spec.get("users"):
+            user_id = f"load-{self.rng.randrange(spec['users'])}"
+            if user_id not in self.tokens:
+                self.tokens[user_id] = user_token(user_id, self.jwt_secret)
+            request["headers"]["Authorization"] = f"Bearer {self.tokens[user_id]}"
+        if "json" in spec:
+            body = dict(spec["json"])
+            # Vary fields so requests spread over cache buckets like real traffic
+            for field, (low, high) in spec.get("json_ranges", {}).items():
+                body[field] = self.rng.randint(low, high)
+            for field, choices in spec.get("json_choices", {}).items():
+                body[field] = self.rng.choice(choices)
+            request["json"] = body
+        if spec["name"] in self.images:
+            count = spec["image"].get("per_request", 1)
+            field = spec["image"].get("field", "image")
+            request["files"] = [(field, (f"meal{i}.jpg", self.rng.choice(self.images[spec["name"]]), "image/jpeg"))
+                                for i in range(count)]
+            request["data"] = dict(spec.get("form", {}))
+        return spec["name"], request
+
+
+# ==============================================
+# Load generation
+# ==============================================
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.recording = False
+
+    def add(self, name, outcome, latency, ttfb):
+        if self.recording:
+            self.samples.setdefault(name, []).append((outcome, latency, ttfb))
+
+
+async def send(client, recorder, name, request):
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(**request) as response:
+            async for _ in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+            outcome = "ok" if response.status_code < 400 else str(response.status_code)
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    latency = time.perf_counter() - start
+    recorder.add(name, outcome, latency, ttfb if ttfb is not None else latency)
+
+
+async def closed_loop(client, mix, recorder, concurrency, stop_at):
+    async def user():
+        while time.monotonic() < stop_at:
+            name, request = mix.next()
+            await send(client, recorder, name, request)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+
+async def open_loop(client, mix, recorder, rate, max_in_flight, stop_at):
+    """Poisson arrivals at `rate`/s; arrivals past max_in_flight are counted as dropped."""
+    in_flight = set()
+    dropped = 0
+    rng = random.Random()
+    next_at = time.monotonic()
+    while next_at < stop_at:
+        await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        next_at += rng.expovariate(rate)
+        if len(in_flight) >= max_in_flight:
+            dropped += recorder.recording
+            continue
+        name, request = mix.next()
+        task = asyncio.ensure_future(send(client, recorder, name, request))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return dropped
+
+
+async def drive(base_url, mix, load, recorder):
+    concurrency = load.get("concurrency", 16)
+    limits = httpx.Limits(max_connections=max(concurrency, load.get("max_in_flight", 256)))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=load.get("timeout", 120)) as client:
+        warmup_until = time.monotonic() + load.get("warmup", 5)
+        stop_at = warmup_until + load.get("duration", 30)
+
+        async def start_recording():
+            await asyncio.sleep(max(0.0, warmup_until - time.monotonic()))
+            recorder.recording = True
+
+        starter = asyncio.ensure_future(start_recording())
+        if load.get("rate"):
+            dropped = await open_loop(client, mix, recorder, load["rate"], load.get("max_in_flight", 256), stop_at)
+        else:
+            await closed_loop(client, mix, recorder, concurrency, stop_at)
+            dropped = 0
+        await starter
+        return dropped
+
+
+# ==============================================
+# Server, upstream and RSS sampling
+# ==============================================
+
+def start_fake_upstream(upstream, log):
+    args = [sys.executable, os.path.join(BENCH_DIR, "fake_upstream.py"), "--port", "0"]
+    for key in ("together_latency", "gemini_latency", "error_rate", "replay", "stream_chunks", "seed"):
+        if key in upstream:
+            args += [f"--{key.replace('_', '-')}", str(upstream[key])]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=log, text=True)
+    return process, process.stdout.readline().strip()
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(server, upstream_url, workdir, log):
+    port = free_port()
+    try:
+        import gevent  # noqa: F401
+        default_class = "gevent"
+    except ImportError:
+        default_class = "gthread"
+    worker_class = server.get("worker_class") or default_class
+    env = {
+        **os.environ, **SERVER_ENV,
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "TOGETHER_API_BASE": f"{upstream_url}/v1",
+        "GEMINI_API_BASE": f"{upstream_url}/v1beta",
+        "BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(server.get("workers", 2)),
+        "WORKER_CLASS": worker_class,
+        "PIDFILE": os.path.join(workdir, "gunicorn.pid"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "HISTORY_DB_PATH": os.path.join(workdir, "meal_history.sqlite3"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "JOB_BLOB_DIR": os.path.join(workdir, "jobs"),
+        "RENDITION_DIR": os.path.join(workdir, "renditions"),
+        **{key: str(value) for key, value in server.get("env", {}).items()}
+    }
+    args = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null"]
+    if worker_class == "gthread":
+        args += ["--threads", str(server.get("threads", 32))]
+    process = subprocess.Popen(args + ["model:app"], cwd=BACKEND_DIR, env=env, stdout=log, stderr=log)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}; see {log.name}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url, worker_class
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer within 60 s; see {log.name}")
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.stop = threading.Event()
+        self.peak_total = self.peak_process = self.last_total = 0.0
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            sizes = [size for size in map(rss_mb, process_tree(self.pid)) if size is not None]
+            if sizes:
+                self.last_total = sum(sizes)
+                self.peak_total = max(self.peak_total, self.last_total)
+                self.peak_process = max(self.peak_process, max(sizes))
+
+    def summary(self):
+        # Summed RSS counts pages shared copy-on-write with the master once per process
+        return {"rss_peak_total_mb": round(self.peak_total, 1), "rss_peak_process_mb": round(self.peak_process, 1),
+                "rss_end_total_mb": round(self.last_total, 1)}
+
+
+# ==============================================
+# Report
+# ==============================================
+
+def summarize(samples, duration):
+    results = {}
+    everything = []
+    for name, entries in sorted(samples.items()):
+        everything.extend(entries)
+        results[name] = case_summary(entries, duration)
+    results["_all"] = case_summary(everything, duration)
+    return results
+
+
+def case_summary(entries, duration):
+    ok = [latency for outcome, latency, _ in entries if outcome == "ok"]
+    errors = {}
+    for outcome, _, _ in entries:
+        if outcome != "ok":
+            errors[outcome] = errors.get(outcome, 0) + 1
+    ttfb = latency_summary([ttfb for outcome, _, ttfb in entries if outcome == "ok"])
+    return {
+        "requests": len(entries),
+        "ok": len(ok),
+        "errors": errors,
+        "rps": round(len(entries) / duration, 2),
+        "ok_rps": round(len(ok) / duration, 2),
+        **latency_summary(ok),
+        "ttfb_p50_ms": ttfb["p50_ms"],
+        "ttfb_p95_ms": ttfb["p95_ms"]
+    }
+
+
+def print_report(results, server_info):
+    print(f"{'case':>24} {'reqs':>7} {'ok rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttfb p50':>9}  errors")
+    for name, row in results.items():
+        print(f"{name:>24} {row['requests']:7d} {row['ok_rps']:8.1f} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} "
+              f"{row['p99_ms']:9.1f} {row['ttfb_p50_ms']:9.1f}  {row['errors'] or ''}")
+    if server_info:
+        print("server: " + ", ".join(f"{key} {value}" for key, value in server_info.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("--target", help="base URL of an already running server")
+    parser.add_argument("--server-pid", type=int, help="with --target: process whose RSS (and children's) to sample")
+    parser.add_argument("--duration", type=float)
+    parser.add_argument("--warmup", type=float)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--rate", type=float, help="open-loop arrivals per second instead of closed-loop clients")
+    parser.add_argument("--workers", type=int, help="gunicorn workers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jwt-secret", default=JWT_SECRET,
+                        help="with --target: the server's SUPABASE_JWT_SECRET, to sign per-user tokens")
+    parser.add_argument("--output", help="result file (default: results/load_test-<scenario>-<commit>-<time>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+    load = dict(scenario.get("load", {}))
+    for key in ("duration", "warmup", "concurrency", "rate"):
+        if getattr(args, key) is not None:
+            load[key] = getattr(args, key)
+    server = dict(scenario.get("server", {}))
+    if args.workers:
+        server["workers"] = args.workers
+
+    mix = RequestMix(scenario["requests"], seed=args.seed, jwt_secret=args.jwt_secret)
+    recorder = Recorder()
+    processes = []
+    workdir = tempfile.mkdtemp(prefix="load_test-")
+    log = open(os.path.join(workdir, "server.log"), "w")
+    sampler = None
+    upstream_url = None
+    try:
+        if args.target:
+            base_url, pid, worker_class = args.target.rstrip("/"), args.server_pid, None
+        else:
+            upstream, upstream_url = start_fake_upstream(scenario.get("upstream", {}), log)
+            processes.append(upstream)
+            gunicorn, base_url, worker_class = start_server(server, upstream_url, workdir, log)
+            processes.append(gunicorn)
+            pid = gunicorn.pid
+        if pid:
+            sampler = RssSampler(pid)
+            sampler.start()
+
+        print(f"{scenario.get('name', 'scenario')}: {load} against {base_url}"
+              + (f" ({server.get('workers', 2)} {worker_class} workers)" if worker_class else ""))
+        dropped = asyncio.run(drive(base_url, mix, load, recorder))
+        upstream_stats = httpx.get(f"{upstream_url}/stats").json() if upstream_url else None
+    finally:
+        if sampler:
+            sampler.stop.set()
+        for process in reversed(processes):
+            process.send_signal(signal.SIGTERM)
+        for process in reversed(processes):
+            try:
+                process.wait(timeout=35)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+    results = summarize(recorder.samples, load.get("duration", 30))
+    server_info = sampler.summary() if sampler else {}
+    if dropped:
+        server_info["dropped_arrivals"] = dropped
+    print_report(results, server_info)
+    if upstream_stats:
+        print(f"upstream calls: {upstream_stats}")
+    if not args.no_save:
+        path = write_results("load_test", scenario.get("name", os.path.splitext(os.path.basename(args.scenario))[0]),
+                             results, args.output, server=server_info, upstream=upstream_stats,
+                             scenario={**scenario, "load": load, "server": {**server, "worker_class": worker_class}})
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Microbenchmarks for the CPU-bound helpers on the request path.
+
+    calculate_nutrition_requirements   profile -> targets (nutrition.py)
+    calculate_totals                   meal plan totals (api/meal_plan.py)
+    validate_image                     PIL open + size check of an upload (api/detection.py)
+    decode_json:<kind>:<label>         LLM output cleanup, one case per recorded
+                                       response in data/raw_responses.json
+
+Each case is timed over --repeat rounds of enough calls to take about
+--target-ms; the best round is reported (least disturbed by the rest of the
+machine) together with the median. Results are written to results/ like
+load_test.py's:
+
+    python benchmarks/microbenchmarks.py
+    python benchmarks/microbenchmarks.py --filter decode_json --repeat 9
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_results import write_results  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "raw_responses.json")
+
+PROFILE = {"weight": 68, "height": 172, "age": 34, "gender": "female", "activity_level": "active", "goal": "cut"}
+
+
+def sample_plan():
+    item = {"name": "Idli", "quantity": "3 pieces", "calories": 210, "protein": 6, "carbs": 42, "fat": 1}
+    return {meal: [dict(item) for _ in range(4)] for meal in ("breakfast", "lunch", "snacks", "dinner")}
+
+
+def sample_jpeg(size):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot((size, size * 3 // 4), (-2, -1.2, 0.5, 1.2), 64).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def cases():
+    from nutrition import calculate_nutrition_requirements
+    from api.meal_plan import calculate_totals
+    from api.detection import validate_image
+    from response_decoding import decode_json, validate_meal_plan, validate_detection, validate_detection_batch
+
+    plan = sample_plan()
+    yield "calculate_nutrition_requirements", lambda: calculate_nutrition_requirements(PROFILE)
+    yield "calculate_totals", lambda: calculate_totals(plan)
+    for size in (1024, 4000):
+        blob = sample_jpeg(size)
+        yield f"validate_image:{size}px", lambda blob=blob: validate_image(blob)
+
+    validators = {"meal_plan": validate_meal_plan, "detection": validate_detection,
+                  "detection_batch": validate_detection_batch}
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    for entry in corpus:
+        validate, text = validators[entry["kind"]], entry["text"]
+
+        def decode(text=text, validate=validate):
+            try:
+                decode_json(text, validate)
+            except ValueError:
+                # Unrecoverable shapes (truncation) are timed up to the failure
+                pass
+
+        yield f"decode_json:{entry['kind']}:{entry['label']}", decode
+
+
+def measure(fn, repeat, target_ms):
+    # Calibrate the loop so one round takes roughly target_ms
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed * 1000 >= target_ms / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * target_ms / max(elapsed * 1000, 1e-3)))
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    best, median = min(rounds), statistics.median(rounds)
+    return {"best_us": round(best * 1e6, 3), "median_us": round(median * 1e6, 3),
+            "per_s": round(1 / best), "calls_per_round": number}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=200)
+    parser.add_argument("--output", help="result file (default: results/microbenchmarks-all-<commit>-<time>.json)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases():
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat, args.target_ms)
+        row = results[name]
+        print(f"{name:>58}  best {row['best_us']:10.2f} us  median {row['median_us']:10.2f} us  {row['per_s']:>10,}/s")
+    if not args.no_save:
+        print(f"saved {write_results('microbenchmarks', 'all', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
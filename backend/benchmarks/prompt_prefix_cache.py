@@ -0,0 +1,151 @@
+"""Detection latency with the prompt prefix sent inline vs as Gemini cached content.
+
+Starts a fake Gemini REST server on localhost (generateContent plus
+cachedContents) whose latency models prefill: a fixed overhead, a cost per
+uncached input token and a tenth of that per cached token. Token counts use
+prompt_templates.estimate_tokens, an image counts as 258 tokens. The same
+detection-shaped calls then go through GeminiPrefixCache (upstream_client.py)
+with caching off and on:
+
+    python benchmarks/prompt_prefix_cache.py
+    python benchmarks/prompt_prefix_cache.py --requests 400 --ms-per-token 0.2 --template food_detection_batch
+
+With --base-url and GOOGLE_API_KEY set the same comparison runs against a
+real endpoint instead (the model must support context caching, and the
+prefix must reach its minimum cacheable size).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from prompt_templates import TEMPLATES, SAMPLE_VARIABLES, estimate_tokens  # noqa: E402
+from upstream_client import GeminiClient, GeminiPrefixCache  # noqa: E402
+
+IMAGE_TOKENS = 258
+DETECTION = json.dumps({"meal_name": "Idli with sambar", "foods": [{"name": "idli", "weight_g": 120}]})
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    base_ms = 150.0
+    ms_per_token = 0.1
+    caches = {}
+    lock = threading.Lock()
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _tokens(content):
+        return sum(IMAGE_TOKENS if "inline_data" in part else estimate_tokens(part.get("text", ""))
+                   for part in content.get("parts", []))
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if self.path.endswith("/cachedContents"):
+            with FakeGeminiHandler.lock:
+                name = f"cachedContents/{len(FakeGeminiHandler.caches) + 1}"
+                FakeGeminiHandler.caches[name] = self._tokens(request["systemInstruction"])
+            return self._reply(200, {"name": name, "expireTime": "2099-01-01T00:00:00Z"})
+
+        uncached = sum(self._tokens(content) for content in request["contents"])
+        cached = 0
+        if "cachedContent" in request:
+            cached = FakeGeminiHandler.caches.get(request["cachedContent"])
+            if cached is None:
+                return self._reply(404, {"error": {"message": "CachedContent not found"}})
+        if "systemInstruction" in request:
+            uncached += self._tokens(request["systemInstruction"])
+        time.sleep((self.base_ms + self.ms_per_token * (uncached + cached / 10)) / 1000)
+        self._reply(200, {
+            "candidates": [{"content": {"parts": [{"text": DETECTION}]}}],
+            "usageMetadata": {"promptTokenCount": uncached + cached, "cachedContentTokenCount": cached,
+                              "candidatesTokenCount": estimate_tokens(DETECTION)}
+        })
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run(name, prefix_cache, template, parts, requests, concurrency):
+    latencies, tokens = [], {"prompt": 0, "cached": 0}
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        response = prefix_cache.generate(template, parts, {"responseMimeType": "application/json"})
+        elapsed = time.perf_counter() - start
+        usage = response.payload.get("usageMetadata") or {}
+        with lock:
+            latencies.append(elapsed)
+            tokens["prompt"] += usage.get("promptTokenCount", 0)
+            tokens["cached"] += usage.get("cachedContentTokenCount", 0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{name:>8}: p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  {requests / elapsed:6.1f} req/s  "
+          f"prompt tokens/call {tokens['prompt'] / requests:6.1f} (cached {tokens['cached'] / requests:6.1f})")
+    return percentile(latencies, 0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--template", choices=["food_detection", "food_detection_batch"], default="food_detection")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=150.0, help="fake upstream: fixed latency per call")
+    parser.add_argument("--ms-per-token", type=float, default=0.1, help="fake upstream: prefill per uncached token")
+    parser.add_argument("--base-url", help="benchmark a real Gemini endpoint instead of the fake one")
+    parser.add_argument("--model", default=os.getenv("GEMINI_MODEL", "gemini-1.5-flash-001"))
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        base_url, api_key = args.base_url, os.getenv("GOOGLE_API_KEY")
+    else:
+        FakeGeminiHandler.base_ms = args.base_ms
+        FakeGeminiHandler.ms_per_token = args.ms_per_token
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGeminiHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url, api_key = f"http://127.0.0.1:{server.server_address[1]}/v1beta", "fake-key"
+
+    template = TEMPLATES[args.template]
+    image = {"mime_type": "image/jpeg", "data": b"\xff\xd8" + b"\x00" * 2048}
+    images = [image] * SAMPLE_VARIABLES[args.template].get("count", 1)
+    parts = [template.render(**SAMPLE_VARIABLES[args.template])] + images
+    print(f"template {template.key}: {template.token_report(**SAMPLE_VARIABLES[args.template])}")
+
+    client = GeminiClient(api_key, model=args.model, base_url=base_url, http2=False)
+    inline = run("inline", GeminiPrefixCache(lambda: client, enabled=False), template, parts,
+                 args.requests, args.concurrency)
+    cache = GeminiPrefixCache(lambda: client, enabled=True)
+    cached = run("cached", cache, template, parts, args.requests, args.concurrency)
+    print(f"p50 change {(cached - inline) * 1000:+.1f} ms; {cache.info()}")
+    client.close()
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Token counts per prompt template: the static (cacheable) prefix vs the per-request body.
+
+Counts are estimates from prompt_templates.estimate_tokens; with --gemini
+(and GOOGLE_API_KEY set) Gemini's countTokens is asked as well. Template
+keys are printed too: they are part of the plan and detection cache keys.
+
+    python benchmarks/prompt_tokens.py
+    python benchmarks/prompt_tokens.py --gemini --json
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from prompt_templates import TEMPLATES, SAMPLE_VARIABLES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini", action="store_true", help="also count with Gemini's countTokens")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    client = None
+    if args.gemini:
+        from api import config
+        from upstream_client import GeminiClient
+        client = GeminiClient(config.API_KEY, model=config.GEMINI_MODEL, base_url=config.GEMINI_API_BASE)
+
+    report = {}
+    for name, template in TEMPLATES.items():
+        body = template.render(**SAMPLE_VARIABLES[name])
+        entry = template.token_report(**SAMPLE_VARIABLES[name])
+        if client is not None:
+            entry["gemini_prefix_tokens"] = client.count_tokens(["."], system_instruction=template.prefix) - \
+                client.count_tokens(["."])
+            entry["gemini_body_tokens"] = client.count_tokens([body])
+        report[name] = entry
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, entry in report.items():
+        print(f"{name:>22}  {entry['key']:<34} prefix {entry['prefix_tokens']:4d}  body {entry['body_tokens']:4d}  "
+              f"total {entry['total_tokens']:4d}  cacheable {entry['cacheable_share']:.0%}"
+              + (f"  (gemini: prefix {entry['gemini_prefix_tokens']}, body {entry['gemini_body_tokens']})"
+                 if client is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Decode rate and speed of response_decoding vs the old ad-hoc parsing.
+
+Replays the recorded raw LLM responses in data/raw_responses.json (clean JSON
+mode output plus the usual failure shapes: preambles, fences, units on
+numbers, trailing commas, truncation) through both decoders. A response the
+old path could not parse used to cost a retry or a 500. Truncated responses
+are rejected by design (TruncatedOutput), so they show up as failures.
+
+    python benchmarks/response_decoding.py --iterations 2000
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_decoding import (  # noqa: E402
+    decode_json, validate_meal_plan, validate_detection, validate_detection_batch
+)
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "raw_responses.json")
+
+VALIDATORS = {
+    "meal_plan": validate_meal_plan,
+    "detection": validate_detection,
+    "detection_batch": validate_detection_batch
+}
+
+
+def legacy_meal_plan(content):
+    """The find/rfind + regex + json.loads path request_meal_plan used to take."""
+    json_str = content[content.find('{'):content.rfind('}') + 1]
+    json_str = re.sub(r'(\d+)\s*g', r'\1', json_str)
+    try:
+        plan = json.loads(json_str)
+    except json.JSONDecodeError:
+        plan = json.loads(json_str.replace('\n', '\\n').replace('\t', '\\t'))
+    if not all(meal in plan for meal in ("breakfast", "lunch", "snacks", "dinner")):
+        raise ValueError("Missing required meal sections")
+    for meal in ("breakfast", "lunch", "snacks", "dinner"):
+        for item in plan[meal]:
+            for nutrient in ("calories", "protein", "carbs", "fat"):
+                if nutrient in item:
+                    value = item[nutrient]
+                    if isinstance(value, str):
+                        value = re.sub(r'(\d)\s*[a-zA-Z]+$', r'\1', value.strip())
+                    item[nutrient] = int(float(value))
+    return plan
+
+
+def legacy_detection(text):
+    """strip_code_fences + json.loads, as the detection endpoints used to do."""
+    json_str = text.strip()
+    if json_str.startswith('```json'):
+        json_str = json_str[7:-3].strip()
+    elif json_str.startswith('```'):
+        json_str = json_str[3:-3].strip()
+    result = json.loads(json_str)
+    if isinstance(result, dict) and "foods" not in result:
+        raise ValueError("Response missing required 'foods' field")
+    return result
+
+
+LEGACY = {"meal_plan": legacy_meal_plan, "detection": legacy_detection, "detection_batch": legacy_detection}
+
+
+def run(decode, corpus, iterations):
+    ok = 0
+    failures = []
+    for sample in corpus:
+        try:
+            decode(sample)
+            ok += 1
+        except (ValueError, TypeError, KeyError) as e:
+            failures.append(f"{sample['kind']}/{sample['label']}: {str(e)[:60]}")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for sample in corpus:
+            try:
+                decode(sample)
+            except (ValueError, TypeError, KeyError):
+                pass
+    elapsed = time.perf_counter() - start
+    return ok, failures, elapsed / (iterations * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+    clean = [s for s in corpus if s["label"].startswith("clean")]
+
+    decoders = {
+        "legacy": lambda s: LEGACY[s["kind"]](s["text"]),
+        "decode_json": lambda s: decode_json(s["text"], VALIDATORS[s["kind"]])
+    }
+    print(f"{len(corpus)} recorded responses, {args.iterations} iterations")
+    for name, decode in decoders.items():
+        ok, failures, per_call = run(decode, corpus, args.iterations)
+        _, _, per_clean = run(decode, clean, args.iterations)
+        print(f"{name:>12}: {ok}/{len(corpus)} decoded, {per_call:.1f} us/response (all), "
+              f"{per_clean:.1f} us/response (clean JSON)")
+        for failure in failures:
+            print(f"{'':>14}failed {failure}")
+
+
+if __name__ == "__main__":
+    main()
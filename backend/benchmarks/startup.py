@@ -0,0 +1,112 @@
+"""Cold-start cost of the backend: import time, first requests, lazy services.
+
+Every run is a fresh interpreter started in the backend directory, so nothing
+is cached in-process. Each run reports:
+- the time to import the entry module (which calls create_app)
+- the first /health and /calculate-requirements requests
+- building the detection services (HTTP clients, food table, caches) on
+  first use
+- peak RSS
+- which heavy third-party modules were loaded at each stage
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --importtime   # slowest imports (python -X importtime)
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY_MODULES = ["httpx", "h2", "numpy", "PIL", "google.generativeai", "openai"]
+
+PROBE = r"""
+import sys, time, json, resource
+heavy = %(heavy)r
+loaded = lambda: [m for m in heavy if m in sys.modules]
+timings = {}
+start = time.perf_counter()
+module = __import__(%(module)r)
+timings["import_ms"] = (time.perf_counter() - start) * 1000
+after_import = loaded()
+client = module.app.test_client()
+
+start = time.perf_counter()
+client.get("/health")
+timings["first_health_ms"] = (time.perf_counter() - start) * 1000
+
+start = time.perf_counter()
+client.post("/calculate-requirements", json={"weight": 70, "height": 175, "age": 30})
+timings["first_requirements_ms"] = (time.perf_counter() - start) * 1000
+after_requests = loaded()
+
+from api import services
+start = time.perf_counter()
+for service in (services.gemini_client, services.gemini_limiter, services.food_db,
+                services.detection_cache, services.near_duplicate_index):
+    service()
+timings["detection_services_ms"] = (time.perf_counter() - start) * 1000
+
+print(json.dumps({
+    "timings": timings,
+    "after_import": after_import,
+    "after_requests": after_requests,
+    "after_services": loaded(),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+"""
+
+
+def run_probe(module):
+    env = dict(os.environ, DETECT_CACHE_DISK=os.getenv("DETECT_CACHE_DISK", "0"))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % {"module": module, "heavy": HEAVY_MODULES}],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def show_importtime(module, top):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line.split(":", 1)[1].split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    print(f"Slowest imports for `import {module}` (cumulative ms, self ms):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="model", help="entry module that exposes `app`")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.importtime:
+        show_importtime(args.module, args.top)
+        return
+
+    results = [run_probe(args.module) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts of `{args.module}` (median / max):")
+    for key in results[0]["timings"]:
+        values = [r["timings"][key] for r in results]
+        print(f"  {key:>24}: {statistics.median(values):8.1f} / {max(values):8.1f}")
+    print(f"  {'max_rss_mb':>24}: {statistics.median(r['max_rss_mb'] for r in results):8.1f}")
+    last = results[-1]
+    for stage in ("after_import", "after_requests", "after_services"):
+        print(f"  heavy modules {stage}: {', '.join(last[stage]) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
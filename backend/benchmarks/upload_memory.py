@@ -0,0 +1,109 @@
+"""Peak memory per /api/detect-food upload, before and after streaming ingestion.
+
+Each mode runs in a fresh subprocess so ru_maxrss is not polluted by the other.
+
+    python benchmarks/upload_memory.py --width 4000 --height 3000 --requests 5
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def make_sample(path, width, height):
+    from PIL import Image
+    # Noise so the JPEG is roughly phone-photo sized rather than compressing away
+    channels = [Image.effect_noise((width, height), sigma) for sigma in (40, 60, 80)]
+    Image.merge("RGB", channels).save(path, format="JPEG", quality=90)
+
+
+class FakeUpload:
+    """Stand-in for werkzeug's FileStorage backed by its spooled temp file."""
+
+    def __init__(self, path):
+        self.stream = tempfile.SpooledTemporaryFile(max_size=500 * 1024)
+        with open(path, "rb") as f:
+            self.stream.write(f.read())
+        self.stream.seek(0)
+
+    def read(self):
+        return self.stream.read()
+
+
+def run_before(upload):
+    from PIL import Image
+    file_stream = upload.read()
+    image = Image.open(io.BytesIO(file_stream))
+    # The Gemini SDK re-encoded the full-resolution image
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG")
+    return len(buffer.getvalue())
+
+
+def run_after(upload):
+    from PIL import Image
+    from upload_ingest import ingest_upload, sniff_image_header
+    from image_preprocess import preprocess_image
+    stream, size = ingest_upload(upload, 50 * 1024 * 1024)
+    sniff_image_header(stream)
+    image = Image.open(stream)
+    _, blob = preprocess_image(image, size)
+    return len(blob["data"])
+
+
+def child(mode, sample, requests):
+    runner = run_before if mode == "before" else run_after
+    # Warm imports so they are not attributed to the first request
+    runner(FakeUpload(sample))
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    peaks = []
+    for _ in range(requests):
+        tracemalloc.reset_peak()
+        runner(FakeUpload(sample))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    print(json.dumps({
+        "mode": mode,
+        "python_peak_bytes": max(peaks),
+        "rss_peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--child", choices=["before", "after"])
+    parser.add_argument("--sample")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.sample, args.requests)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "sample.jpg")
+        make_sample(sample, args.width, args.height)
+        print(f"Sample: {args.width}x{args.height}, {os.path.getsize(sample)} bytes")
+        for mode in ("before", "after"):
+            out = subprocess.check_output([
+                sys.executable, os.path.abspath(__file__), "--child", mode,
+                "--sample", sample, "--requests", str(args.requests)
+            ])
+            result = json.loads(out)
+            print(f"{mode:>6}: python peak {result['python_peak_bytes'] / 1e6:8.1f} MB, "
+                  f"RSS peak {result['rss_peak_kb'] / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Handshake savings from pooled upstream clients, against a local fake upstream.
+
+Starts an OpenAI-compatible /chat/completions server on localhost and sends the
+same requests through (a) a fresh client per call, as the legacy module-level
+openai client effectively did, and (b) one shared TogetherClient.
+
+    python benchmarks/upstream_pooling.py --requests 200
+    python benchmarks/upstream_pooling.py --certfile cert.pem --keyfile key.pem
+
+Pass a certificate to include TLS handshakes, which is where most of the
+savings are against api.together.xyz.
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx  # noqa: E402
+from upstream_client import TogetherClient  # noqa: E402
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "{}"}}]
+}).encode()
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FakeUpstreamHandler.lock:
+            FakeUpstreamHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(certfile=None, keyfile=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstreamHandler)
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def run_fresh(base_url, requests, verify):
+    for _ in range(requests):
+        with httpx.Client(base_url=base_url, verify=verify) as client:
+            client.post("/chat/completions", json={"model": "fake", "messages": []}).json()
+
+
+def run_pooled(base_url, requests, verify):
+    client = TogetherClient("fake-key", base_url=base_url, http2=False, verify=verify)
+    for _ in range(requests):
+        client.chat_completion("fake", [])
+    client.close()
+
+
+def measure(name, runner, base_url, requests, verify):
+    before = FakeUpstreamHandler.connections
+    start = time.perf_counter()
+    runner(base_url, requests, verify)
+    elapsed = time.perf_counter() - start
+    opened = FakeUpstreamHandler.connections - before
+    print(f"{name:>7}: {elapsed / requests * 1000:7.2f} ms/request, {opened} connections for {requests} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.certfile, args.keyfile)
+    # Self-signed benchmark certificates are not verifiable
+    measure("fresh", run_fresh, base_url, args.requests, False)
+    measure("pooled", run_pooled, base_url, args.requests, False)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
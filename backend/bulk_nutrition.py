@@ -0,0 +1,211 @@
+import json
+import math
+from typing import List, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from nutrition import ACTIVITY_MULTIPLIERS, GOAL_ADJUSTMENTS
+
+# Fields are parsed and the arithmetic runs over this many rows at a time
+BATCH_SIZE = 10000
+
+
+class BulkValidationError(ValueError):
+    pass
+
+
+def _parse_row(profile):
+    """Same conversions, defaults and error messages as calculate_nutrition_requirements."""
+    try:
+        weight = float(profile.get('weight', 70))
+        height = float(profile.get('height', 175))
+        age = int(profile.get('age', 30))
+        goal = profile.get('goal', 'balanced')
+        return (
+            weight,
+            height,
+            age,
+            profile.get('gender', 'male') == 'male',
+            ACTIVITY_MULTIPLIERS.get(profile.get('activity_level', 'moderate'), 1.2),
+            GOAL_ADJUSTMENTS.get(goal, 0),
+            1.8 if goal in ['bulk', 'cut'] else 1.2
+        )
+    except Exception as e:
+        raise BulkValidationError(f"Calculation error: {str(e)}")
+
+
+def _non_finite_error(value: float) -> str:
+    kind = "NaN" if math.isnan(value) else "infinity"
+    return f"Calculation error: cannot convert float {kind} to integer"
+
+
+def _record(errors: Dict[int, str], i: int, e: Exception) -> None:
+    # The scalar function stops at its first failing field; keep that one
+    errors.setdefault(i, f"Calculation error: {str(e)}")
+
+
+def _dict_rows(profiles: list, errors: Dict[int, str]) -> list:
+    """Profiles as dicts; other rows become {} (defaults) with their error recorded."""
+    if set(map(type, profiles)) <= {dict}:
+        return profiles
+    rows = []
+    for i, profile in enumerate(profiles):
+        if isinstance(profile, dict):
+            rows.append(profile)
+        elif isinstance(profile, BulkValidationError):
+            errors[i] = str(profile)
+            rows.append({})
+        else:
+            try:
+                _parse_row(profile)
+                rows.append(dict(profile))
+            except BulkValidationError as e:
+                errors[i] = str(e)
+                rows.append({})
+    return rows
+
+
+_NUMBER_TYPES = {int, float}
+
+
+def _number_column(values: list, convert, errors: Dict[int, str]) -> np.ndarray:
+    """float()/int() over one field as a float64 array.
+
+    Plain numbers go to numpy as they are; only the other values (strings,
+    None, NaN ages, ...) go through convert one by one. Rows convert rejects
+    get their error recorded and a 0 placeholder.
+    """
+    column = values
+    if not set(map(type, values)) <= _NUMBER_TYPES:
+        column = list(values)
+        for i in [i for i, v in enumerate(values) if type(v) not in _NUMBER_TYPES]:
+            try:
+                column[i] = convert(values[i])
+            except Exception as e:
+                _record(errors, i, e)
+                column[i] = 0
+    try:
+        array = np.array(column, dtype=np.float64)
+    except OverflowError:
+        # Ints too large for a float64; the scalar arithmetic raises the same error
+        array = np.zeros(len(column))
+        for i, v in enumerate(column):
+            try:
+                array[i] = float(v)
+            except OverflowError as e:
+                _record(errors, i, e)
+    if convert is int:
+        # int() truncates floats toward zero and raises on NaN and infinity
+        non_finite = np.flatnonzero(~np.isfinite(array)).tolist()
+        for i in non_finite:
+            try:
+                int(values[i])
+            except Exception as e:
+                _record(errors, i, e)
+        array[non_finite] = 0
+        array = np.trunc(array)
+    return array
+
+
+def _lookup_column(values: list, table: Dict, default: float, errors: Dict[int, str]) -> list:
+    try:
+        return [table.get(v, default) for v in values]
+    except TypeError:
+        # An unhashable value (list/dict) somewhere in the batch
+        column = []
+        for i, v in enumerate(values):
+            try:
+                column.append(table.get(v, default))
+            except TypeError as e:
+                _record(errors, i, e)
+                column.append(default)
+        return column
+
+
+def _calculate_batch(profiles: list) -> Tuple[List[list], Dict[int, str]]:
+    """Requirements for one batch as four int columns plus {row: error message}.
+
+    Fields are validated column by column in the scalar function's order, so
+    a row reports the same (first) error it would get there; rows with an
+    error hold placeholders in the columns.
+    """
+    errors = {}
+    rows = _dict_rows(profiles, errors)
+    weight = _number_column([p.get('weight', 70) for p in rows], float, errors)
+    height = _number_column([p.get('height', 175) for p in rows], float, errors)
+    age = _number_column([p.get('age', 30) for p in rows], int, errors)
+    is_male = np.array([p.get('gender', 'male') == 'male' for p in rows], dtype=bool)
+    activity = _lookup_column([p.get('activity_level', 'moderate') for p in rows], ACTIVITY_MULTIPLIERS, 1.2, errors)
+    goals = [p.get('goal', 'balanced') for p in rows]
+    adjustment = _lookup_column(goals, GOAL_ADJUSTMENTS, 0, errors)
+    protein_multiplier = [1.8 if goal in ['bulk', 'cut'] else 1.2 for goal in goals]
+
+    activity = np.asarray(activity, dtype=np.float64)
+    adjustment = np.asarray(adjustment, dtype=np.float64)
+    protein_multiplier = np.asarray(protein_multiplier, dtype=np.float64)
+
+    # Same operation order as the scalar function so results match bit for bit
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(is_male, 5.0, -161.0)
+    calories = bmr * activity + adjustment
+    protein = weight * protein_multiplier
+    carbs = (calories * 0.45) / 4
+    fat = (calories * 0.25) / 9
+
+    stacked = np.stack([calories, protein, carbs, fat])
+    finite = np.isfinite(stacked)
+    # round() raises on NaN/inf; report those rows the same way
+    for i in np.flatnonzero(~finite.all(axis=0)).tolist():
+        if i not in errors:
+            errors[i] = _non_finite_error(next(v for v in stacked[:, i].tolist() if not math.isfinite(v)))
+    # np.rint rounds half to even, like Python's round()
+    columns = np.rint(np.where(finite, stacked, 0)).astype(np.int64).tolist()
+    return columns, errors
+
+
+def _batches(profiles: Iterable) -> Iterator[list]:
+    if isinstance(profiles, list):
+        for start in range(0, len(profiles), BATCH_SIZE):
+            yield profiles[start:start + BATCH_SIZE]
+        return
+    batch = []
+    for profile in profiles:
+        batch.append(profile)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def calculate_nutrition_requirements_bulk(profiles: Iterable) -> Iterator[Dict]:
+    """Vectorized calculate_nutrition_requirements over many profiles.
+
+    Yields one dict per input, in order: the requirements, or {"error": ...}
+    for rows that fail validation, without failing the rest of the batch.
+    Inputs may also be BulkValidationError instances (e.g. unparseable NDJSON
+    lines), which are passed through as errors.
+    """
+    for batch in _batches(profiles):
+        columns, errors = _calculate_batch(batch)
+        for i, (calories, protein, carbs, fat) in enumerate(zip(*columns)):
+            if i in errors:
+                yield {"error": errors[i]}
+            else:
+                yield {"calories": calories, "protein": protein, "carbs": carbs, "fat": fat}
+
+
+_RESULT_JSON = '{"calories": %d, "protein": %d, "carbs": %d, "fat": %d}'
+
+
+def calculate_nutrition_requirements_bulk_json(profiles: Iterable) -> Iterator[Tuple[List[str], int]]:
+    """calculate_nutrition_requirements_bulk as JSON text: yields (lines, error_count) per batch.
+
+    Each line is what json.dumps would give for the corresponding result,
+    formatted straight from the result columns without a dict per row.
+    """
+    for batch in _batches(profiles):
+        columns, errors = _calculate_batch(batch)
+        lines = list(map(_RESULT_JSON.__mod__, zip(*columns)))
+        for i, message in errors.items():
+            lines[i] = json.dumps({"error": message})
+        yield lines, len(errors)
@@ -0,0 +1,306 @@
+"""Record and replay upstream calls ("cassettes") for offline, deterministic runs.
+
+UPSTREAM_CASSETTE_MODE selects the mode at startup:
+
+    capture   calls go to Together.ai/Gemini as usual; each response is saved
+              in <dir>/capture.sqlite3 under a digest of the normalized request
+    replay    no network: responses come from <dir>/cassette.pack
+
+Requests are normalized before hashing: images become the SHA-256 of their
+data, whitespace is collapsed, e-mail addresses and phone/ID numbers are
+replaced by placeholders, and a Gemini cachedContent name stands for the
+system instruction it holds (so cached and inline prefixes match). The same
+scrubbing is applied to everything stored, so neither the capture database
+nor the pack holds raw images or contact details.
+
+The pack is written from the capture database (`python cassettes.py pack`,
+or on first replay when it is missing or older). It is one file: a header, a
+sorted table of fixed-size (route, digest, offset, length, latency) records
+and the response bodies. Replay memory-maps it and binary-searches the table,
+so a lookup costs a few slices of shared page cache and every gunicorn
+worker reads the same pages. Misses raise UpstreamError 404, or with
+UPSTREAM_CASSETTE_MISS=any are served a recording of the same endpoint
+picked by the request digest (for load tests whose prompts vary).
+
+    python cassettes.py pack [--dir uploads/cassettes]
+    python cassettes.py list [--dir uploads/cassettes]
+"""
+import os
+import re
+import mmap
+import json
+import time
+import struct
+import logging
+import sqlite3
+import hashlib
+import argparse
+import threading
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from upstream_client import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CASSETT1"
+HEADER = struct.Struct("<8sQ")
+# route digest, request digest, body offset, body length, recorded latency (ms)
+RECORD = struct.Struct("<8s16sQIf")
+KEY_SIZE = 24
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE = re.compile(r"(?<![\w.])\+?\d{1,3}[\s.-]?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?![\w.])")
+LONG_NUMBER = re.compile(r"(?<![\w.])\d{12,19}(?![\w.])")
+# Request fields that do not change the response
+VOLATILE_FIELDS = {"ttl", "displayName"}
+
+
+def scrub(text: str) -> str:
+    """Replace e-mail addresses, phone numbers and card/ID-length numbers with placeholders."""
+    if "@" in text:
+        text = EMAIL.sub("<email>", text)
+    return LONG_NUMBER.sub("<number>", PHONE.sub("<phone>", text))
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text(text: str) -> str:
+    # Prompt prefixes repeat on every call; scrubbing dominates the cost of a key
+    return " ".join(scrub(text).split())
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return _normalize_text(value)
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        if "inline_data" in value:
+            blob = value["inline_data"]
+            return {"inline_data": {"mime_type": blob.get("mime_type"),
+                                    "sha256": hashlib.sha256(blob.get("data", "").encode()).hexdigest()}}
+        return {key: _normalize(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    return value
+
+
+def _scrub_response(value):
+    if isinstance(value, str):
+        return scrub(value)
+    if isinstance(value, list):
+        return [_scrub_response(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _scrub_response(item) for key, item in value.items()}
+    return value
+
+
+def route_key(upstream: str, path: str, stream: bool = False) -> bytes:
+    return hashlib.sha256(f"{upstream} {path}{' stream' if stream else ''}".encode()).digest()[:8]
+
+
+class _IndexKeys:
+    """The (route, digest) column of the pack's record table, as a sequence for bisect."""
+
+    def __init__(self, buffer, base: int, count: int):
+        self._buffer = buffer
+        self._base = base
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        start = self._base + i * RECORD.size
+        return self._buffer[start:start + KEY_SIZE]
+
+
+def write_pack(capture_path: str, pack_path: str) -> int:
+    """Write every captured response into a pack; returns the number of records."""
+    conn = sqlite3.connect(capture_path)
+    try:
+        rows = conn.execute("SELECT route, digest, response, latency_ms FROM recordings "
+                            "ORDER BY route, digest").fetchall()
+    finally:
+        conn.close()
+    data_start = HEADER.size + RECORD.size * len(rows)
+    tmp_path = f"{pack_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(rows)))
+        offset = data_start
+        for route, digest, response, latency_ms in rows:
+            f.write(RECORD.pack(route, digest, offset, len(response), latency_ms or 0.0))
+            offset += len(response)
+        for _, _, response, _ in rows:
+            f.write(response)
+    # Readers only ever see a complete pack
+    os.replace(tmp_path, pack_path)
+    return len(rows)
+
+
+class Cassette:
+    """Capture or replay store shared by the Together.ai and Gemini clients of one process."""
+
+    def __init__(self, directory: str, mode: str, miss: str = "error", latency_scale: float = 0.0):
+        if mode not in ("capture", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}; use capture or replay")
+        self.directory = directory
+        self.mode = mode
+        self.miss = miss
+        self.latency_scale = latency_scale
+        self.capture_path = os.path.join(directory, "capture.sqlite3")
+        self.pack_path = os.path.join(directory, "cassette.pack")
+        # cachedContent name -> the normalized system instruction it holds
+        self._cached_prefixes = {}
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "duplicates": 0, "hits": 0, "misses": 0, "substituted": 0}
+        os.makedirs(directory, exist_ok=True)
+        if mode == "capture":
+            self._conn = sqlite3.connect(self.capture_path, check_same_thread=False, timeout=10,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recordings ("
+                " route BLOB NOT NULL, digest BLOB NOT NULL, upstream TEXT NOT NULL, path TEXT NOT NULL,"
+                " request TEXT NOT NULL, response BLOB NOT NULL, latency_ms REAL, recorded_at REAL NOT NULL,"
+                " PRIMARY KEY (route, digest)) WITHOUT ROWID"
+            )
+        else:
+            self._open_pack()
+
+    def _open_pack(self) -> None:
+        if os.path.exists(self.capture_path):
+            # Recent captures may still be in the write-ahead log only
+            captured = max(os.path.getmtime(path) for path in (self.capture_path, f"{self.capture_path}-wal")
+                           if os.path.exists(path))
+            if not os.path.exists(self.pack_path) or os.path.getmtime(self.pack_path) < captured:
+                write_pack(self.capture_path, self.pack_path)
+        if not os.path.exists(self.pack_path):
+            raise FileNotFoundError(f"No cassette at {self.pack_path}; record one with UPSTREAM_CASSETTE_MODE=capture")
+        with open(self.pack_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.pack_path} is not a cassette pack")
+        self.count = count
+        self._keys = _IndexKeys(self._mmap, HEADER.size, count)
+
+    # ==============================================
+    # Keys
+    # ==============================================
+
+    def normalize(self, payload: Dict) -> Dict:
+        request = _normalize(payload)
+        cached = request.pop("cachedContent", None)
+        if cached is not None:
+            with self._lock:
+                prefix = self._cached_prefixes.get(cached)
+            request["systemInstruction"] = prefix if prefix is not None else {"cachedContent": cached}
+        return request
+
+    def key(self, upstream: str, path: str, payload: Dict, stream: bool = False) -> Tuple[bytes, bytes, Dict]:
+        request = self.normalize(payload)
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return route_key(upstream, path, stream), hashlib.sha256(canonical.encode()).digest()[:16], request
+
+    def _remember_prefix(self, path: str, request: Dict, response) -> None:
+        if path.endswith("/cachedContents") and isinstance(response, dict) and "name" in response:
+            with self._lock:
+                self._cached_prefixes[response["name"]] = request.get("systemInstruction")
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    # ==============================================
+    # Capture
+    # ==============================================
+
+    def record(self, upstream: str, path: str, payload: Dict, response, latency_ms: float,
+               stream: bool = False) -> None:
+        route, digest, request = self.key(upstream, path, payload, stream)
+        self._remember_prefix(path, request, response)
+        body = json.dumps(_scrub_response(response), separators=(",", ":"), ensure_ascii=False).encode()
+        try:
+            with self._lock:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (route, digest, upstream, path, json.dumps(request, sort_keys=True), body,
+                     latency_ms, time.time())
+                ).rowcount
+        except sqlite3.Error as e:
+            # Recording is best effort; the caller already has its response
+            logger.warning(f"Cassette capture failed for {upstream} {path}: {e}")
+            return
+        # The first response for a request is kept; replays stay deterministic
+        self._count("recorded" if inserted else "duplicates")
+
+    # ==============================================
+    # Replay
+    # ==============================================
+
+    def _lookup(self, route: bytes, digest: bytes) -> Optional[int]:
+        i = bisect_left(self._keys, route + digest)
+        if i < self.count and self._keys[i] == route + digest:
+            self._count("hits")
+            return i
+        if self.miss == "any":
+            low = bisect_left(self._keys, route)
+            high = bisect_right(self._keys, route + b"\xff" * 16)
+            if high > low:
+                self._count("substituted")
+                return low + int.from_bytes(digest[:8], "big") % (high - low)
+        self._count("misses")
+        return None
+
+    def replay(self, upstream: str, path: str, payload: Dict, stream: bool = False):
+        route, digest, request = self.key(upstream, path, payload, stream)
+        i = self._lookup(route, digest)
+        if i is None:
+            raise UpstreamError(f"{upstream} has no recorded response for this request (cassette replay)",
+                                status_code=404)
+        _, _, offset, length, latency_ms = RECORD.unpack_from(self._mmap, HEADER.size + i * RECORD.size)
+        if self.latency_scale:
+            time.sleep(latency_ms / 1000 * self.latency_scale)
+        response = json.loads(self._mmap[offset:offset + length])
+        self._remember_prefix(path, request, response)
+        return response
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["mode"] = self.mode
+        if self.mode == "replay":
+            stats["recordings"] = self.count
+            stats["miss"] = self.miss
+        return stats
+
+
+def list_recordings(directory: str) -> List[Tuple]:
+    conn = sqlite3.connect(os.path.join(directory, "capture.sqlite3"))
+    try:
+        return conn.execute("SELECT upstream, path, length(response), latency_ms, recorded_at, request "
+                            "FROM recordings ORDER BY recorded_at").fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["pack", "list"])
+    parser.add_argument("--dir", default=None, help="cassette directory (default: UPSTREAM_CASSETTE_DIR)")
+    args = parser.parse_args()
+    if args.dir is None:
+        from api.config import UPSTREAM_CASSETTE_DIR
+        args.dir = UPSTREAM_CASSETTE_DIR
+
+    if args.command == "pack":
+        count = write_pack(os.path.join(args.dir, "capture.sqlite3"), os.path.join(args.dir, "cassette.pack"))
+        print(f"packed {count} recordings into {os.path.join(args.dir, 'cassette.pack')}")
+        return
+    for upstream, path, size, latency_ms, recorded_at, request in list_recordings(args.dir):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recorded_at))}  {upstream:>8} {path:<40} "
+              f"{size:7d} B  {latency_ms or 0:8.1f} ms  {request[:80]}")
+
+
+if __name__ == "__main__":
+    main()
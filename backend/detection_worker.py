@@ -0,0 +1,127 @@
+"""Worker processes for asynchronous food detection jobs.
+
+POST /api/detect-food?async=1 validates and downscales the upload in the web
+process and queues it in JOB_QUEUE_PATH. Workers claim jobs from that queue
+and make the Gemini calls, so detection throughput scales with the number of
+workers instead of web threads. Run as many as the Gemini quota allows, on
+the host that holds the queue file:
+
+    python detection_worker.py
+    python detection_worker.py --processes 2 --threads 8
+
+SIGTERM/SIGINT let in-flight jobs finish. A worker killed outright leaves its
+job leased; another worker picks it up once JOB_LEASE_SECONDS have passed.
+"""
+import os
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from api import services
+from api.config import JOB_RESULT_TTL, METRICS_ENABLED, METRICS_DIR
+from api.detection import run_detection_job, DetectionParseError
+from instrumentation import REGISTRY
+from rate_limit import RateLimited
+from upstream_limits import UpstreamBusy
+
+logger = logging.getLogger("detection_worker")
+
+PURGE_INTERVAL = 60
+
+
+def process_job(queue, job):
+    try:
+        result = run_detection_job(job)
+    except RateLimited as e:
+        # Our Gemini bucket is empty or Gemini answered 429; try again once it refills.
+        # Throttling is not a failure of the job, so it does not use up an attempt
+        queue.retry(job["id"], e.retry_after, count_attempt=False)
+    except UpstreamBusy as e:
+        queue.retry(job["id"], getattr(e, "retry_after", 5), count_attempt=False)
+    except DetectionParseError as e:
+        logger.error(f"Job {job['id']}: failed to parse Gemini response: {str(e)}")
+        queue.fail(job["id"], "Failed to parse detection results",
+                   {"details": str(e), "raw_response": e.raw_response})
+    except Exception as e:
+        logger.error(f"Job {job['id']} attempt {job['attempts']} failed: {str(e)}")
+        if job["attempts"] < queue.max_attempts:
+            queue.retry(job["id"], min(60, 2 ** job["attempts"]))
+        else:
+            queue.fail(job["id"], "Food detection service unavailable")
+    else:
+        queue.complete(job["id"], result)
+
+
+def work(name, stop, poll_interval):
+    queue = services.job_queue()
+    while not stop.is_set():
+        job = queue.claim(name)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        process_job(queue, job)
+        REGISTRY.maybe_flush()
+
+
+def run_process(index, threads, poll_interval):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    # Worker metrics are only visible through the web workers' merged METRICS_DIR
+    REGISTRY.configure(METRICS_ENABLED and bool(METRICS_DIR), METRICS_DIR)
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    name = f"{os.uname().nodename}:{os.getpid()}"
+    pool = [threading.Thread(target=work, args=(f"{name}:{i}", stop, poll_interval), daemon=True)
+            for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    logger.info(f"Worker {index} started with {threads} threads")
+
+    queue = services.job_queue()
+    while not stop.wait(PURGE_INTERVAL):
+        purged = queue.purge(JOB_RESULT_TTL)
+        if purged:
+            logger.info(f"Purged {purged} finished jobs")
+    for thread in pool:
+        thread.join()
+    logger.info(f"Worker {index} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKERS", 1)))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("JOB_WORKER_THREADS", 4)),
+                        help="concurrent jobs per process (Gemini calls are I/O bound)")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds between polls of an empty queue")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Nothing is built before the fork; each process opens its own queue connection and clients
+    processes = [
+        multiprocessing.Process(target=run_process, args=(i, args.threads, args.poll_interval),
+                                name=f"detection-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # The terminal sent SIGINT to the whole group; the workers are already stopping
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import re
+import csv
+import logging
+from collections import defaultdict
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CSV = os.path.join(DATA_DIR, "indian_foods.csv")
+NUTRIENTS = ["calories", "protein_g", "carbs_g", "fats_g"]
+
+
+def normalize_name(name: str) -> str:
+    name = re.sub(r"[^a-z0-9 ]+", " ", str(name).lower())
+    return " ".join(name.split())
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class FoodDatabase:
+    """Per-100 g nutrition table with exact and trigram-fuzzy name lookup.
+
+    Only exact name/alias hits are authoritative. A fuzzy hit must also line
+    up word for word (every word on either side has a close counterpart on
+    the other), so "egg fried rice" does not resolve to "veg fried rice" and
+    "paneer tikka masala" not to "paneer tikka"; compute() still prefers the
+    LLM's own estimate over a fuzzy hit.
+
+    The CSV in data/ is the editable source. It is compiled once into a float32
+    .npy next to it, which is opened with mmap_mode="r" so forked workers share
+    the same pages instead of each holding a copy.
+    """
+
+    def __init__(self, csv_path: str = DEFAULT_CSV, min_similarity: float = 0.55,
+                 min_word_similarity: float = 0.5):
+        self.csv_path = csv_path
+        self.min_similarity = min_similarity
+        self.min_word_similarity = min_word_similarity
+        self.names = []
+        self._exact = {}
+        self._trigram_index = defaultdict(set)
+        self._alias_trigrams = []
+        self._alias_words = []
+        self._alias_entry = []
+
+        self._load_names()
+        self.table = self._load_table()
+
+    def _load_names(self) -> None:
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            for entry_id, row in enumerate(csv.DictReader(f)):
+                self.names.append(row["name"])
+                aliases = [row["name"]] + [a for a in row["aliases"].split("|") if a]
+                for alias in aliases:
+                    key = normalize_name(alias)
+                    self._exact.setdefault(key, entry_id)
+                    alias_id = len(self._alias_entry)
+                    grams = trigrams(key)
+                    self._alias_trigrams.append(grams)
+                    self._alias_words.append([trigrams(word) for word in key.split()])
+                    self._alias_entry.append(entry_id)
+                    for gram in grams:
+                        self._trigram_index[gram].add(alias_id)
+
+    def _load_table(self) -> np.ndarray:
+        npy_path = os.path.splitext(self.csv_path)[0] + ".npy"
+        stale = (not os.path.exists(npy_path)
+                 or os.path.getmtime(npy_path) < os.path.getmtime(self.csv_path))
+        if stale:
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                rows = [[float(row[n]) for n in NUTRIENTS] for row in csv.DictReader(f)]
+            table = np.asarray(rows, dtype=np.float32)
+            tmp_path = f"{npy_path}.{os.getpid()}.tmp.npy"
+            try:
+                np.save(tmp_path, table)
+                os.replace(tmp_path, npy_path)
+            except OSError as e:
+                # Read-only checkout: keep the in-memory copy
+                logger.warning(f"Could not write {npy_path}: {str(e)}")
+                return table
+        return np.load(npy_path, mmap_mode="r")
+
+    def _words_align(self, query_words: List[set], alias_words: List[set]) -> bool:
+        """Every word on each side has a close (typo-level) counterpart on the other."""
+        def covered(words, others):
+            return all(max(dice(w, o) for o in others) >= self.min_word_similarity for w in words)
+        return covered(query_words, alias_words) and covered(alias_words, query_words)
+
+    def lookup(self, name: str) -> Optional[Tuple[int, float]]:
+        """Return (entry_id, similarity) for the best match, or None; 1.0 means an exact hit."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key], 1.0
+
+        query = trigrams(key)
+        shared = defaultdict(int)
+        for gram in query:
+            for alias_id in self._trigram_index.get(gram, ()):
+                shared[alias_id] += 1
+        # Dice coefficient over trigram sets, best first
+        scored = sorted(
+            ((2 * count / (len(query) + len(self._alias_trigrams[alias_id])), alias_id)
+             for alias_id, count in shared.items()),
+            reverse=True
+        )
+        query_words = [trigrams(word) for word in key.split()]
+        for score, alias_id in scored:
+            if score < self.min_similarity:
+                break
+            if self._words_align(query_words, self._alias_words[alias_id]):
+                return self._alias_entry[alias_id], min(score, 0.99)
+        return None
+
+    def compute(self, foods: List[Dict]) -> List[Dict]:
+        """Fill nutrients for each {"name", "weight_g"} from the table.
+
+        Exact matches are computed in one vectorized step (source="db"). A
+        fuzzy match is only used when the LLM gave no estimate, and is then
+        flagged source="db_fuzzy" with its similarity. Everything else keeps
+        whatever values the LLM supplied (source="llm"), or zeros
+        (source="unknown").
+        """
+        matches = [self.lookup(food.get("name", "")) for food in foods]
+        for i, match in enumerate(matches):
+            if match is not None and match[1] < 1.0 and _valid_estimate(foods[i].get("estimate")):
+                matches[i] = None
+        matched = [i for i, m in enumerate(matches) if m is not None]
+
+        if matched:
+            ids = np.fromiter((matches[i][0] for i in matched), dtype=np.intp, count=len(matched))
+            weights = np.fromiter((_to_float(foods[i].get("weight_g")) for i in matched),
+                                  dtype=np.float64, count=len(matched))
+            values = np.round(self.table[ids].astype(np.float64) * weights[:, None] / 100, 1).tolist()
+            for i, row in zip(matched, values):
+                entry_id, similarity = matches[i]
+                foods[i].update(dict(zip(NUTRIENTS, row)))
+                foods[i]["matched_name"] = self.names[entry_id]
+                if similarity < 1.0:
+                    foods[i]["source"] = "db_fuzzy"
+                    foods[i]["match_similarity"] = round(similarity, 2)
+                else:
+                    foods[i]["source"] = "db"
+
+        for i, food in enumerate(foods):
+            if matches[i] is not None:
+                continue
+            estimate = food.pop("estimate", None)
+            if _valid_estimate(estimate):
+                food.update({n: _to_float(v) for n, v in zip(NUTRIENTS, estimate)})
+                food["source"] = "llm"
+            elif all(n in food for n in NUTRIENTS):
+                food["source"] = "llm"
+            else:
+                for n in NUTRIENTS:
+                    food.setdefault(n, 0)
+                food["source"] = "unknown"
+        for food in foods:
+            food.pop("estimate", None)
+        return foods
+
+    def info(self) -> Dict:
+        return {
+            "entries": len(self.names),
+            "aliases": len(self._alias_entry),
+            "memory_mapped": isinstance(self.table, np.memmap)
+        }
+
+
+def _valid_estimate(estimate) -> bool:
+    return isinstance(estimate, list) and len(estimate) == len(NUTRIENTS)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
@@ -0,0 +1,80 @@
+"""Production entry point for the backend.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py model:app
+
+The gevent worker runs every request in a greenlet, so slow Together.ai and
+Gemini calls (both made over patched sockets) yield instead of pinning a
+worker thread. One process can hold WORKER_CONNECTIONS in-flight requests;
+UpstreamLimiter (api/services.py) bounds how many of those reach each provider.
+
+Workers default to one per usable CPU. The app is imported once in the master
+(preload_app) and forked, so code and read-only data are shared copy-on-write;
+provider clients and caches are built lazily inside each worker. Workers are
+recycled after MAX_REQUESTS requests (with jitter so they do not all restart
+at once) to hand back memory that PIL decoding leaves fragmented.
+
+Reloads:
+    kill -HUP <master pid>      restart workers gracefully (config changes only;
+                                with preload_app the code is not re-imported)
+    python reload_server.py     zero-downtime code deploy: starts a new master
+                                with USR2, waits until it serves, then stops the
+                                old one gracefully with TERM
+
+Never use `python model.py` in production: that is Flask's single-process
+development server with the debugger and reloader.
+"""
+import os
+
+worker_class = os.getenv("WORKER_CLASS", "gevent")
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+
+if worker_class == "gevent" and preload_app:
+    # The app is imported in the master before gevent's worker would patch;
+    # patch first so ssl/socket/threading imported by the app are cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def _cpu_count():
+    try:
+        # Respects taskset/cgroup CPU affinity, unlike os.cpu_count()
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv("BIND", "0.0.0.0:5050")
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))
+
+max_requests = int(os.getenv("MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", max_requests // 10))
+
+# LLM calls routinely take 10+ seconds; keep the arbiter from killing workers mid-call
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Code reloading on file changes is for development only
+reload = False
+pidfile = os.getenv("PIDFILE", "gunicorn.pid")
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Metric snapshots left by a previous master would be merged into this one's
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def post_worker_init(worker):
+    # The Werkzeug debugger must never be reachable from a production worker
+    worker.wsgi.debug = False
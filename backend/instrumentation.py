@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+FLUSH_INTERVAL = 5.0
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {"type": self.kind, "help": self.help, "labels": list(self.labels), "values": values}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        if self.registry.enabled:
+            self.observe_key(value, self._key(labels))
+
+    def observe_key(self, value: float, key: Tuple) -> None:
+        """observe() with the label values already in label order."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self) -> Dict:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        with self._lock:
+            snapshot["values"] = [[labels, list(counts)] for labels, counts in snapshot["values"]]
+        return snapshot
+
+
+class Registry:
+    """Process-wide metrics with Prometheus text exposition.
+
+    Every metric method returns at once while the registry is disabled. With
+    `directory` set, each process periodically writes its values to
+    <directory>/<pid>.json and render() merges the files of all processes,
+    so any gunicorn worker can answer a scrape for the whole server.
+    Counters and histograms of exited workers are kept; their gauges are not.
+    """
+
+    def __init__(self, enabled: bool = True, directory: Optional[str] = None):
+        self.enabled = enabled
+        self.directory = directory
+        self._metrics = {}
+        self._last_flush = 0.0
+
+    def configure(self, enabled: bool, directory: Optional[str] = None) -> None:
+        self.enabled = enabled
+        self.directory = directory or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._add(Counter(self, name, help, labels))
+
+    def gauge(self, name, help, labels=()) -> Gauge:
+        return self._add(Gauge(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self, name, help, labels, buckets))
+
+    def snapshot(self) -> Dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def flush(self) -> None:
+        """Write this process's values for the other workers to merge."""
+        if not (self.enabled and self.directory):
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def maybe_flush(self) -> None:
+        if self.directory and time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def _collect(self) -> Dict:
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(int(filename[:-5])) if filename[:-5].isdigit() else False
+            for name, metric in snapshot.items():
+                if metric["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**metric, "values": {}})
+                for labels, value in metric["values"]:
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        current = target["values"].get(key) or [0] * len(value)
+                        target["values"][key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target["values"][key] = target["values"].get(key, 0) + value
+        for metric in merged.values():
+            metric["values"] = [[list(key), value] for key, value in metric["values"].items()]
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self._collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in sorted(metric["values"]):
+                pairs = list(zip(metric["labels"], labels))
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                    continue
+                running = 0
+                for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+                    running += count
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(pairs + [('le', le)])} {running}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {running}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+# ==============================================
+# Application metrics
+# ==============================================
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "app_stage_seconds", "Time spent in each stage of a request", ["operation", "stage"]
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "app_http_requests_total", "HTTP requests by endpoint and status", ["endpoint", "status"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "app_http_request_seconds", "HTTP request handling time (to first byte for streams)", ["endpoint"]
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "app_http_requests_in_flight", "HTTP requests being handled", ["endpoint"]
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "app_upstream_calls_in_flight", "Provider calls waiting for an answer", ["upstream"]
+)
+UPSTREAM_TOKENS = REGISTRY.counter(
+    "app_upstream_tokens_total", "Tokens reported by the providers", ["upstream", "model", "kind"]
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "app_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+ERRORS = REGISTRY.counter(
+    "app_errors_total", "Failed requests by operation and cause", ["operation", "cause"]
+)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("key", "start")
+
+    def __init__(self, operation: str, stage: str):
+        self.key = (operation, stage)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe_key(time.perf_counter() - self.start, self.key)
+        return False
+
+
+def timed(operation: str, stage: str):
+    """Context manager timing one stage into app_stage_seconds; a no-op while disabled.
+
+        with timed("detection", "gemini_call"):
+            ...
+    """
+    return _StageTimer(operation, stage) if REGISTRY.enabled else _NULL_TIMER
+
+
+def timed_stage(operation: str, stage: str):
+    """Decorator form of timed()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(operation, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,199 @@
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional
+
+TERMINAL_STATES = ("done", "failed")
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class JobQueue:
+    """Durable job queue in a local SQLite file, shared by web and worker processes.
+
+    Payloads are small JSON documents; image bytes are kept next to the
+    database as one file per job and removed once the job finishes. A worker
+    claims a job under a lease: if it dies mid-job the lease expires and
+    another worker picks the job up again, up to `max_attempts` times.
+    """
+
+    def __init__(self, path: str, blob_dir: str, max_attempts: int = 5,
+                 lease_seconds: float = 120, max_queued: int = 1000, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.blob_dir = blob_dir
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.max_queued = max_queued
+        # Wall-clock seconds; the lease and retry times live in a file shared across processes
+        self.clock = clock
+        os.makedirs(blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL, lease_until REAL,"
+            " worker TEXT, created REAL NOT NULL, finished REAL, result TEXT, error TEXT, owner TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            # Queue files created before jobs were scoped to a user
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _blob_path(self, job_id: str) -> str:
+        return os.path.join(self.blob_dir, f"{job_id}.bin")
+
+    def _remove_blob(self, job_id: str) -> None:
+        try:
+            os.remove(self._blob_path(job_id))
+        except OSError:
+            pass
+
+    def enqueue(self, kind: str, payload: Dict, blob: Optional[bytes] = None, owner: Optional[str] = None) -> str:
+        """Store a job and return its id; raises QueueFull past `max_queued` waiting jobs.
+
+        `owner` is the user the job belongs to (None for anonymous callers);
+        get() reports it so the status endpoint can hide other users' jobs.
+        """
+        job_id = uuid.uuid4().hex
+        if blob is not None:
+            # Written before the row exists so a worker never claims a job without its image
+            with open(self._blob_path(job_id), "wb") as f:
+                f.write(blob)
+        now = self.clock()
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                self._remove_blob(job_id)
+                raise QueueFull(f"{queued} jobs are already waiting")
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, available_at, created, owner)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now, owner)
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Lease the oldest ready job (or one whose lease expired); None if there is none."""
+        now = self.clock()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so two workers never claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM jobs"
+                    " WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY available_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?"
+                        " WHERE id = ?",
+                        (now + self.lease_seconds, worker, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job_id, kind, payload, attempts = row
+        if attempts >= self.max_attempts:
+            self.fail(job_id, f"Gave up after {attempts} attempts")
+            return self.claim(worker)
+        try:
+            with open(self._blob_path(job_id), "rb") as f:
+                blob = f.read()
+        except OSError:
+            blob = None
+        return {"id": job_id, "kind": kind, "payload": json.loads(payload), "attempts": attempts + 1, "blob": blob}
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, self.clock(), job_id)
+            )
+        self._remove_blob(job_id)
+
+    def complete(self, job_id: str, result: Dict) -> None:
+        self._finish(job_id, "done", result, None)
+
+    def fail(self, job_id: str, error: str, details: Optional[Dict] = None) -> None:
+        self._finish(job_id, "failed", details, error)
+
+    def retry(self, job_id: str, delay: float, count_attempt: bool = True) -> None:
+        """Put a claimed job back to run again after `delay` seconds.
+
+        With count_attempt=False the claim is handed back (attempts is
+        decremented), for deferrals such as throttling where the job itself
+        did not fail and should not use up max_attempts.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ?, lease_until = NULL,"
+                " attempts = MAX(attempts - ?, 0) WHERE id = ?",
+                (self.clock() + delay, 0 if count_attempt else 1, job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kind, status, attempts, created, finished, result, error, owner FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        kind, status, attempts, created, finished, result, error, owner = row
+        job = {"job_id": job_id, "kind": kind, "status": status, "attempts": attempts, "created_at": created,
+               "owner": owner}
+        if finished is not None:
+            job["finished_at"] = finished
+        if status == "done":
+            job["result"] = json.loads(result)
+        elif status == "failed":
+            job["error"] = error
+            if result is not None:
+                job["details"] = json.loads(result)
+        return job
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Long-poll: return the job once it finishes or `timeout` seconds pass."""
+        if not math.isfinite(timeout):
+            raise ValueError("timeout must be a finite number of seconds")
+        deadline = time.monotonic() + timeout
+        interval = 0.05
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATES or remaining <= 0:
+                return job
+            # Workers run in other processes, so there is nothing to wait on but the file
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, 1.0)
+
+    def purge(self, max_age: float) -> int:
+        """Drop finished jobs older than `max_age` seconds; returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (self.clock() - max_age,)
+            )
+            return cursor.rowcount
+
+    def info(self) -> Dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = self._conn.execute("SELECT MIN(created) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        info = {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")}
+        info["oldest_queued_age_s"] = round(self.clock() - oldest, 1) if oldest else 0.0
+        info["max_queued"] = self.max_queued
+        return info
@@ -0,0 +1,286 @@
+import math
+import base64
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+NUTRIENTS = ("calories", "protein", "carbs", "fats")
+# Food items use the detection result's field names
+FOOD_NUTRIENTS = ("calories", "protein_g", "carbs_g", "fats_g")
+ROLLUP_TABLES = {"day": "daily_rollups", "week": "weekly_rollups"}
+
+
+class MealNotFound(LookupError):
+    pass
+
+
+def parse_consumed_at(value: Optional[str]) -> datetime:
+    """ISO 8601 timestamp -> aware datetime; naive times are taken as UTC, None as now."""
+    if not value:
+        return datetime.now(timezone.utc)
+    try:
+        moment = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("consumed_at must be an ISO 8601 timestamp")
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def period_keys(moment: datetime) -> Tuple[str, str]:
+    """(day, week) the meal counts towards: the local date it was eaten and its ISO week's Monday."""
+    day = moment.date()
+    return day.isoformat(), (day - timedelta(days=day.weekday())).isoformat()
+
+
+def encode_cursor(consumed_ts: float, meal_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{consumed_ts!r}:{meal_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        consumed_ts, meal_id = raw.split(":")
+        return float(consumed_ts), int(meal_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_meal(meal: Dict) -> None:
+    """Raise ValueError unless `foods` holds objects with a string name and numeric nutrients."""
+    foods = meal.get("foods") or []
+    if not isinstance(foods, list):
+        raise ValueError("foods must be a list")
+    for index, food in enumerate(foods):
+        if not isinstance(food, dict):
+            raise ValueError(f"foods[{index}] must be an object")
+        if not isinstance(food.get("name"), str) or not food["name"].strip():
+            raise ValueError(f"foods[{index}].name must be a non-empty string")
+        for field in ("weight_g",) + FOOD_NUTRIENTS:
+            if food.get(field) is not None and not _is_number(food[field]):
+                raise ValueError(f"foods[{index}].{field} must be a number")
+    total = meal.get("total") or {}
+    if not isinstance(total, dict):
+        raise ValueError("total must be an object")
+    fields = [(n, meal.get(n)) for n in NUTRIENTS] + [(f"total.{f}", total.get(f)) for f in FOOD_NUTRIENTS]
+    for name, value in fields:
+        if value is not None and not _is_number(value):
+            raise ValueError(f"{name} must be a number")
+
+
+def _number(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MealHistory:
+    """Per-user meal log in a local SQLite file, with nutrient rollups.
+
+    Every insert and delete adjusts the user's daily_rollups and
+    weekly_rollups rows in the same transaction, so a dashboard reads one row
+    per day or week instead of summing every logged food. Pages are read by
+    keyset on (consumed_at, id), newest first, and each page comes back from
+    a single query joining the meals with their foods.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meals ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, meal_type TEXT, meal_name TEXT,"
+            " image_path TEXT, calories REAL NOT NULL, protein REAL NOT NULL, carbs REAL NOT NULL,"
+            " fats REAL NOT NULL, consumed_at TEXT NOT NULL, consumed_ts REAL NOT NULL, day TEXT NOT NULL,"
+            " week TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS meals_by_user ON meals (user_id, consumed_ts DESC, id DESC);"
+            "CREATE INDEX IF NOT EXISTS meals_by_image ON meals (image_path);"
+            "CREATE TABLE IF NOT EXISTS meal_foods ("
+            " meal_id INTEGER NOT NULL REFERENCES meals (id) ON DELETE CASCADE, position INTEGER NOT NULL,"
+            " name TEXT, weight_g REAL, calories REAL, protein_g REAL, carbs_g REAL, fats_g REAL,"
+            " PRIMARY KEY (meal_id, position)) WITHOUT ROWID;"
+            + "".join(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f" user_id TEXT NOT NULL, period TEXT NOT NULL, meals INTEGER NOT NULL, calories REAL NOT NULL,"
+                f" protein REAL NOT NULL, carbs REAL NOT NULL, fats REAL NOT NULL,"
+                f" PRIMARY KEY (user_id, period)) WITHOUT ROWID;"
+                for table in ROLLUP_TABLES.values()
+            )
+        )
+
+    def _adjust_rollups(self, user_id: str, day: str, week: str, sign: int, totals: Tuple) -> None:
+        for table, period in ((ROLLUP_TABLES["day"], day), (ROLLUP_TABLES["week"], week)):
+            self._conn.execute(
+                f"INSERT INTO {table} (user_id, period, meals, calories, protein, carbs, fats)"
+                f" VALUES (?, ?, ?, ?, ?, ?, ?)"
+                f" ON CONFLICT (user_id, period) DO UPDATE SET meals = meals + excluded.meals,"
+                f" calories = calories + excluded.calories, protein = protein + excluded.protein,"
+                f" carbs = carbs + excluded.carbs, fats = fats + excluded.fats",
+                (user_id, period, sign, *(sign * value for value in totals))
+            )
+            self._conn.execute(f"DELETE FROM {table} WHERE user_id = ? AND period = ? AND meals <= 0",
+                               (user_id, period))
+
+    def add_meal(self, user_id: str, meal: Dict) -> Dict:
+        """Store a meal and its foods; totals default to the sum over the foods.
+
+        `meal` takes the fields the frontend saved to Supabase (meal_type,
+        meal_name, image_path, consumed_at, calories/protein/carbs/fats) plus
+        `foods`, or a detection result with its "total" block. Raises
+        ValueError for malformed foods or totals (see validate_meal).
+        """
+        validate_meal(meal)
+        foods = meal.get("foods") or []
+        total = meal.get("total") or {}
+        sums = [sum(_number(food.get(field)) for food in foods) for field in FOOD_NUTRIENTS]
+        totals = tuple(
+            round(_number(meal.get(nutrient, total.get(field, sums[i]))), 1)
+            for i, (nutrient, field) in enumerate(zip(NUTRIENTS, FOOD_NUTRIENTS))
+        )
+        moment = parse_consumed_at(meal.get("consumed_at"))
+        day, week = period_keys(moment)
+        now = datetime.now(timezone.utc).timestamp()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                meal_id = self._conn.execute(
+                    "INSERT INTO meals (user_id, meal_type, meal_name, image_path, calories, protein, carbs, fats,"
+                    " consumed_at, consumed_ts, day, week, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, meal.get("meal_type"), meal.get("meal_name"), meal.get("image_path"), *totals,
+                     moment.isoformat(), moment.timestamp(), day, week, now)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO meal_foods (meal_id, position, name, weight_g, calories, protein_g, carbs_g, fats_g)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(meal_id, position, food.get("name"), _number(food.get("weight_g")),
+                      *(_number(food.get(field)) for field in FOOD_NUTRIENTS))
+                     for position, food in enumerate(foods)]
+                )
+                self._adjust_rollups(user_id, day, week, 1, totals)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get_meal(user_id, meal_id)
+
+    def delete_meal(self, user_id: str, meal_id: int) -> Optional[str]:
+        """Remove a meal, its foods and its share of the rollups; returns its image_path or raises MealNotFound."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT day, week, calories, protein, carbs, fats, image_path FROM meals"
+                    " WHERE id = ? AND user_id = ?",
+                    (meal_id, user_id)
+                ).fetchone()
+                if row is None:
+                    raise MealNotFound(meal_id)
+                self._conn.execute("DELETE FROM meals WHERE id = ?", (meal_id,))
+                self._adjust_rollups(user_id, row[0], row[1], -1, row[2:6])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row[6]
+
+    def image_in_use(self, image_path: str) -> bool:
+        """Whether any user's meal still shows this image."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM meals WHERE image_path = ? LIMIT 1", (image_path,)
+            ).fetchone() is not None
+
+    def user_has_image(self, user_id: str, image_path: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM meals WHERE image_path = ? AND user_id = ? LIMIT 1", (image_path, user_id)
+            ).fetchone() is not None
+
+    def _fetch(self, where: str, params: Tuple, limit: int) -> List[Dict]:
+        # One statement per page: the page of meals joined with all of their foods
+        rows = self._conn.execute(
+            "WITH page AS (SELECT * FROM meals WHERE " + where + " ORDER BY consumed_ts DESC, id DESC LIMIT ?)"
+            " SELECT page.id, page.meal_type, page.meal_name, page.image_path, page.calories, page.protein,"
+            " page.carbs, page.fats, page.consumed_at, page.consumed_ts, f.name, f.weight_g, f.calories,"
+            " f.protein_g, f.carbs_g, f.fats_g FROM page LEFT JOIN meal_foods f ON f.meal_id = page.id"
+            " ORDER BY page.consumed_ts DESC, page.id DESC, f.position",
+            (*params, limit)
+        ).fetchall()
+        meals = []
+        for row in rows:
+            if not meals or meals[-1]["id"] != row[0]:
+                meals.append({
+                    "id": row[0], "meal_type": row[1], "meal_name": row[2], "image_path": row[3],
+                    "calories": row[4], "protein": row[5], "carbs": row[6], "fats": row[7],
+                    "consumed_at": row[8], "foods": [], "_ts": row[9]
+                })
+            if row[10] is not None:
+                meals[-1]["foods"].append({
+                    "name": row[10], "weight_g": row[11], "calories": row[12],
+                    "protein_g": row[13], "carbs_g": row[14], "fats_g": row[15]
+                })
+        return meals
+
+    def get_meal(self, user_id: str, meal_id: int) -> Dict:
+        with self._lock:
+            meals = self._fetch("user_id = ? AND id = ?", (user_id, meal_id), 1)
+        if not meals:
+            raise MealNotFound(meal_id)
+        meals[0].pop("_ts")
+        return meals[0]
+
+    def list_meals(self, user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                   meal_type: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """One page of meals with their foods, newest first, and the cursor for the next page (or None)."""
+        where, params = "user_id = ?", [user_id]
+        if meal_type:
+            where += " AND meal_type = ?"
+            params.append(meal_type)
+        if cursor:
+            where += " AND (consumed_ts, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        with self._lock:
+            # One extra row tells whether there is a next page
+            meals = self._fetch(where, tuple(params), limit + 1)
+        next_cursor = encode_cursor(meals[limit - 1]["_ts"], meals[limit - 1]["id"]) if len(meals) > limit else None
+        meals = meals[:limit]
+        for meal in meals:
+            meal.pop("_ts")
+        return meals, next_cursor
+
+    def rollups(self, user_id: str, period: str = "day", start: Optional[str] = None,
+                end: Optional[str] = None) -> List[Dict]:
+        """Nutrient totals per day or week (keyed by its Monday), oldest first; start/end are inclusive dates."""
+        if period not in ROLLUP_TABLES:
+            raise ValueError("period must be day or week")
+        where, params = "user_id = ?", [user_id]
+        if start:
+            if period == "week":
+                # A week that starts before `start` still has days inside the range
+                start = period_keys(datetime.fromisoformat(start))[1]
+            where += " AND period >= ?"
+            params.append(start)
+        if end:
+            where += " AND period <= ?"
+            params.append(end)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT period, meals, calories, protein, carbs, fats FROM {ROLLUP_TABLES[period]}"
+                f" WHERE {where} ORDER BY period", params
+            ).fetchall()
+        return [
+            {period: row[0], "meals": row[1], **{n: round(v, 1) for n, v in zip(NUTRIENTS, row[2:])}}
+            for row in rows
+        ]
+
+    def info(self) -> Dict:
+        with self._lock:
+            meals, users = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT user_id) FROM meals").fetchone()
+        return {"meals": meals, "users": users}
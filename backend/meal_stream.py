@@ -0,0 +1,106 @@
+import json
+from typing import Iterator, Tuple
+
+from response_decoding import repair_json
+
+
+class IncrementalSectionParser:
+    """Emit top-level JSON members as soon as each value closes.
+
+    Text is fed in arbitrary chunks (as tokens arrive from a streamed
+    completion). Anything before the first '{' is ignored, so a chatty preamble
+    or ```json fence does not break parsing. Only one pass is made over the
+    input; each completed value is handed to json.loads on its own.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._current_key = None
+        self._value_start = None
+        self._position = 0
+        self._text = ""
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, object]]:
+        """Consume a chunk and yield (key, value) for every member it completes."""
+        if self._finished or not chunk:
+            return
+        self._text += chunk
+        text = self._text
+
+        while self._position < len(text):
+            i = self._position
+            ch = text[i]
+            self._position += 1
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._depth == 1 and self._current_key is not None and self._value_start is None:
+                    self._value_start = i
+            elif ch == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif ch in "[{":
+                if self._depth == 1 and self._current_key is not None and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    # Closing brace of the whole object may end a scalar value
+                    yield from self._emit(text, i)
+                    self._finished = True
+                    return
+                if self._depth == 1 and self._value_start is not None:
+                    yield from self._emit(text, i + 1)
+            elif ch == "," and self._depth == 1:
+                yield from self._emit(text, i)
+            elif (self._depth == 1 and self._current_key is not None
+                  and self._value_start is None and not ch.isspace()):
+                # Start of a scalar (number, true/false/null)
+                self._value_start = i
+
+    def _emit(self, text: str, end: int) -> Iterator[Tuple[str, object]]:
+        key, start = self._current_key, self._value_start
+        self._current_key = None
+        self._value_start = None
+        if key is None or start is None:
+            return
+        raw = text[start:end].strip()
+        if not raw:
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            # Same repair as the non-streaming path ("15g", trailing commas, ...)
+            try:
+                value = json.loads(repair_json(raw))
+            except ValueError:
+                return
+        yield key, value
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
@@ -0,0 +1,164 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, List
+
+from resilience import DeadlineExceeded
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class LatencyHistogram:
+    """Cumulative latency counts per upper bound (Prometheus-style buckets)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def info(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            cumulative[f"le_{bound}"] = running
+        return {"buckets": cumulative, "count": self.count, "sum_s": round(self.sum, 3)}
+
+
+def outcome_for(error: Exception) -> str:
+    if isinstance(error, DeadlineExceeded):
+        return "timeout"
+    if isinstance(error, ValueError):
+        return "parse_error"
+    return "upstream_error"
+
+
+class ModelStats:
+    """Outcomes of recent calls to one model plus its all-time latency histogram."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.recent = deque(maxlen=200)  # (finished_at, seconds, ok)
+        self.histogram = LatencyHistogram()
+        self.counts = {"ok": 0, "timeout": 0, "parse_error": 0, "upstream_error": 0}
+
+    def record(self, seconds: float, outcome: str, now: float) -> None:
+        self.recent.append((now, seconds, outcome == "ok"))
+        self.histogram.observe(seconds)
+        self.counts[outcome] += 1
+
+    def snapshot(self, now: float):
+        """(samples, error rate, p95 latency of successes) over the window."""
+        recent = [(seconds, ok) for finished_at, seconds, ok in self.recent if now - finished_at <= self.window]
+        if not recent:
+            return 0, 0.0, None
+        errors = sum(1 for _, ok in recent if not ok)
+        latencies = sorted(seconds for seconds, ok in recent if ok)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return len(recent), errors / len(recent), p95
+
+
+class ModelRouter:
+    """Orders the configured models for each request from live stats.
+
+    A model is unhealthy when over `max_error_rate` of its calls in the last
+    `window` seconds failed (timeouts, upstream errors or unparseable plans),
+    and over budget when its recent p95 exceeds `latency_budget`. Healthy,
+    in-budget models come first, ranked by the policy:
+
+        cost     cheapest first, configured order breaks ties
+        latency  lowest recent p95 first (untried models count as fast)
+        order    configured order
+
+    Unhealthy models are kept at the end as a last resort; once their bad
+    samples age out of the window they are tried again. Models of size
+    "small" are only used for simple requests, and then first, when
+    small_for_simple is set.
+    """
+
+    def __init__(self, routes: List[Dict], policy: str = "cost", latency_budget: float = 20,
+                 max_error_rate: float = 0.5, min_samples: int = 5, window: float = 300,
+                 max_models: int = 3, small_for_simple: bool = False):
+        self.routes = routes
+        self.policy = policy
+        self.latency_budget = latency_budget
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.max_models = max_models
+        self.small_for_simple = small_for_simple
+        self._stats = {route["model"]: ModelStats(window) for route in routes}
+        self._lock = threading.Lock()
+
+    def plan(self, simple: bool = False) -> List[str]:
+        """Models to try for one request, in order."""
+        now = time.monotonic()
+        with self._lock:
+            snapshots = {model: stats.snapshot(now) for model, stats in self._stats.items()}
+        use_small = self.small_for_simple and simple
+
+        def rank(item):
+            index, route = item
+            samples, error_rate, p95 = snapshots[route["model"]]
+            unhealthy = samples >= self.min_samples and error_rate > self.max_error_rate
+            over_budget = p95 is not None and p95 > self.latency_budget
+            prefer_small = use_small and route.get("size") != "small"
+            if self.policy == "cost":
+                score = route.get("cost", 0)
+            elif self.policy == "latency":
+                score = p95 or 0
+            else:
+                score = 0
+            return unhealthy, over_budget, prefer_small, score, index
+
+        # Small models only ever serve simple requests
+        candidates = [(index, route) for index, route in enumerate(self.routes)
+                      if use_small or route.get("size") != "small"] or list(enumerate(self.routes))
+        ordered = sorted(candidates, key=rank)
+        return [route["model"] for _, route in ordered[:self.max_models]]
+
+    def record(self, model: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            self._stats[model].record(seconds, outcome, time.monotonic())
+
+    def info(self) -> Dict:
+        now = time.monotonic()
+        models = {}
+        with self._lock:
+            for route in self.routes:
+                stats = self._stats[route["model"]]
+                samples, error_rate, p95 = stats.snapshot(now)
+                models[route["model"]] = {
+                    "cost": route.get("cost", 0),
+                    "size": route.get("size"),
+                    **stats.counts,
+                    "recent_samples": samples,
+                    "recent_error_rate": round(error_rate, 3),
+                    "recent_p95_s": round(p95, 3) if p95 is not None else None,
+                    "latency": stats.histogram.info()
+                }
+        return {"policy": self.policy, "order": self.plan(), "models": models}
+
+
+def parse_routes(spec: str, known: Dict[str, Dict]) -> List[Dict]:
+    """"model[=cost[:size]],..." -> routes; known models fill in what is left out."""
+    routes = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, options = entry.partition("=")
+        route = {"model": model, "cost": 0.0, "size": "large", **known.get(model, {})}
+        if options:
+            cost, _, size = options.partition(":")
+            route["cost"] = float(cost)
+            if size:
+                route["size"] = size
+        routes.append(route)
+    return routes
@@ -0,0 +1,122 @@
+import threading
+from collections import deque
+from typing import Optional, Dict, Tuple
+
+from PIL import Image
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """Difference hash: compare adjacent pixels of a small grayscale thumbnail."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class _BKNode:
+    __slots__ = ("hash", "items", "children")
+
+    def __init__(self, hash_value: int):
+        self.hash = hash_value
+        self.items = []
+        self.children = {}
+
+
+class BKTree:
+    """BK-tree over 64-bit perceptual hashes using Hamming distance."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, hash_value: int, item) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = _BKNode(hash_value)
+            self.root.items.append(item)
+            return
+
+        node = self.root
+        while True:
+            d = hamming(hash_value, node.hash)
+            if d == 0:
+                node.items.append(item)
+                return
+            child = node.children.get(d)
+            if child is None:
+                child = _BKNode(hash_value)
+                child.items.append(item)
+                node.children[d] = child
+                return
+            node = child
+
+    def search(self, hash_value: int, max_distance: int):
+        """Yield (distance, item) for every stored hash within max_distance."""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(hash_value, node.hash)
+            if d <= max_distance:
+                for item in node.items:
+                    yield d, item
+            for child_d, child in node.children.items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+
+
+class NearDuplicateIndex:
+    """Bounded index of previous detection results, looked up by dHash distance."""
+
+    def __init__(self, threshold: int = 6, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._tree = BKTree()
+        self._order = deque()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def lookup(self, hash_value: int, context: str) -> Optional[Tuple[int, Dict]]:
+        """Return (distance, result) of the closest match sharing the same context."""
+        if self.threshold < 0:
+            return None
+        with self._lock:
+            best = None
+            for d, (item_context, result) in self._tree.search(hash_value, self.threshold):
+                if item_context == context and (best is None or d < best[0]):
+                    best = (d, result)
+            self.stats["hits" if best else "misses"] += 1
+            return best
+
+    def add(self, hash_value: int, context: str, result: Dict) -> None:
+        with self._lock:
+            self._tree.add(hash_value, (context, result))
+            self._order.append((hash_value, context, result))
+            if len(self._order) > self.max_entries:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        """BK-trees cannot delete cheaply; drop the oldest half and rebuild."""
+        keep = self.max_entries // 2
+        while len(self._order) > keep:
+            self._order.popleft()
+        self._tree = BKTree()
+        for hash_value, context, result in self._order:
+            self._tree.add(hash_value, (context, result))
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": self._tree.size,
+                "threshold": self.threshold
+            }
@@ -0,0 +1,51 @@
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9
+}
+
+GOAL_ADJUSTMENTS = {
+    "weight_loss": -500,
+    "cut": -300,
+    "balanced": 0,
+    "bulk": 300,
+    "weight_gain": 500
+}
+
+def calculate_nutrition_requirements(profile):
+    """Calculate nutritional requirements based on user profile"""
+    try:
+        # Get values with defaults
+        weight = float(profile.get('weight', 70))  # Default 70kg
+        height = float(profile.get('height', 175))  # Default 175cm
+        age = int(profile.get('age', 30))  # Default 30 years
+        gender = profile.get('gender', 'male')
+        activity_level = profile.get('activity_level', 'moderate')
+        goal = profile.get('goal', 'balanced')
+        
+        # Calculate BMR (Harris-Benedict equation)
+        if gender == 'male':
+            bmr = 10 * weight + 6.25 * height - 5 * age + 5
+        else:
+            bmr = 10 * weight + 6.25 * height - 5 * age - 161
+
+        # Calculate TDEE based on activity level
+        tdee = bmr * ACTIVITY_MULTIPLIERS.get(activity_level, 1.2)
+        
+        # Adjust for goals
+        calories = tdee + GOAL_ADJUSTMENTS.get(goal, 0)
+        
+        # Calculate macros
+        protein_multiplier = 1.8 if goal in ['bulk', 'cut'] else 1.2
+        protein = weight * protein_multiplier
+        
+        return {
+            "calories": round(calories),
+            "protein": round(protein),
+            "carbs": round((calories * 0.45) / 4),  # 45% of calories from carbs
+            "fat": round((calories * 0.25) / 9)     # 25% of calories from fat
+        }
+    except Exception as e:
+        raise ValueError(f"Calculation error: {str(e)}")
@@ -0,0 +1,230 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Callable
+
+from prompt_templates import MEAL_PLAN_PROMPT
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value, step: int) -> int:
+    return int(round(float(value) / step) * step)
+
+
+def _normalize_text(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+# Spellings the frontend and API clients send for the same diet (the profile
+# form stores "veg", the meal plan form sends "vegetarian")
+DIET_ALIASES = {
+    "veg": "vegetarian",
+    "veggie": "vegetarian",
+    "non veg": "non_veg",
+    "non-veg": "non_veg",
+    "nonveg": "non_veg",
+    "non vegetarian": "non_veg",
+    "non-vegetarian": "non_veg",
+    "egg": "eggetarian",
+    "ovo vegetarian": "eggetarian",
+}
+
+
+def canonical_diet(value) -> str:
+    """One spelling per diet, so aliases share cache keys (and warmed plans)."""
+    diet = _normalize_text(value) or "vegetarian"
+    return DIET_ALIASES.get(diet, diet)
+
+
+def bucket_targets(nutrition: Dict) -> Dict:
+    """Round targets so nearby profiles share plans (kcal to 50, macros to 5 g)."""
+    return {
+        "calories": _bucket(nutrition["calories"], 50),
+        "protein": _bucket(nutrition["protein"], 5),
+        "carbs": _bucket(nutrition["carbs"], 5),
+        "fat": _bucket(nutrition["fat"], 5)
+    }
+
+
+def plan_cache_key(nutrition: Dict, data: Dict) -> str:
+    """Deterministic key for the bucketed targets plus diet/region/goal/conditions."""
+    targets = bucket_targets(nutrition)
+    conditions = data.get("health_conditions") or ""
+    if isinstance(conditions, (list, tuple)):
+        conditions = ",".join(conditions)
+    conditions = ",".join(sorted(filter(None, (_normalize_text(c) for c in conditions.split(",")))))
+    return "|".join([
+        # Changes with any edit to the prompt template, so old plans are not served
+        MEAL_PLAN_PROMPT.key,
+        f"{targets['calories']}/{targets['protein']}/{targets['carbs']}/{targets['fat']}",
+        canonical_diet(data.get("meal_preference")),
+        _normalize_text(data.get("region", "South Indian")),
+        _normalize_text(data.get("goal", "balanced")),
+        conditions
+    ])
+
+
+class MemoryPlanStore:
+    """In-process LRU over keys; each key holds a list of (stored_at, plan)."""
+
+    def __init__(self, max_keys: int = 2048):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_variants(self, key: str) -> List[Tuple[float, Dict]]:
+        with self._lock:
+            variants = self._data.get(key)
+            if variants is None:
+                return []
+            self._data.move_to_end(key)
+            return list(variants)
+
+    def add_variant(self, key: str, plan: Dict, max_variants: int, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            variants = self._data.setdefault(key, [])
+            variants.append((stored_at or time.time(), plan))
+            del variants[:-max_variants]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def count_keys(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLitePlanStore:
+    """Plans persisted in a local SQLite file, shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_variants ("
+            " key TEXT NOT NULL, stored_at REAL NOT NULL, plan TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plan_variants_key ON plan_variants (key, stored_at)")
+        self._conn.commit()
+
+    def get_variants(self, key: str) -> List[Tuple[float, Dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stored_at, plan FROM plan_variants WHERE key = ? ORDER BY stored_at", (key,)
+            ).fetchall()
+        return [(stored_at, json.loads(plan)) for stored_at, plan in rows]
+
+    def add_variant(self, key: str, plan: Dict, max_variants: int, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO plan_variants (key, stored_at, plan) VALUES (?, ?, ?)",
+                (key, stored_at or time.time(), json.dumps(plan))
+            )
+            self._conn.execute(
+                "DELETE FROM plan_variants WHERE key = ? AND rowid NOT IN ("
+                " SELECT rowid FROM plan_variants WHERE key = ? ORDER BY stored_at DESC LIMIT ?)",
+                (key, key, max_variants)
+            )
+            self._conn.commit()
+
+    def count_keys(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT key) FROM plan_variants").fetchone()[0]
+
+
+class PlanCache:
+    """Rotating multi-variant meal plan cache with stale-while-revalidate.
+
+    A key is only served from cache once it holds `variants` plans, so the
+    first few requests for a bucket still reach the LLM and build up variety.
+    Plans older than `fresh_ttl` are still served (up to `stale_ttl`) while a
+    single background refresh adds a new variant. The rotation position is
+    kept for the `max_keys` most recently served keys; a forgotten key just
+    starts again at its first variant.
+    """
+
+    def __init__(self, store, variants: int = 3, fresh_ttl: float = 7 * 86400,
+                 stale_ttl: float = 30 * 86400, refresh_workers: int = 2, max_keys: int = 2048):
+        self.store = store
+        self.variants = variants
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_keys = max_keys
+        self._rotation = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="plan-refresh")
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def live_variants(self, key: str, now: Optional[float] = None) -> List[Tuple[float, Dict]]:
+        """Stored (stored_at, plan) variants that are still servable (within stale_ttl)."""
+        now = time.time() if now is None else now
+        return [v for v in self.store.get_variants(key) if now - v[0] <= self.stale_ttl]
+
+    def get(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Return (plan, "fresh" | "stale") or (None, None) on a miss."""
+        now = time.time()
+        variants = self.live_variants(key, now)
+        if len(variants) < self.variants:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None, None
+
+        with self._lock:
+            index = self._rotation.pop(key, 0)
+            self._rotation[key] = index + 1
+            if len(self._rotation) > self.max_keys:
+                self._rotation.popitem(last=False)
+        stored_at, plan = variants[index % len(variants)]
+
+        newest = max(v[0] for v in variants)
+        status = "fresh" if now - newest <= self.fresh_ttl else "stale"
+        with self._lock:
+            self.stats["hits" if status == "fresh" else "stale_hits"] += 1
+        return plan, status
+
+    def add(self, key: str, plan: Dict) -> None:
+        self.store.add_variant(key, plan, self.variants)
+
+    def refresh_async(self, key: str, generate: Callable[[], Dict]) -> None:
+        """Generate and store a new variant in the background, once per key."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.add(key, generate())
+                with self._lock:
+                    self.stats["refreshes"] += 1
+            except Exception as e:
+                logger.warning(f"Meal plan refresh failed for {key}: {str(e)}")
+                with self._lock:
+                    self.stats["refresh_errors"] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["keys"] = self.store.count_keys()
+        stats["variants_per_key"] = self.variants
+        stats["backend"] = type(self.store).__name__
+        return stats
+
+
+def create_plan_store(backend: str, path: Optional[str] = None, max_keys: int = 2048):
+    if backend == "sqlite":
+        return SQLitePlanStore(path)
+    return MemoryPlanStore(max_keys=max_keys)
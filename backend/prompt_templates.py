@@ -0,0 +1,103 @@
+import re
+import string
+import hashlib
+from typing import Dict, List
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count (one per word or punctuation mark); no tokenizer needed."""
+    return len(_TOKEN_RE.findall(text))
+
+
+class PromptTemplate:
+    """A static instruction prefix plus a short body filled in per request.
+
+    The prefix goes out byte-for-byte identical on every call, first in the
+    request (system message, Gemini system instruction or cached content),
+    so providers that cache prompt prefixes only prefill the body. `key`
+    combines the version with a digest of both texts: any edit changes it,
+    and every cache holding results of the template is keyed by it.
+    """
+
+    def __init__(self, name: str, version: int, prefix: str, body: str):
+        self.name = name
+        self.version = version
+        self.prefix = prefix
+        self.body = body
+        self.fields = sorted({field for _, field, _, _ in string.Formatter().parse(body) if field})
+        digest = hashlib.sha256(f"{prefix}\x00{body}".encode()).hexdigest()[:8]
+        self.key = f"{name}-v{version}-{digest}"
+
+    def render(self, **variables) -> str:
+        return self.body.format(**variables)
+
+    def messages(self, **variables) -> List[Dict]:
+        """Chat messages: the prefix as the system message, the rendered body as the user's."""
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.render(**variables)}
+        ]
+
+    def token_report(self, **variables) -> Dict:
+        prefix = estimate_tokens(self.prefix)
+        body = estimate_tokens(self.render(**variables))
+        return {
+            "key": self.key,
+            "prefix_tokens": prefix,
+            "body_tokens": body,
+            "total_tokens": prefix + body,
+            "cacheable_share": round(prefix / (prefix + body), 3) if prefix + body else 0.0
+        }
+
+
+# ==============================================
+# Templates
+# ==============================================
+
+MEAL_PLAN_PROMPT = PromptTemplate("meal_plan", 2, prefix="""\
+You create Indian meal plans for given nutritional targets.
+Rules:
+1. Reply with ONLY valid JSON.
+2. Nutritional values are numbers without units.
+3. Include every section below.
+4. Give each dish a "quantity" to consume (e.g. "1 bowl", "2 slices").
+JSON format:
+{"breakfast": [{"dish": "name", "quantity": "1 bowl", "calories": 300, "protein": 15, "carbs": 45, "fat": 5}], \
+"lunch": [...], "snacks": [...], "dinner": [...], \
+"nutrition_summary": {"total_calories": 1800, "total_protein": 60, "total_carbs": 200, "total_fat": 50}, \
+"shopping_list": ["item1", "item2"]}""", body="""\
+Generate a {diet} Indian meal plan with {region} preference.
+Targets: calories {calories}, protein {protein}, carbs {carbs}, fat {fat}
+Health conditions: {health_conditions}
+Goal: {goal}""")
+
+DETECTION_INSTRUCTIONS = """\
+You are a nutrition AI specializing in Indian cuisine. For the food image:
+1. Identify all visible food items (use common Indian food names).
+2. Estimate quantities in grams (100-150 g for sides, 200-300 g for mains).
+3. Return strict JSON: {"meal_name": "string (meal description)", "foods": [{"name": "string", "weight_g": number}]}
+Rules:
+- Never include explanations or non-JSON text.
+- Do not calculate nutrition for common Indian dishes.
+- Only for a food that is not a common Indian dish, add "estimate": [calories, protein_g, carbs_g, fats_g] for its weight.
+- If unsure, make reasonable estimates."""
+
+DETECTION_PROMPT = PromptTemplate("food_detection", 3, prefix=DETECTION_INSTRUCTIONS, body='User notes: "{notes}"')
+
+DETECTION_BATCH_PROMPT = PromptTemplate("food_detection_batch", 2, prefix="""\
+You will receive several food images, in order. Analyse each image on its own using the
+instructions below and return a JSON array with one object per image, in the same order,
+each in the format below.
+""" + DETECTION_INSTRUCTIONS, body="There are {count} images; return exactly {count} objects.{notes}")
+
+TEMPLATES = {template.name: template for template in (MEAL_PLAN_PROMPT, DETECTION_PROMPT, DETECTION_BATCH_PROMPT)}
+
+# Typical variables, for token reports and benchmarks
+SAMPLE_VARIABLES = {
+    "meal_plan": {"diet": "vegetarian", "region": "South Indian", "calories": 2000, "protein": 75,
+                  "carbs": 250, "fat": 65, "health_conditions": "None", "goal": "balanced"},
+    "food_detection": {"notes": "lunch at the office canteen"},
+    "food_detection_batch": {"count": 4, "notes": '\nUser notes per image:\n- Image 2: "with extra ghee"'}
+}
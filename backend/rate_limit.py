@@ -0,0 +1,158 @@
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class RateLimited(RuntimeError):
+    """A token bucket is empty; retry_after is the wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Buckets held in this process; least recently used keys are dropped."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float, now: float) -> float:
+        """Spend `cost` tokens; returns 0 on success, else seconds until they are available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def drain(self, key: str, rate: float, burst: float, seconds: float, now: float) -> None:
+        """Empty the bucket so nothing is granted for the next `seconds`."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            self._buckets[key] = (min(_refill(tokens, updated, now, rate, burst), 1 - seconds * rate), now)
+
+    def count_keys(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets in a local SQLite file, so every worker on the host shares them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _update(self, key: str, burst: float, now: float, compute) -> float:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so the read-modify-write is atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, result = compute(*(row or (burst, now)))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def take(self, key: str, rate: float, burst: float, cost: float, now: float) -> float:
+        def compute(tokens, updated):
+            tokens = _refill(tokens, updated, now, rate, burst)
+            if tokens >= cost:
+                return tokens - cost, 0.0
+            return tokens, (cost - tokens) / rate
+        return self._update(key, burst, now, compute)
+
+    def drain(self, key: str, rate: float, burst: float, seconds: float, now: float) -> None:
+        def compute(tokens, updated):
+            return min(_refill(tokens, updated, now, rate, burst), 1 - seconds * rate), None
+        self._update(key, burst, now, compute)
+
+    def count_keys(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0]
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: `per_minute` sustained rate with bursts of `burst`.
+
+    acquire() never blocks; an empty bucket raises RateLimited with the time
+    until the request would be allowed, so callers can answer 429 at once
+    instead of holding a worker. per_minute <= 0 disables the limiter.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: float, store=None,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.per_minute = per_minute
+        self.burst = max(1.0, burst)
+        self.rate = per_minute / 60.0
+        self.store = store or MemoryBucketStore()
+        # Wall-clock seconds: SQLite buckets are shared with other processes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "limited": 0, "penalties": 0}
+
+    def acquire(self, key: str, cost: float = 1) -> None:
+        if self.per_minute <= 0:
+            return
+        # A request costing more than the burst could never be admitted
+        cost = min(cost, self.burst)
+        wait = self.store.take(f"{self.name}:{key}", self.rate, self.burst, cost, self.clock())
+        with self._lock:
+            self.stats["limited" if wait else "allowed"] += 1
+        if wait:
+            raise RateLimited(f"{self.name} rate limit reached for {key}", wait)
+
+    def penalize(self, key: str, seconds: float) -> None:
+        """Stop admitting `key` for `seconds` (e.g. after the upstream answered 429)."""
+        if self.per_minute <= 0:
+            return
+        self.store.drain(f"{self.name}:{key}", self.rate, self.burst, seconds, self.clock())
+        with self._lock:
+            self.stats["penalties"] += 1
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["per_minute"] = self.per_minute
+        stats["burst"] = self.burst
+        return stats
+
+
+def create_bucket_store(backend: str, path: Optional[str] = None):
+    if backend == "sqlite":
+        return SQLiteBucketStore(path)
+    return MemoryBucketStore()
@@ -0,0 +1,90 @@
+"""Zero-downtime code reload for the gunicorn master started with gunicorn.conf.py.
+
+With preload_app the master holds the imported code, so HUP alone does not
+pick up a deploy. This script uses gunicorn's binary upgrade instead:
+
+  1. USR2 to the running master: it re-executes itself as a new master (new
+     code, same listening socket) that writes <pidfile>.2.
+  2. Wait until the new master has forked its workers and /health answers.
+  3. TERM to the old master: it stops accepting and lets its workers finish
+     in-flight requests (up to graceful_timeout) before exiting. The new
+     master then takes over <pidfile>.
+
+If the new master never becomes healthy it is stopped and the old one keeps
+serving.
+
+    python reload_server.py
+    python reload_server.py --pidfile /run/backend.pid --health-url http://127.0.0.1:5050/health
+"""
+import os
+import time
+import signal
+import argparse
+import logging
+import urllib.request
+
+logger = logging.getLogger("reload_server")
+
+
+def read_pid(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def has_workers(pid):
+    """True once the master has forked workers (Linux /proc; assumed elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return bool(f.read().split())
+    except OSError:
+        return True
+
+
+def healthy(url):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pidfile", default=os.getenv("PIDFILE", "gunicorn.pid"))
+    parser.add_argument("--health-url", default="http://127.0.0.1:5050/health")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the new master")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    old_pid = read_pid(args.pidfile)
+    if old_pid is None:
+        raise SystemExit(f"No running master found in {args.pidfile}")
+
+    logger.info(f"Starting a new master from {old_pid}")
+    os.kill(old_pid, signal.SIGUSR2)
+
+    deadline = time.monotonic() + args.timeout
+    new_pid = None
+    while time.monotonic() < deadline:
+        new_pid = read_pid(args.pidfile + ".2")
+        if new_pid is not None:
+            # The old workers still answer on the shared socket, so also
+            # require the new master to have workers of its own
+            if has_workers(new_pid) and healthy(args.health_url):
+                break
+        time.sleep(0.5)
+    else:
+        if new_pid is not None:
+            logger.error(f"New master {new_pid} did not become healthy; stopping it")
+            os.kill(new_pid, signal.SIGTERM)
+        raise SystemExit("Reload failed; the old master is still serving")
+
+    logger.info(f"New master {new_pid} is serving; stopping old master {old_pid} gracefully")
+    os.kill(old_pid, signal.SIGTERM)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional, Tuple
+
+from upstream_limits import UpstreamBusy
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 500, 502, 503, 504}
+
+
+class CircuitOpen(UpstreamBusy):
+    """The breaker is open; the upstream is not called until retry_after passes."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CallQueueTimeout(UpstreamBusy):
+    """No call thread became free in time; local queueing, not an upstream failure."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transport failures, timeouts and 408/5xx; 4xx (including 429) are not retried."""
+    if isinstance(error, DeadlineExceeded):
+        return True
+    status_code = getattr(error, "status_code", 0)
+    return status_code is None or status_code in RETRYABLE_STATUS
+
+
+def upstream_rejected(error: Exception) -> bool:
+    """The upstream answered with a 4xx: it is healthy, the request was not.
+
+    Anything else that is not retryable (ValueError, KeyError from parsing the
+    response inside fn) was raised locally and says nothing about the upstream.
+    """
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and 400 <= status_code < 500
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures.
+
+    While open every call fails fast with CircuitOpen. After `reset_timeout`
+    one probe call is let through (half_open); its success closes the
+    breaker, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_timeout - self.clock()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.stats["rejected"] += 1
+        raise CircuitOpen(f"{self.name} circuit is open", max(remaining, 1.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"{self.name} circuit closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            # Calls that were already in flight when it opened do not extend the open period
+            if self.state == "open":
+                return
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.stats["opened"] += 1
+                logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probing = False
+
+    def release(self) -> None:
+        """The call neither succeeded nor failed (e.g. the client went away); free the probe."""
+        with self._lock:
+            self._probing = False
+
+    def info(self) -> Dict:
+        with self._lock:
+            info = {"state": self.state, "consecutive_failures": self._failures, **self.stats}
+            if self.state == "open":
+                info["retry_in_s"] = round(max(0.0, self._opened_at + self.reset_timeout - self.clock()), 1)
+            return info
+
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ResilientCaller:
+    """Deadline, retries, optional hedging and a circuit breaker around one upstream.
+
+    call(fn) runs fn(timeout) where timeout is the time left before the
+    per-call deadline. Retryable failures are retried up to max_attempts with
+    decorrelated jitter (sleep = uniform(base, 3 * previous sleep), capped),
+    never past the deadline. With hedging on, a second identical request is
+    started if the first has not answered after the recent p95 latency; the
+    first success wins. Attempts run on a thread pool so the deadline holds
+    even if a connection stalls; size it for the upstream's concurrency limit
+    (plus hedges). The deadline counts from when an attempt gets a thread and
+    a limiter slot, so local queueing is neither charged to the upstream nor
+    recorded by the breaker.
+    """
+
+    def __init__(self, name: str, deadline: float = 30, max_attempts: int = 3,
+                 base_delay: float = 0.2, max_delay: float = 5, hedge: bool = False,
+                 hedge_min_delay: float = 1.0, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 32,
+                 queue_timeout: float = 30, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.breaker = breaker or CircuitBreaker(name, clock=clock)
+        self._breakers = {}
+        self.latency = LatencyWindow()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "failures": 0,
+                      "queue_timeouts": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def breaker_for(self, key: Optional[str] = None) -> CircuitBreaker:
+        """The shared breaker, or one per key (e.g. per model) with the same settings."""
+        if key is None:
+            return self.breaker
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(
+                    f"{self.name}:{key}", self.breaker.failure_threshold, self.breaker.reset_timeout,
+                    clock=self.breaker.clock
+                )
+            return breaker
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(0.95))
+
+    def _start(self, fn: Callable, budget: float, limiter=None) -> Tuple[Future, float]:
+        """Submit one attempt and wait until it runs; returns its future and start time.
+
+        The attempt holds a `limiter` slot on its own thread until fn returns,
+        so a straggler abandoned at the deadline still counts against the
+        upstream's concurrency. Its timeout is the full budget: time spent
+        waiting for a thread or slot is not part of it.
+        """
+        started = threading.Event()
+        started_at = []
+
+        def run():
+            try:
+                with limiter.slot() if limiter is not None else nullcontext():
+                    started_at.append(self.clock())
+                    started.set()
+                    begin = self.clock()
+                    result = fn(budget)
+                    self.latency.add(self.clock() - begin)
+                    return result
+            finally:
+                # Also wakes the caller when no slot was free (UpstreamBusy)
+                started.set()
+
+        future = self._executor.submit(run)
+        if not started.wait(self.queue_timeout) and future.cancel():
+            self._count("queue_timeouts")
+            raise CallQueueTimeout(f"{self.name}: no call thread free within {self.queue_timeout:.0f}s")
+        started.wait()
+        if not started_at:
+            # The limiter rejected the attempt before it reached the upstream
+            raise future.exception()
+        return future, started_at[0]
+
+    def _attempt(self, fn: Callable, budget: float, deadline: float, limiter=None):
+        """Run one attempt (plus a hedge); a failure carries the seconds it ran as attempt_seconds."""
+        first, started_at = self._start(fn, budget, limiter)
+        futures = [first]
+        deadline_at = started_at + budget
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None and hedge_delay < budget:
+                done, _ = wait(futures, timeout=hedge_delay)
+                if not done:
+                    try:
+                        futures.append(self._start(fn, deadline_at - self.clock(), limiter)[0])
+                        self._count("hedges")
+                    except UpstreamBusy:
+                        # No capacity for a hedge; keep waiting for the first request
+                        pass
+
+            first_error = None
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline_at - self.clock()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    # Stragglers finish on their own, bounded by the timeout they were given
+                    raise DeadlineExceeded(f"{self.name} did not answer within {deadline:.0f}s")
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        if future is not futures[0]:
+                            self._count("hedge_wins")
+                        return future.result()
+                    first_error = first_error or error
+            raise first_error
+        except Exception as e:
+            e.attempt_seconds = self.clock() - started_at
+            raise
+
+    def call(self, fn: Callable[[float], object], key: Optional[str] = None, deadline: Optional[float] = None,
+             limiter=None):
+        """Pass `key` for a breaker per key, `deadline` to override the default and
+        `limiter` (an UpstreamLimiter) to hold one of its slots for each attempt."""
+        self._count("calls")
+        breaker = self.breaker_for(key)
+        deadline = self.deadline if deadline is None else deadline
+        # Seconds left of the deadline; only time spent calling the upstream and backing off counts
+        budget = deadline
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker.before_call()
+            try:
+                result = self._attempt(fn, budget, deadline, limiter)
+            except UpstreamBusy:
+                # Local capacity (threads, limiter slots) says nothing about the upstream
+                breaker.release()
+                raise
+            except Exception as e:
+                budget -= getattr(e, "attempt_seconds", 0.0)
+                if isinstance(e, DeadlineExceeded):
+                    self._count("deadline_exceeded")
+                if not is_retryable(e):
+                    # A bad request says nothing against the upstream's health, a local error nothing at all
+                    if upstream_rejected(e):
+                        breaker.record_success()
+                    else:
+                        breaker.release()
+                    raise
+                breaker.record_failure()
+                delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+                if attempt >= self.max_attempts or delay >= budget:
+                    self._count("failures")
+                    raise
+                logger.warning(f"{self.name} attempt {attempt} failed ({str(e)[:200]}); retrying in {delay:.2f}s")
+                self._count("retries")
+                self.sleep(delay)
+                budget -= delay
+                continue
+            breaker.record_success()
+            return result
+
+    @contextmanager
+    def guard(self, key: Optional[str] = None):
+        """Breaker only, for calls that cannot be retried or hedged (streams)."""
+        self._count("calls")
+        breaker = self.breaker_for(key)
+        breaker.before_call()
+        try:
+            yield max(0.0, self.deadline)
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+                self._count("failures")
+            elif upstream_rejected(e):
+                breaker.record_success()
+            else:
+                breaker.release()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        stats["latency_p50_ms"] = round(p50 * 1000, 1) if p50 is not None else None
+        stats["latency_p95_ms"] = round(p95 * 1000, 1) if p95 is not None else None
+        stats["deadline_s"] = self.deadline
+        stats["hedging"] = self.hedge
+        stats["circuit"] = self.breaker.info()
+        with self._lock:
+            breakers = dict(self._breakers)
+        if breakers:
+            stats["circuits"] = {key: breaker.info() for key, breaker in breakers.items()}
+        return stats
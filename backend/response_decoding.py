@@ -0,0 +1,363 @@
+import re
+import json
+from typing import Callable, Dict, Tuple
+
+# ==============================================
+# Schemas
+# ==============================================
+#
+# Schemas are small dicts in a JSON-Schema-like shape. compile_schema turns
+# one into a tree of closures once at import, so validating a response is a
+# single walk that also coerces numbers ("300", "15 g", 12.0) in place.
+
+MEAL_ITEM_SPEC = {
+    "type": "object",
+    "properties": {
+        "dish": {"type": "string"},
+        "quantity": {"type": "string"},
+        "calories": {"type": "integer"},
+        "protein": {"type": "integer"},
+        "carbs": {"type": "integer"},
+        "fat": {"type": "integer"}
+    },
+    "required": ["dish"]
+}
+
+MEAL_SECTION_SPEC = {"type": "array", "items": MEAL_ITEM_SPEC}
+
+NUTRITION_SUMMARY_SPEC = {
+    "type": "object",
+    "properties": {
+        "total_calories": {"type": "integer"},
+        "total_protein": {"type": "integer"},
+        "total_carbs": {"type": "integer"},
+        "total_fat": {"type": "integer"}
+    }
+}
+
+MEAL_PLAN_SPEC = {
+    "type": "object",
+    "properties": {
+        "breakfast": MEAL_SECTION_SPEC,
+        "lunch": MEAL_SECTION_SPEC,
+        "snacks": MEAL_SECTION_SPEC,
+        "dinner": MEAL_SECTION_SPEC,
+        "nutrition_summary": NUTRITION_SUMMARY_SPEC,
+        "shopping_list": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["breakfast", "lunch", "snacks", "dinner"]
+}
+
+DETECTION_SPEC = {
+    "type": "object",
+    "properties": {
+        "meal_name": {"type": "string"},
+        "foods": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "weight_g": {"type": "number"},
+                    "estimate": {"type": "array", "items": {"type": "number"}}
+                },
+                "required": ["name", "weight_g"]
+            }
+        }
+    },
+    "required": ["foods"]
+}
+
+DETECTION_BATCH_SPEC = {"type": "array", "items": DETECTION_SPEC}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class TruncatedOutput(ValueError):
+    """The output stopped mid-document; only closing its brackets made it parse."""
+
+
+_UNIT_SUFFIX = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[a-zA-Z%]*\s*$')
+
+
+def _to_number(value, path):
+    if isinstance(value, bool):
+        raise SchemaError(f"{path}: expected a number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        match = _UNIT_SUFFIX.match(value)
+        if match:
+            return float(match.group(1))
+    raise SchemaError(f"{path}: expected a number, got {value!r}")
+
+
+def compile_schema(spec: Dict) -> Callable:
+    """Build a validate-and-coerce function for spec; it returns the coerced value."""
+    kind = spec["type"]
+
+    if kind == "integer":
+        def validate(value, path="$"):
+            return int(_to_number(value, path))
+        return validate
+
+    if kind == "number":
+        def validate(value, path="$"):
+            return _to_number(value, path)
+        return validate
+
+    if kind == "string":
+        def validate(value, path="$"):
+            if isinstance(value, str):
+                return value
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return str(value)
+            raise SchemaError(f"{path}: expected a string")
+        return validate
+
+    if kind == "array":
+        validate_item = compile_schema(spec["items"])
+
+        def validate(value, path="$"):
+            if not isinstance(value, list):
+                raise SchemaError(f"{path}: expected an array")
+            for i, item in enumerate(value):
+                value[i] = validate_item(item, f"{path}[{i}]")
+            return value
+        return validate
+
+    if kind == "object":
+        properties = [(name, compile_schema(sub)) for name, sub in spec.get("properties", {}).items()]
+        required = spec.get("required", [])
+
+        def validate(value, path="$"):
+            if not isinstance(value, dict):
+                raise SchemaError(f"{path}: expected an object")
+            for name in required:
+                if name not in value:
+                    raise SchemaError(f"{path}: missing required field '{name}'")
+            for name, validate_property in properties:
+                if name in value:
+                    value[name] = validate_property(value[name], f"{path}.{name}")
+            return value
+        return validate
+
+    raise ValueError(f"Unsupported schema type: {kind}")
+
+
+validate_meal_plan = compile_schema(MEAL_PLAN_SPEC)
+validate_meal_section = compile_schema(MEAL_SECTION_SPEC)
+validate_nutrition_summary = compile_schema(NUTRITION_SUMMARY_SPEC)
+validate_detection = compile_schema(DETECTION_SPEC)
+validate_detection_batch = compile_schema(DETECTION_BATCH_SPEC)
+
+
+def gemini_schema(spec: Dict) -> Dict:
+    """Translate a spec into Gemini's responseSchema (OpenAPI subset)."""
+    schema = {"type": spec["type"].upper()}
+    if spec["type"] == "object":
+        schema["properties"] = {name: gemini_schema(sub) for name, sub in spec["properties"].items()}
+        if spec.get("required"):
+            schema["required"] = list(spec["required"])
+    elif spec["type"] == "array":
+        schema["items"] = gemini_schema(spec["items"])
+    return schema
+
+
+def json_schema(spec: Dict) -> Dict:
+    """Translate a spec into plain JSON Schema (Together.ai response_format)."""
+    schema = {"type": spec["type"]}
+    if spec["type"] == "object":
+        schema["properties"] = {name: json_schema(sub) for name, sub in spec["properties"].items()}
+        if spec.get("required"):
+            schema["required"] = list(spec["required"])
+    elif spec["type"] == "array":
+        schema["items"] = json_schema(spec["items"])
+    return schema
+
+
+# ==============================================
+# Decoding
+# ==============================================
+
+_BARE_WORDS = {"true", "false", "null"}
+_STRING_SPECIAL = {'"': re.compile(r'["\\\n\r\t]'), "'": re.compile(r'[\'"\\\n\r\t]')}
+_NUMBER_WITH_UNIT = re.compile(r'(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\s*(?:g|gm|gms|grams?|kcal|cal|mg|ml|%)?$', re.I)
+
+
+def repair_json(text: str) -> str:
+    """Rewrite almost-JSON from an LLM into valid JSON in one pass.
+
+    Handles leading chatter and code fences, comments, single-quoted strings,
+    raw newlines inside strings, unquoted keys and words, numbers with unit
+    suffixes ("15g"), trailing commas, and output truncated mid-way (open
+    strings and brackets are closed). Stops after the first top-level value.
+    """
+    return repair_json_checked(text)[0]
+
+
+def repair_json_checked(text: str) -> Tuple[str, bool]:
+    """repair_json plus whether the input was truncated (strings or brackets had to be closed)."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object or array found")
+    i = min(starts)
+    n = len(text)
+    out = []
+    stack = []
+
+    def drop_trailing_comma():
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+
+    while i < n:
+        ch = text[i]
+
+        if ch in "\"'":
+            quote = ch
+            i += 1
+            chars = ['"']
+            closed = False
+            special = _STRING_SPECIAL[quote]
+            while i < n:
+                match = special.search(text, i)
+                if match is None:
+                    chars.append(text[i:])
+                    i = n
+                    break
+                if match.start() > i:
+                    chars.append(text[i:match.start()])
+                    i = match.start()
+                c = text[i]
+                if c == "\\" and i + 1 < n:
+                    nxt = text[i + 1]
+                    # \' is not a valid JSON escape
+                    chars.append("'" if nxt == "'" else c + nxt)
+                    i += 2
+                    continue
+                if c == quote:
+                    closed = True
+                    i += 1
+                    break
+                if c == '"':
+                    chars.append('\\"')
+                elif c == "\n":
+                    chars.append("\\n")
+                elif c == "\t":
+                    chars.append("\\t")
+                elif c == "\r":
+                    chars.append("\\r")
+                i += 1
+            chars.append('"')
+            out.append("".join(chars))
+            if not closed:
+                break
+            continue
+
+        if ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch in "}]":
+            drop_trailing_comma()
+            if stack:
+                out.append(stack.pop())
+            i += 1
+            if not stack:
+                return "".join(out), False
+            continue
+
+        if ch == "/" and i + 1 < n and text[i + 1] in "/*":
+            end = text.find("\n", i) if text[i + 1] == "/" else text.find("*/", i + 2)
+            i = n if end == -1 else end + (0 if text[i + 1] == "/" else 2)
+            continue
+
+        if ch in ",:":
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch.isspace():
+            i += 1
+            continue
+
+        # Bare token: number (maybe with a unit), literal, or unquoted word. A value
+        # (after a colon or in an array) may contain colons and slashes, as in
+        # http://x.com/a; a comment only starts after whitespace.
+        in_value = (out and out[-1] == ":") or (stack and stack[-1] == "]")
+        stops = ',{}[]"\'\n' if in_value else ',:{}[]"\'\n'
+        j = i
+        while j < n and text[j] not in stops and not (
+                text[j] == "/" and j + 1 < n and text[j + 1] in "/*" and text[j - 1].isspace()):
+            j += 1
+        token = text[i:j].strip()
+        i = j
+        if not token:
+            continue
+        number = _NUMBER_WITH_UNIT.match(token)
+        if token in _BARE_WORDS:
+            out.append(token)
+        elif number and (i >= n or text[i] != ":"):
+            out.append(number.group(1))
+        else:
+            out.append(json.dumps(token))
+
+    # Truncated output: drop a dangling key or comma and close what is open
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        if out[-1] == ":":
+            out.pop()
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1].startswith('"'):
+                out.pop()
+            continue
+        out.pop()
+    if stack and stack[-1] == "}" and out and out[-1].startswith('"'):
+        previous = next((t for t in reversed(out[:-1]) if not t.isspace()), "")
+        if previous in ("{", ","):
+            # A key with no value yet
+            out.pop()
+            while out and (out[-1].isspace() or out[-1] == ","):
+                out.pop()
+    while stack:
+        drop_trailing_comma()
+        out.append(stack.pop())
+    return "".join(out), True
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text[:4].lower() == "json":
+            text = text[4:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def decode_json(text: str, validate: Callable, allow_truncated: bool = False):
+    """Parse LLM output and validate/coerce it against a compiled schema.
+
+    Valid JSON (what structured-output mode returns) goes straight through
+    json.loads; anything else falls back to repair_json once. Raises ValueError
+    (JSONDecodeError or SchemaError) when neither yields a valid document, and
+    TruncatedOutput when the output was cut off: closing its brackets would
+    turn a partial plan or food list into a result that looks complete and
+    gets cached. Pass allow_truncated=True to accept the repaired prefix.
+    """
+    stripped = _strip_fences(text)
+    try:
+        value = json.loads(stripped)
+    except json.JSONDecodeError:
+        repaired, truncated = repair_json_checked(stripped)
+        if truncated and not allow_truncated:
+            raise TruncatedOutput("Model output was truncated")
+        value = json.loads(repaired)
+    return validate(value)
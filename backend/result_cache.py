@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_description(description: Optional[str]) -> str:
+    """Collapse whitespace and case so trivially different notes share a key."""
+    if not description:
+        return ""
+    return " ".join(description.split()).lower()
+
+
+def image_digest(image) -> str:
+    """Digest of the decoded pixel data, independent of container/metadata."""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{image.mode}:{image.width}x{image.height}:".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def make_cache_key(digest: str, description: Optional[str], prompt_version: str) -> str:
+    """Combine image digest, normalized description and prompt version."""
+    raw = f"{prompt_version}\x00{digest}\x00{normalize_description(description)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional JSON-on-disk) cache for detection results.
+
+    Disk usage is tracked in memory (key -> (mtime, size), oldest first) so a
+    write only trims from the front of that index. The directory is rescanned
+    at startup and every rescan_every writes, which also picks up files other
+    worker processes wrote or removed.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 86400,
+                 disk_dir: Optional[str] = None, max_disk_bytes: int = 64 * 1024 * 1024,
+                 rescan_every: int = 1000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.rescan_every = rescan_every
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_files = OrderedDict()
+        self._disk_bytes = 0
+        self._writes_since_scan = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._memory[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._put_memory(key, value)
+        return value
+
+    def set(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._put_memory(key, value)
+        self._write_disk(key, value)
+
+    def _put_memory(self, key: str, value: Dict) -> None:
+        self._memory[key] = (time.time(), value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if self._expired(os.path.getmtime(path)):
+                with self._lock:
+                    self._forget_disk(key)
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Dict) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Result cache disk write failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._forget_disk(key)
+            self._disk_files[key] = (time.time(), size)
+            self._disk_bytes += size
+            self._writes_since_scan += 1
+            rescan = self._writes_since_scan >= self.rescan_every
+        if rescan:
+            self._scan_disk()
+        else:
+            self._trim_disk()
+
+    def _forget_disk(self, key: str) -> None:
+        entry = self._disk_files.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+
+    def _scan_disk(self) -> None:
+        """Rebuild the disk index from the directory, then trim it."""
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name[:-len(".json")]))
+        entries.sort()
+        with self._lock:
+            self._disk_files = OrderedDict((key, (mtime, size)) for mtime, size, key in entries)
+            self._disk_bytes = sum(size for _, size, _ in entries)
+            self._writes_since_scan = 0
+        self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        """Drop expired files, then the oldest ones until under max_disk_bytes."""
+        while True:
+            with self._lock:
+                if not self._disk_files:
+                    return
+                key, (stored_at, _) = next(iter(self._disk_files.items()))
+                expired = self._expired(stored_at)
+                if not expired and self._disk_bytes <= self.max_disk_bytes:
+                    return
+                self._forget_disk(key)
+                if not expired:
+                    self.stats["evictions"] += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_enabled": bool(self.disk_dir),
+            }
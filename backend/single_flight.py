@@ -0,0 +1,81 @@
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple, Any
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    Nothing is remembered once the call finishes, so this is not a cache.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def lead(self, keys: Iterable[str]) -> Set[str]:
+        """Claim the keys nobody has in flight, for work that computes several at once.
+
+        Callers of do() for a claimed key wait until the leader calls
+        finish() for it, so every claimed key must be finished.
+        """
+        led = set()
+        with self._lock:
+            for key in keys:
+                if key not in self._calls:
+                    self._calls[key] = _Call()
+                    self.stats["calls"] += 1
+                    led.add(key)
+        return led
+
+    def finish(self, key: str, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Complete a key claimed with lead(), handing result (or error) to its waiters."""
+        with self._lock:
+            call = self._calls.pop(key)
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
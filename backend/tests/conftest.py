@@ -0,0 +1,23 @@
+"""Fixtures shared by the backend tests."""
+import pytest
+
+
+class Clock:
+    """A clock that only moves when told to; pass it as a component's `clock`."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    # Stands in for time.sleep
+    sleep = advance
+
+
+@pytest.fixture
+def clock():
+    return Clock()
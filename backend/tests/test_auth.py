@@ -0,0 +1,84 @@
+"""verify_token: signature, algorithm, expiry, not-before, audience and subject checks.
+
+    python -m pytest tests/test_auth.py
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import hashlib
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api.auth import AuthError, verify_token  # noqa: E402
+
+SECRET = "test-secret"
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def make_token(secret=SECRET, alg="HS256", **overrides):
+    claims = {"sub": "alice", "aud": "authenticated", "exp": time.time() + 3600, **overrides}
+    claims = {name: value for name, value in claims.items() if value is not None}
+    header = b64(json.dumps({"alg": alg, "typ": "JWT"}).encode())
+    payload = b64(json.dumps(claims).encode())
+    signature = b64(hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest())
+    return f"{header}.{payload}.{signature}"
+
+
+def test_valid_token():
+    claims = verify_token(make_token(), SECRET, "authenticated")
+    assert claims["sub"] == "alice"
+
+
+def test_audience_list():
+    assert verify_token(make_token(aud=["other", "authenticated"]), SECRET, "authenticated")["sub"] == "alice"
+
+
+@pytest.mark.parametrize("token, message", [
+    (make_token(secret="wrong-secret"), "Invalid token signature"),
+    (make_token()[:-4] + "AAAA", "Invalid token signature"),
+    (make_token(alg="none"), "Unsupported token algorithm"),
+    (make_token(exp=time.time() - 120), "Token expired"),
+    (make_token(exp="tomorrow"), "Token expired"),
+    (make_token(nbf=time.time() + 120), "Token not yet valid"),
+    (make_token(aud="anon"), "Token audience mismatch"),
+    (make_token(aud=None), "Token audience mismatch"),
+    (make_token(sub=""), "Token has no subject"),
+    (make_token(sub=42), "Token has no subject"),
+    ("not-a-jwt", "Malformed token"),
+    ("a.b.c", "Malformed token"),
+], ids=[
+    "bad-signature", "tampered-signature", "alg-none", "expired", "exp-not-a-number", "nbf-future",
+    "wrong-audience", "no-audience", "empty-subject", "numeric-subject", "one-segment", "bad-base64",
+])
+def test_rejected(token, message):
+    with pytest.raises(AuthError, match=message):
+        verify_token(token, SECRET, "authenticated")
+
+
+def test_tampered_claims_fail_signature():
+    header, _, signature = make_token().split(".")
+    claims = b64(json.dumps({"sub": "mallory", "aud": "authenticated", "exp": time.time() + 3600}).encode())
+    with pytest.raises(AuthError, match="Invalid token signature"):
+        verify_token(f"{header}.{claims}.{signature}", SECRET, "authenticated")
+
+
+def test_leeway_covers_clock_skew():
+    verify_token(make_token(exp=time.time() - 20), SECRET, "authenticated", leeway=30)
+    verify_token(make_token(nbf=time.time() + 20), SECRET, "authenticated", leeway=30)
+    with pytest.raises(AuthError, match="Token expired"):
+        verify_token(make_token(exp=time.time() - 40), SECRET, "authenticated", leeway=30)
+
+
+def test_no_secret_rejects_everything():
+    with pytest.raises(AuthError, match="not configured"):
+        verify_token(make_token(), None, "authenticated")
+    with pytest.raises(AuthError, match="not configured"):
+        verify_token(make_token(secret=""), "", "authenticated")
@@ -0,0 +1,146 @@
+"""calculate_nutrition_requirements_bulk must agree with the scalar function row for row.
+
+    python -m pytest tests/test_bulk_nutrition.py
+"""
+import os
+import sys
+import json
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bulk_nutrition  # noqa: E402
+from bulk_nutrition import (  # noqa: E402
+    BulkValidationError, calculate_nutrition_requirements_bulk, calculate_nutrition_requirements_bulk_json
+)
+from nutrition import ACTIVITY_MULTIPLIERS, GOAL_ADJUSTMENTS, calculate_nutrition_requirements  # noqa: E402
+
+
+def scalar(profile):
+    try:
+        return calculate_nutrition_requirements(profile)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def random_profile(rng):
+    """Field types seen in uploads: floats, ints, numeric strings, missing fields and junk."""
+    fields = {
+        "weight": lambda: rng.choice([rng.uniform(30, 200), rng.randint(30, 200), str(rng.randint(30, 200)), "70.5"]),
+        "height": lambda: rng.choice([rng.uniform(120, 220), rng.randint(120, 220), "175"]),
+        "age": lambda: rng.choice([rng.randint(10, 90), str(rng.randint(10, 90)), rng.uniform(10, 90)]),
+        "gender": lambda: rng.choice(["male", "female", "other"]),
+        "activity_level": lambda: rng.choice(list(ACTIVITY_MULTIPLIERS) + ["unknown"]),
+        "goal": lambda: rng.choice(list(GOAL_ADJUSTMENTS) + ["unknown"]),
+    }
+    profile = {name: make() for name, make in fields.items() if rng.random() < 0.9}
+    roll = rng.random()
+    if roll < 0.01:
+        profile["weight"] = "heavy"
+    elif roll < 0.02:
+        profile["age"] = "30.5"
+    elif roll < 0.025:
+        profile["weight"] = None
+    elif roll < 0.03:
+        profile["height"] = "nan"
+    elif roll < 0.035:
+        return ["not", "a", "profile"]
+    return profile
+
+
+def numeric_profile(rng):
+    return {
+        "weight": round(rng.uniform(40, 130), 1),
+        "height": rng.randint(145, 200),
+        "age": rng.randint(16, 80),
+        "gender": rng.choice(["male", "female"]),
+        "activity_level": rng.choice(list(ACTIVITY_MULTIPLIERS)),
+        "goal": rng.choice(list(GOAL_ADJUSTMENTS)),
+    }
+
+
+EDGE_CASES = [
+    {},
+    {"weight": "heavy", "height": "tall", "age": "old"},
+    {"height": "tall", "age": "old"},
+    {"age": "30.5"},
+    {"age": 30.9},
+    {"age": -0.5},
+    {"age": float("nan")},
+    {"age": float("inf")},
+    {"age": "nan"},
+    {"weight": "inf"},
+    {"weight": float("-inf"), "age": float("nan")},
+    {"height": "nan"},
+    {"weight": None},
+    {"weight": True, "age": False},
+    {"weight": " 70 ", "height": "1e2", "age": " 40 "},
+    {"weight": 10 ** 400},
+    {"age": 10 ** 400},
+    {"goal": ["bulk"]},
+    {"goal": ["bulk"], "weight": "x"},
+    {"activity_level": {"level": 1}},
+    {"weight": 0.5, "height": 0.25, "age": 0},
+    ["not", "a", "profile"],
+    "profile",
+    None,
+    42,
+]
+
+
+def check(profiles):
+    expected = [scalar(profile) for profile in profiles]
+    assert list(calculate_nutrition_requirements_bulk(profiles)) == expected
+    lines = []
+    error_count = 0
+    for batch, errors in calculate_nutrition_requirements_bulk_json(profiles):
+        lines.extend(batch)
+        error_count += errors
+    assert lines == [json.dumps(result) for result in expected]
+    assert error_count == sum(1 for result in expected if "error" in result)
+
+
+@pytest.mark.parametrize("profile", EDGE_CASES, ids=repr)
+def test_edge_case_matches_scalar(profile):
+    check([profile])
+
+
+def test_edge_cases_in_one_batch():
+    # Bad rows must not disturb the good rows around them
+    rng = random.Random(1)
+    profiles = []
+    for profile in EDGE_CASES:
+        profiles.append(numeric_profile(rng))
+        profiles.append(profile)
+    check(profiles)
+
+
+@pytest.mark.parametrize("make", [random_profile, numeric_profile])
+def test_random_profiles_match_scalar(make):
+    rng = random.Random(0)
+    check([make(rng) for _ in range(5000)])
+
+
+def test_batches_and_generators(monkeypatch):
+    monkeypatch.setattr(bulk_nutrition, "BATCH_SIZE", 64)
+    rng = random.Random(2)
+    profiles = [rng.choice([random_profile, numeric_profile])(rng) for _ in range(1000)]
+    check(profiles)
+    # NDJSON input arrives as a generator, not a list
+    expected = [scalar(profile) for profile in profiles]
+    assert list(calculate_nutrition_requirements_bulk(iter(profiles))) == expected
+
+
+def test_validation_errors_pass_through():
+    error = BulkValidationError("Invalid JSON on line 2: Expecting value")
+    results = list(calculate_nutrition_requirements_bulk([{"weight": 80}, error, {"weight": 60}]))
+    assert results[0] == calculate_nutrition_requirements({"weight": 80})
+    assert results[1] == {"error": "Invalid JSON on line 2: Expecting value"}
+    assert results[2] == calculate_nutrition_requirements({"weight": 60})
+
+
+def test_empty_input():
+    assert list(calculate_nutrition_requirements_bulk([])) == []
+    assert list(calculate_nutrition_requirements_bulk_json([])) == []
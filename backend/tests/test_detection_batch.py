@@ -0,0 +1,180 @@
+"""POST /api/detect-food/batch: shared flights for identical images and per-image errors.
+
+Gemini is replaced by a fake call_gemini; caches, flights and the user limiter
+are fresh for every test.
+
+    python -m pytest tests/test_detection_batch.py
+"""
+import io
+import os
+import sys
+import json
+import random
+import threading
+import time
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api import create_app, detection, services  # noqa: E402
+from near_duplicate import NearDuplicateIndex  # noqa: E402
+from rate_limit import RateLimited, TokenBucketLimiter  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+FOOD = {"foods": [{"name": "idli", "weight_g": 100}]}
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGemini:
+    """Answers single and batch prompts; `fail` maps an image's bytes to the error to raise for it."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = {}
+        self.batch_text = None
+        self.gate = None
+
+    def __call__(self, template, parts, generation_config):
+        images = [part["data"] for part in parts if isinstance(part, dict)]
+        self.calls.append((template, len(images)))
+        if self.gate is not None:
+            gate, self.gate = self.gate, None
+            gate.wait(5)
+        if template is detection.DETECTION_BATCH_PROMPT:
+            if self.batch_text is not None:
+                return Response(self.batch_text)
+            for blob in images:
+                if blob in self.fail:
+                    raise self.fail[blob]
+            return Response(json.dumps([FOOD] * len(images)))
+        if images[0] in self.fail:
+            raise self.fail[images[0]]
+        return Response(json.dumps(FOOD))
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini()
+    cache = ResultCache(max_entries=100, ttl=600)
+    index = NearDuplicateIndex()
+    flights = SingleFlight("detection")
+    unlimited = TokenBucketLimiter("user", 0, 1)
+    monkeypatch.setattr(detection, "call_gemini", fake)
+    monkeypatch.setattr(services, "detection_cache", lambda: cache)
+    monkeypatch.setattr(services, "near_duplicate_index", lambda: index)
+    monkeypatch.setattr(services, "detection_flights", lambda: flights)
+    monkeypatch.setattr(services, "user_rate_limiter", lambda: unlimited)
+    return fake
+
+
+@pytest.fixture
+def client(gemini):
+    return create_app().test_client()
+
+
+def jpeg(seed):
+    # Noise, so no two test images are near-duplicates of each other
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), bytes(rng.getrandbits(8) for _ in range(64 * 64 * 3))).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def upload_blob(data):
+    """The bytes Gemini receives for an upload (downscaled and re-encoded)."""
+    return detection.prepare_upload(FileStorage(io.BytesIO(data), filename="meal.jpg"))[1]["data"]
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def post_batch(client, images):
+    data = {"images": [(io.BytesIO(image), f"{i}.jpg") for i, image in enumerate(images)]}
+    return client.post("/api/detect-food/batch", data=data, content_type="multipart/form-data")
+
+
+def test_identical_images_in_one_batch_share_one_call(client, gemini):
+    image = jpeg(1)
+    response = post_batch(client, [image, image, image])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["error_count"] == 0
+    assert [r["foods"][0]["name"] for r in body["results"]] == ["idli"] * 3
+    assert gemini.calls == [(detection.DETECTION_PROMPT, 1)]
+    assert services.detection_flights().info() == {"calls": 1, "shared": 0, "in_flight": 0}
+
+
+def test_batch_joins_a_flight_already_in_progress(client, gemini):
+    first, second = jpeg(1), jpeg(2)
+    # The single upload's Gemini call is held until the batch has joined its flight
+    gate = gemini.gate = threading.Event()
+    responses = {}
+    single = threading.Thread(target=lambda: responses.update(single=client.post(
+        "/api/detect-food", data={"image": (io.BytesIO(first), "a.jpg")}, content_type="multipart/form-data"
+    )))
+    single.start()
+    flights = services.detection_flights()
+    wait_for(lambda: flights.info()["in_flight"] == 1)
+
+    batch = threading.Thread(target=lambda: responses.update(batch=post_batch(client, [first, second])))
+    batch.start()
+    wait_for(lambda: flights.info()["shared"] == 1)
+    gate.set()
+    single.join()
+    batch.join()
+
+    assert responses["single"].status_code == 200
+    results = responses["batch"].get_json()["results"]
+    assert [r["foods"][0]["name"] for r in results] == ["idli", "idli"]
+    # One call for the single upload, one for the batch's other image
+    assert gemini.calls == [(detection.DETECTION_PROMPT, 1), (detection.DETECTION_PROMPT, 1)]
+    assert flights.info() == {"calls": 2, "shared": 1, "in_flight": 0}
+
+
+def test_one_failing_image_is_a_per_item_error(client, gemini):
+    good, bad = jpeg(1), jpeg(2)
+    # The batch response is unusable, so each image is retried alone, and one of those calls fails
+    gemini.batch_text = "[]"
+    gemini.fail[upload_blob(bad)] = RuntimeError("upstream reset the connection")
+    response = post_batch(client, [good, bad, b"not an image"])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["error_count"] == 2
+    assert body["results"][0]["foods"][0]["name"] == "idli"
+    assert body["results"][1] == {"index": 1, "error": "Food detection service unavailable"}
+    assert "error" in body["results"][2]
+    assert [template for template, _ in gemini.calls] == [
+        detection.DETECTION_BATCH_PROMPT, detection.DETECTION_PROMPT, detection.DETECTION_PROMPT
+    ]
+    assert services.detection_flights().info()["in_flight"] == 0
+
+
+def test_rate_limited_batch_call_reports_every_image(client, gemini):
+    first, second = jpeg(1), jpeg(2)
+    gemini.fail[upload_blob(first)] = RateLimited("gemini rate limit reached", 7)
+    body = post_batch(client, [first, second]).get_json()
+    assert body["error_count"] == 2
+    for result in body["results"]:
+        assert result["error"] == "Too many requests" and result["retry_after"] == 7
+    assert services.detection_flights().info()["in_flight"] == 0
+
+
+def test_cached_images_are_not_sent_again(client, gemini):
+    image = jpeg(1)
+    post_batch(client, [image])
+    body = post_batch(client, [image, jpeg(2)]).get_json()
+    assert body["results"][0]["cache"] == "exact"
+    assert gemini.calls == [(detection.DETECTION_PROMPT, 1), (detection.DETECTION_PROMPT, 1)]
@@ -0,0 +1,83 @@
+"""FoodDatabase name matching: exact/alias hits are authoritative, near misses are not."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from food_db import FoodDatabase  # noqa: E402
+
+ESTIMATE = [111.0, 4.0, 12.0, 5.0]
+
+
+@pytest.fixture(scope="module")
+def db():
+    return FoodDatabase()
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("steamed rice", "steamed rice"),
+    ("Chawal", "steamed rice"),
+    ("chapathi", "chapati"),
+    ("Dal!", "dal tadka"),
+])
+def test_exact_and_alias_hits(db, name, expected):
+    entry_id, similarity = db.lookup(name)
+    assert db.names[entry_id] == expected
+    assert similarity == 1.0
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("chiken biryani", "chicken biryani"),
+    ("masala dosaa", "masala dosa"),
+    ("paneer tika", "paneer tikka"),
+])
+def test_typos_match_fuzzily(db, name, expected):
+    entry_id, similarity = db.lookup(name)
+    assert db.names[entry_id] == expected
+    assert 0.55 <= similarity < 1.0
+
+
+@pytest.mark.parametrize("name", [
+    "chicken soup",          # chicken 65
+    "egg fried rice",        # veg fried rice
+    "paneer tikka masala",   # paneer tikka
+    "paneer paratha",        # paratha
+    "chicken",
+    "",
+])
+def test_distinct_dishes_do_not_match(db, name):
+    assert db.lookup(name) is None
+
+
+@pytest.mark.parametrize("name", ["chicken soup", "egg fried rice", "paneer tikka masala", "paneer paratha"])
+def test_near_miss_keeps_llm_estimate(db, name):
+    food = db.compute([{"name": name, "weight_g": 200, "estimate": list(ESTIMATE)}])[0]
+    assert food["source"] == "llm"
+    assert [food[n] for n in ("calories", "protein_g", "carbs_g", "fats_g")] == ESTIMATE
+    assert "matched_name" not in food and "estimate" not in food
+
+
+def test_exact_hit_overrides_estimate(db):
+    food = db.compute([{"name": "idli", "weight_g": 200, "estimate": list(ESTIMATE)}])[0]
+    assert food["source"] == "db"
+    assert food["matched_name"] == "idli"
+    assert food["calories"] == 280.0
+
+
+def test_fuzzy_hit_prefers_estimate_and_is_flagged_without_one(db):
+    with_estimate = db.compute([{"name": "chiken biryani", "weight_g": 100, "estimate": list(ESTIMATE)}])[0]
+    assert with_estimate["source"] == "llm"
+    assert with_estimate["calories"] == ESTIMATE[0]
+
+    without = db.compute([{"name": "chiken biryani", "weight_g": 100}])[0]
+    assert without["source"] == "db_fuzzy"
+    assert without["matched_name"] == "chicken biryani"
+    assert 0.55 <= without["match_similarity"] < 1.0
+
+
+def test_unknown_without_estimate_is_zero(db):
+    food = db.compute([{"name": "chicken soup", "weight_g": 100}])[0]
+    assert food["source"] == "unknown"
+    assert food["calories"] == 0
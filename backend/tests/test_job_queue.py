@@ -0,0 +1,171 @@
+"""JobQueue leases and retries, and how detection_worker.process_job settles each outcome.
+
+    python -m pytest tests/test_job_queue.py
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import detection_worker  # noqa: E402
+from job_queue import JobQueue, QueueFull  # noqa: E402
+from rate_limit import RateLimited  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "blobs"), max_attempts=3, lease_seconds=60,
+                    max_queued=10, clock=clock)
+
+
+def test_claim_leases_the_oldest_job_once(queue, clock):
+    first = queue.enqueue("detect_food", {"n": 1}, b"image", owner="alice")
+    clock.advance(1)
+    queue.enqueue("detect_food", {"n": 2})
+
+    job = queue.claim("w1")
+    assert job["id"] == first
+    assert job["payload"] == {"n": 1}
+    assert job["blob"] == b"image"
+    assert job["attempts"] == 1
+    assert queue.get(first)["status"] == "running"
+    assert queue.get(first)["owner"] == "alice"
+    assert queue.claim("w2")["payload"] == {"n": 2}
+    assert queue.claim("w3") is None
+
+    queue.complete(first, {"meal_id": 7})
+    done = queue.get(first)
+    assert done["status"] == "done" and done["result"] == {"meal_id": 7}
+    assert not os.path.exists(queue._blob_path(first))
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    job_id = queue.enqueue("detect_food", {}, b"image")
+    assert queue.claim("dead-worker")["attempts"] == 1
+
+    clock.advance(59)
+    assert queue.claim("w2") is None
+    clock.advance(2)
+    job = queue.claim("w2")
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+    assert job["blob"] == b"image"
+
+
+def test_lease_expiry_gives_up_after_max_attempts(queue, clock):
+    job_id = queue.enqueue("detect_food", {})
+    for _ in range(3):
+        assert queue.claim("w")["id"] == job_id
+        clock.advance(61)
+    assert queue.claim("w") is None
+    failed = queue.get(job_id)
+    assert failed["status"] == "failed"
+    assert failed["error"] == "Gave up after 3 attempts"
+
+
+def test_retry_waits_for_delay(queue, clock):
+    job_id = queue.enqueue("detect_food", {})
+    queue.claim("w")
+    queue.retry(job_id, 30)
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.claim("w") is None
+    clock.advance(30)
+    assert queue.claim("w")["attempts"] == 2
+
+
+def test_deferral_does_not_use_up_attempts(queue, clock):
+    job_id = queue.enqueue("detect_food", {})
+    for _ in range(10):
+        job = queue.claim("w")
+        assert job["attempts"] == 1
+        queue.retry(job_id, 5, count_attempt=False)
+        clock.advance(5)
+    assert queue.get(job_id)["attempts"] == 0
+
+
+def test_queue_full(queue):
+    for _ in range(10):
+        queue.enqueue("detect_food", {}, b"image")
+    with pytest.raises(QueueFull):
+        queue.enqueue("detect_food", {}, b"image")
+    assert len(os.listdir(queue.blob_dir)) == 10
+
+
+def test_wait_times_out_on_unfinished_job(queue):
+    job_id = queue.enqueue("detect_food", {})
+    started = time.monotonic()
+    job = queue.wait(job_id, 0.2)
+    elapsed = time.monotonic() - started
+    assert job["status"] == "queued"
+    assert 0.2 <= elapsed < 1.0
+
+
+def test_wait_returns_finished_job_at_once(queue):
+    job_id = queue.enqueue("detect_food", {})
+    queue.claim("w")
+    queue.fail(job_id, "broken")
+    started = time.monotonic()
+    assert queue.wait(job_id, 5)["error"] == "broken"
+    assert time.monotonic() - started < 0.5
+    assert queue.wait("missing", 5) is None
+
+
+@pytest.mark.parametrize("timeout", [float("nan"), float("inf")])
+def test_wait_rejects_non_finite_timeout(queue, timeout):
+    with pytest.raises(ValueError):
+        queue.wait(queue.enqueue("detect_food", {}), timeout)
+
+
+def test_purge_drops_old_finished_jobs(queue, clock):
+    old = queue.enqueue("detect_food", {})
+    queue.claim("w")
+    queue.complete(old, {})
+    clock.advance(100)
+    pending = queue.enqueue("detect_food", {})
+    assert queue.purge(50) == 1
+    assert queue.get(old) is None
+    assert queue.get(pending)["status"] == "queued"
+
+
+# ==================== detection_worker.process_job ====================
+
+def run_worker_once(queue, monkeypatch, outcome):
+    def run_detection_job(job):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(detection_worker, "run_detection_job", run_detection_job)
+    job = queue.claim("w")
+    detection_worker.process_job(queue, job)
+    return queue.get(job["id"])
+
+
+def test_worker_completes_job(queue, monkeypatch):
+    queue.enqueue("detect_food", {})
+    job = run_worker_once(queue, monkeypatch, {"foods": []})
+    assert job["status"] == "done" and job["result"] == {"foods": []}
+
+
+def test_worker_defers_throttled_job_without_using_an_attempt(queue, clock, monkeypatch):
+    queue.enqueue("detect_food", {})
+    for _ in range(5):
+        job = run_worker_once(queue, monkeypatch, RateLimited("slow down", retry_after=2))
+        assert job["status"] == "queued" and job["attempts"] == 0
+        assert queue.claim("other") is None
+        clock.advance(2)
+
+
+def test_worker_fails_job_after_max_attempts(queue, clock, monkeypatch):
+    queue.enqueue("detect_food", {})
+    for attempt in range(1, 3):
+        job = run_worker_once(queue, monkeypatch, ConnectionError("upstream down"))
+        assert job["status"] == "queued" and job["attempts"] == attempt
+        clock.advance(60)
+    job = run_worker_once(queue, monkeypatch, ConnectionError("upstream down"))
+    assert job["status"] == "failed"
+    assert job["error"] == "Food detection service unavailable"
+    assert job["attempts"] == 3
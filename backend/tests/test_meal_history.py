@@ -0,0 +1,159 @@
+"""MealHistory keyset pages and rollups, and the /api/history input checks.
+
+    python -m pytest tests/test_meal_history.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api import auth, create_app, services  # noqa: E402
+from meal_history import MealHistory  # noqa: E402
+from test_auth import SECRET, make_token  # noqa: E402
+
+
+@pytest.fixture
+def history(tmp_path):
+    return MealHistory(str(tmp_path / "history.db"))
+
+
+def meal(consumed_at, calories=100.0, meal_type="lunch", **fields):
+    return {
+        "meal_type": meal_type,
+        "consumed_at": consumed_at,
+        "foods": [{"name": "idli", "weight_g": 100, "calories": calories, "protein_g": 4, "carbs_g": 20,
+                   "fats_g": 1}],
+        **fields,
+    }
+
+
+# ==================== Keyset pagination ====================
+
+def test_pages_walk_every_meal_once_newest_first(history):
+    ids = [history.add_meal("alice", meal(f"2026-03-{day:02d}T12:00:00Z"))["id"] for day in range(1, 8)]
+    # Two meals at the same instant are ordered by id
+    ids.append(history.add_meal("alice", meal("2026-03-07T12:00:00Z"))["id"])
+    history.add_meal("bob", meal("2026-03-05T12:00:00Z"))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = history.list_meals("alice", limit=3, cursor=cursor)
+        assert len(page) <= 3
+        seen.extend(m["id"] for m in page)
+        if cursor is None:
+            break
+    assert seen == [ids[7], ids[6], ids[5], ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+
+def test_last_full_page_has_no_cursor(history):
+    for day in range(1, 5):
+        history.add_meal("alice", meal(f"2026-03-{day:02d}T08:00:00Z"))
+    page, cursor = history.list_meals("alice", limit=2)
+    page, cursor = history.list_meals("alice", limit=2, cursor=cursor)
+    assert len(page) == 2 and cursor is None
+
+
+def test_page_carries_foods_and_filters_by_type(history):
+    history.add_meal("alice", meal("2026-03-01T08:00:00Z", meal_type="breakfast"))
+    history.add_meal("alice", meal("2026-03-01T13:00:00Z"))
+    page, _ = history.list_meals("alice", meal_type="breakfast")
+    assert [m["meal_type"] for m in page] == ["breakfast"]
+    assert page[0]["foods"][0]["name"] == "idli"
+    assert page[0]["calories"] == 100.0
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90LWEtY3Vyc29y", "MS4wOng"])
+def test_bad_cursor(history, cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        history.list_meals("alice", cursor=cursor)
+
+
+# ==================== Rollups ====================
+
+def test_daily_and_weekly_rollups(history):
+    # 2026-03-01 is a Sunday; the 2nd starts a new ISO week
+    history.add_meal("alice", meal("2026-03-01T08:00:00Z", calories=100))
+    history.add_meal("alice", meal("2026-03-01T20:00:00Z", calories=250))
+    history.add_meal("alice", meal("2026-03-03T12:00:00Z", calories=400))
+    history.add_meal("bob", meal("2026-03-03T12:00:00Z", calories=999))
+
+    days = history.rollups("alice", "day")
+    assert [(r["day"], r["meals"], r["calories"]) for r in days] == [
+        ("2026-03-01", 2, 350.0), ("2026-03-03", 1, 400.0)
+    ]
+    assert days[0]["protein"] == 8.0
+    weeks = history.rollups("alice", "week")
+    assert [(r["week"], r["meals"], r["calories"]) for r in weeks] == [
+        ("2026-02-23", 2, 350.0), ("2026-03-02", 1, 400.0)
+    ]
+    # A range starting mid-week still includes that week
+    assert [r["week"] for r in history.rollups("alice", "week", start="2026-03-01")] == ["2026-02-23", "2026-03-02"]
+    assert [r["day"] for r in history.rollups("alice", "day", start="2026-03-02", end="2026-03-03")] == ["2026-03-03"]
+
+
+def test_delete_takes_meal_out_of_rollups(history):
+    first = history.add_meal("alice", meal("2026-03-01T08:00:00Z", calories=100))
+    history.add_meal("alice", meal("2026-03-01T20:00:00Z", calories=250))
+    history.delete_meal("alice", first["id"])
+    assert [(r["meals"], r["calories"]) for r in history.rollups("alice")] == [(1, 250.0)]
+
+
+def test_detection_total_is_used_when_given(history):
+    saved = history.add_meal("alice", meal("2026-03-01T08:00:00Z", total={"calories": 512.34}))
+    assert saved["calories"] == 512.3
+
+
+def test_unknown_period(history):
+    with pytest.raises(ValueError):
+        history.rollups("alice", "month")
+
+
+# ==================== POST /api/history ====================
+
+@pytest.fixture
+def client(history, monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(services, "meal_history", lambda: history)
+    return create_app().test_client()
+
+
+def post(client, body):
+    return client.post("/api/history", json=body, headers={"Authorization": f"Bearer {make_token()}"})
+
+
+def test_save_requires_token(client):
+    assert client.post("/api/history", json=meal(None)).status_code == 401
+    response = client.post("/api/history", json=meal(None), headers={"Authorization": "Bearer x.y.z"})
+    assert response.status_code == 401
+
+
+def test_save_and_list(client):
+    response = post(client, meal("2026-03-01T08:00:00Z"))
+    assert response.status_code == 201
+    listed = client.get("/api/history", headers={"Authorization": f"Bearer {make_token()}"}).get_json()
+    assert [m["id"] for m in listed["meals"]] == [response.get_json()["id"]]
+    other = client.get("/api/history", headers={"Authorization": f"Bearer {make_token(sub='bob')}"}).get_json()
+    assert other["meals"] == []
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"foods": ["rice"]}, "foods[0] must be an object"),
+    ({"foods": "rice"}, "foods must be a list"),
+    ({"foods": [{"calories": 100}]}, "foods[0].name must be a non-empty string"),
+    ({"foods": [{"name": 42}]}, "foods[0].name must be a non-empty string"),
+    ({"foods": [{"name": "rice", "calories": "lots"}]}, "foods[0].calories must be a number"),
+    ({"foods": [{"name": "rice", "weight_g": True}]}, "foods[0].weight_g must be a number"),
+    ({"foods": [{"name": "rice", "protein_g": [1]}]}, "foods[0].protein_g must be a number"),
+    ({"foods": [], "calories": "500"}, "calories must be a number"),
+    ({"foods": [], "total": [500]}, "total must be an object"),
+    ({"foods": [], "total": {"fats_g": {}}}, "total.fats_g must be a number"),
+    ({"consumed_at": "yesterday"}, "consumed_at must be an ISO 8601 timestamp"),
+    (["not", "an", "object"], "Expected a JSON object"),
+])
+def test_save_rejects_malformed_meals(client, history, body, message):
+    response = post(client, body)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == message
+    assert history.info()["meals"] == 0
@@ -0,0 +1,55 @@
+"""plan_cache_key: requests that should share cached plans get the same key.
+
+    python -m pytest tests/test_plan_cache.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from plan_cache import canonical_diet, plan_cache_key  # noqa: E402
+from warm_plan_cache import DIETS  # noqa: E402
+
+NUTRITION = {"calories": 2013, "protein": 101, "carbs": 252, "fat": 67}
+
+
+def key(**data):
+    return plan_cache_key(NUTRITION, {"region": "South Indian", "goal": "balanced", **data})
+
+
+@pytest.mark.parametrize("alias, diet", [
+    ("veg", "vegetarian"),
+    ("Vegetarian", "vegetarian"),
+    (" VEG ", "vegetarian"),
+    ("", "vegetarian"),
+    (None, "vegetarian"),
+    ("non-veg", "non_veg"),
+    ("Non Vegetarian", "non_veg"),
+    ("egg", "eggetarian"),
+    ("vegan", "vegan"),
+])
+def test_diet_aliases_share_a_key(alias, diet):
+    assert canonical_diet(alias) == diet
+    assert key(meal_preference=alias) == key(meal_preference=diet)
+
+
+def test_profile_values_hit_warmed_keys():
+    # The values the profile and signup forms store
+    warmed = {key(meal_preference=diet) for diet in DIETS}
+    for diet in ("veg", "non_veg", "vegan", "eggetarian"):
+        assert key(meal_preference=diet) in warmed
+
+
+def test_distinct_requests_get_distinct_keys():
+    base = key(meal_preference="veg")
+    assert key(meal_preference="vegan") != base
+    assert key(meal_preference="veg", region="North Indian") != base
+    assert key(meal_preference="veg", health_conditions="diabetes") != base
+    assert plan_cache_key({**NUTRITION, "calories": 2500}, {"meal_preference": "veg"}) != base
+
+
+def test_targets_and_conditions_are_normalized():
+    assert plan_cache_key({**NUTRITION, "calories": 2020}, {}) == plan_cache_key(NUTRITION, {})
+    assert key(health_conditions="Diabetes, thyroid") == key(health_conditions=["thyroid", " diabetes"])
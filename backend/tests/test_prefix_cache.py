@@ -0,0 +1,69 @@
+"""GeminiPrefixCache: cache creation failures fall back to inline prompts and are retried later.
+
+    python -m pytest tests/test_prefix_cache.py
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from upstream_client import GeminiPrefixCache, UpstreamError  # noqa: E402
+
+TEMPLATE = SimpleNamespace(key="detect-v1", prefix="You are a nutritionist.")
+
+
+class FakeClient:
+    def __init__(self, create):
+        self.create = create
+        self.calls = []
+
+    def create_cached_content(self, prefix, ttl, display_name=None, timeout=None):
+        return self.create()
+
+    def generate_content(self, parts, generation_config=None, timeout=None, cached_content=None,
+                         system_instruction=None):
+        self.calls.append(cached_content or "inline")
+        return "response"
+
+
+def raise_(error):
+    def create():
+        raise error
+    return create
+
+
+@pytest.mark.parametrize("error", [
+    UpstreamError("HTTP 400: too few tokens", status_code=400),
+    RuntimeError("connection reset"),
+    TypeError("'NoneType' object is not subscriptable"),
+])
+def test_failed_creation_goes_inline_and_retries_later(clock, error):
+    client = FakeClient(raise_(error))
+    cache = GeminiPrefixCache(lambda: client, ttl=3600, retry_after=600, clock=clock)
+
+    assert cache.generate(TEMPLATE, ["photo"]) == "response"
+    assert cache.generate(TEMPLATE, ["photo"]) == "response"
+    assert client.calls == ["inline", "inline"]
+    assert cache.info()["create_failures"] == 1
+
+    # Once retry_after passes the next call tries to create the cache again
+    client.create = lambda: {"name": "cachedContents/abc"}
+    clock.advance(601)
+    cache.generate(TEMPLATE, ["photo"])
+    assert client.calls[-1] == "cachedContents/abc"
+    assert cache.info()["created"] == 1
+
+
+def test_interrupted_creation_does_not_block_later_calls(clock):
+    client = FakeClient(raise_(KeyboardInterrupt()))
+    cache = GeminiPrefixCache(lambda: client, retry_after=600, clock=clock)
+    with pytest.raises(KeyboardInterrupt):
+        cache.generate(TEMPLATE, ["photo"])
+
+    client.create = lambda: {"name": "cachedContents/abc"}
+    clock.advance(601)
+    cache.generate(TEMPLATE, ["photo"])
+    assert client.calls == ["cachedContents/abc"]
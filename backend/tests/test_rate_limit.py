@@ -0,0 +1,196 @@
+"""Token buckets (memory and SQLite stores) and SingleFlight coalescing.
+
+    python -m pytest tests/test_rate_limit.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rate_limit import MemoryBucketStore, RateLimited, SQLiteBucketStore, TokenBucketLimiter  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBucketStore(str(tmp_path / "buckets.db"))
+    return MemoryBucketStore()
+
+
+def limiter(store, clock, per_minute=60, burst=3):
+    return TokenBucketLimiter("user", per_minute, burst, store, clock=clock)
+
+
+def test_burst_then_limited(store, clock):
+    bucket = limiter(store, clock)
+    for _ in range(3):
+        bucket.acquire("alice")
+    with pytest.raises(RateLimited) as e:
+        bucket.acquire("alice")
+    assert e.value.retry_after == pytest.approx(1.0)
+    assert e.value.retry_after_header == "1"
+    assert bucket.info()["allowed"] == 3 and bucket.info()["limited"] == 1
+
+
+def test_refills_at_rate_up_to_burst(store, clock):
+    bucket = limiter(store, clock)
+    for _ in range(3):
+        bucket.acquire("alice")
+
+    clock.advance(0.5)
+    with pytest.raises(RateLimited) as e:
+        bucket.acquire("alice")
+    assert e.value.retry_after == pytest.approx(0.5)
+    clock.advance(0.5)
+    bucket.acquire("alice")
+
+    # A long idle period refills only up to the burst
+    clock.advance(3600)
+    for _ in range(3):
+        bucket.acquire("alice")
+    with pytest.raises(RateLimited):
+        bucket.acquire("alice")
+
+
+def test_keys_are_independent(store, clock):
+    bucket = limiter(store, clock, burst=1)
+    bucket.acquire("alice")
+    bucket.acquire("bob")
+    with pytest.raises(RateLimited):
+        bucket.acquire("alice")
+    assert store.count_keys() == 2
+
+
+def test_cost_is_capped_at_burst(store, clock):
+    bucket = limiter(store, clock)
+    bucket.acquire("alice", cost=10)
+    with pytest.raises(RateLimited) as e:
+        bucket.acquire("alice", cost=2)
+    assert e.value.retry_after == pytest.approx(2.0)
+
+
+def test_penalize_blocks_for_seconds(store, clock):
+    bucket = limiter(store, clock)
+    bucket.penalize("alice", 10)
+    clock.advance(9.5)
+    with pytest.raises(RateLimited):
+        bucket.acquire("alice")
+    clock.advance(0.5)
+    bucket.acquire("alice")
+
+
+def test_disabled_limiter_admits_everything(store, clock):
+    bucket = limiter(store, clock, per_minute=0)
+    for _ in range(100):
+        bucket.acquire("alice")
+    assert store.count_keys() == 0
+
+
+def test_sqlite_buckets_are_shared_between_connections(tmp_path, clock):
+    path = str(tmp_path / "buckets.db")
+    first = limiter(SQLiteBucketStore(path), clock, burst=2)
+    second = limiter(SQLiteBucketStore(path), clock, burst=2)
+    first.acquire("alice")
+    second.acquire("alice")
+    with pytest.raises(RateLimited):
+        first.acquire("alice")
+
+
+def test_memory_store_drops_least_recently_used_keys(clock):
+    store = MemoryBucketStore(max_keys=2)
+    bucket = limiter(store, clock, burst=1)
+    bucket.acquire("alice")
+    bucket.acquire("bob")
+    bucket.acquire("carol")
+    assert store.count_keys() == 2
+    # alice was forgotten, so her bucket starts full again
+    bucket.acquire("alice")
+
+
+# ==================== SingleFlight ====================
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("key", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Every thread has joined the flight before the leader finishes
+    wait_for(lambda: flights.info()["calls"] + flights.info()["shared"] == 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 4
+    assert flights.info() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+
+def test_waiters_receive_the_leaders_error():
+    flights = SingleFlight("test")
+    release = threading.Event()
+    errors = []
+
+    def work():
+        release.wait(5)
+        raise ValueError("upstream broke")
+
+    def call():
+        try:
+            flights.do("key", work)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flights.info()["shared"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and len({id(e) for e in errors}) == 1
+
+
+def test_finished_calls_are_not_remembered():
+    flights = SingleFlight("test")
+    assert flights.do("key", lambda: 1) == (1, False)
+    assert flights.do("key", lambda: 2) == (2, False)
+
+
+def test_lead_and_finish():
+    flights = SingleFlight("test")
+    assert flights.lead(["a", "b"]) == {"a", "b"}
+    assert flights.lead(["b", "c"]) == {"c"}
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(flights.do("a", lambda: "not run")))
+    waiter.start()
+    wait_for(lambda: flights.info()["shared"] == 1)
+    flights.finish("a", result="from batch")
+    waiter.join()
+    assert results == [("from batch", True)]
+
+    flights.finish("b", error=RuntimeError("batch failed"))
+    flights.finish("c")
+    assert flights.info()["in_flight"] == 0
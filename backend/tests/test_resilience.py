@@ -0,0 +1,220 @@
+"""CircuitBreaker transitions and ResilientCaller retries against an injected clock.
+
+    python -m pytest tests/test_resilience.py
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, ResilientCaller  # noqa: E402
+from upstream_client import UpstreamError  # noqa: E402
+from upstream_limits import UpstreamBusy  # noqa: E402
+
+
+def upstream_error(status_code):
+    return UpstreamError(f"HTTP {status_code}", status_code=status_code)
+
+
+def failing(error, clock=None, seconds=0.0, calls=None):
+    """fn for ResilientCaller.call that takes `seconds` of clock time and raises `error`."""
+    def fn(timeout):
+        if calls is not None:
+            calls.append(timeout)
+        if clock is not None:
+            clock.advance(seconds)
+        raise error
+    return fn
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=2, reset_timeout=30, clock=clock)
+
+
+def caller(breaker, clock, **options):
+    options = {"deadline": 10, "max_attempts": 1, "base_delay": 1, "max_delay": 1, "max_workers": 4, **options}
+    return ResilientCaller("test", breaker=breaker, clock=clock, sleep=clock.sleep, **options)
+
+
+def open_breaker(breaker):
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+# ==================== CircuitBreaker ====================
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.info()["opened"] == 1
+
+
+def test_open_half_open_closed(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(10)
+    with pytest.raises(CircuitOpen) as e:
+        breaker.before_call()
+    assert e.value.retry_after == pytest.approx(20)
+    assert breaker.info()["retry_in_s"] == 20.0
+
+    clock.advance(20)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    assert breaker.info()["rejected"] == 2
+
+
+def test_failed_probe_reopens(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.info()["opened"] == 2
+    clock.advance(29)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.advance(1)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_released_probe_lets_the_next_call_probe(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+# ==================== ResilientCaller ====================
+
+def test_retries_until_success(clock):
+    attempts = []
+
+    def fn(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise upstream_error(503)
+        return "ok"
+
+    breaker = CircuitBreaker("test", failure_threshold=100, clock=clock)
+    resilient = caller(breaker, clock, max_attempts=3)
+    assert resilient.call(fn) == "ok"
+    assert len(attempts) == 3
+    # Each attempt gets what is left of the deadline after the backoff sleeps
+    assert attempts == [10, 9, 8]
+    assert resilient.info()["retries"] == 2
+    assert breaker.state == "closed"
+
+
+def test_retry_gives_up_at_deadline(clock):
+    calls = []
+    resilient = caller(CircuitBreaker("test", failure_threshold=100, clock=clock), clock,
+                       deadline=3.5, max_attempts=10)
+    started = clock()
+    with pytest.raises(UpstreamError):
+        resilient.call(failing(upstream_error(503), calls=calls))
+    # Sleeps of 1s after the first three failures leave 0.5s, too little for another backoff
+    assert len(calls) == 4
+    assert calls == [3.5, 2.5, 1.5, 0.5]
+    assert clock() - started == pytest.approx(3.0)
+    assert resilient.info()["failures"] == 1
+
+
+def test_time_spent_in_attempts_counts_against_deadline(clock):
+    calls = []
+    resilient = caller(CircuitBreaker("test", failure_threshold=100, clock=clock), clock,
+                       deadline=10, max_attempts=10)
+    with pytest.raises(UpstreamError):
+        resilient.call(failing(upstream_error(502), clock, seconds=4, calls=calls))
+    assert calls == [10, 5]
+
+
+def test_client_errors_are_not_retried_and_count_as_success(breaker, clock):
+    breaker.record_failure()
+    calls = []
+    resilient = caller(breaker, clock, max_attempts=3)
+    with pytest.raises(UpstreamError):
+        resilient.call(failing(upstream_error(400), calls=calls))
+    assert len(calls) == 1
+    assert breaker.info()["consecutive_failures"] == 0
+
+
+def test_local_errors_do_not_close_a_half_open_breaker(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(30)
+    resilient = caller(breaker, clock)
+    with pytest.raises(KeyError):
+        resilient.call(failing(KeyError("candidates")))
+    assert breaker.state == "half_open"
+    # The probe slot was handed back
+    assert resilient.call(lambda timeout: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast(breaker, clock):
+    resilient = caller(breaker, clock, max_attempts=1)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            resilient.call(failing(upstream_error(500)))
+    calls = []
+    with pytest.raises(CircuitOpen):
+        resilient.call(failing(upstream_error(500), calls=calls))
+    assert calls == []
+
+
+def test_busy_limiter_is_not_an_upstream_failure(breaker, clock):
+    resilient = caller(breaker, clock)
+    for _ in range(5):
+        with pytest.raises(UpstreamBusy):
+            resilient.call(failing(UpstreamBusy("no slot")))
+    assert breaker.state == "closed"
+    assert breaker.info()["consecutive_failures"] == 0
+
+
+def test_guard_records_stream_outcomes(breaker, clock):
+    resilient = caller(breaker, clock)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            with resilient.guard():
+                raise upstream_error(503)
+    assert breaker.state == "open"
+
+    clock.advance(30)
+    with pytest.raises(ValueError):
+        with resilient.guard():
+            raise ValueError("bad chunk")
+    assert breaker.state == "half_open"
+    with resilient.guard():
+        pass
+    assert breaker.state == "closed"
+
+
+def test_stalled_attempt_hits_the_deadline():
+    release = threading.Event()
+    resilient = ResilientCaller("test", deadline=0.1, max_attempts=1, max_workers=2)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            resilient.call(lambda timeout: release.wait(5))
+        assert resilient.info()["deadline_exceeded"] == 1
+    finally:
+        release.set()
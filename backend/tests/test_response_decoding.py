@@ -0,0 +1,110 @@
+"""repair_json and decode_json on the almost-JSON LLMs produce.
+
+    python -m pytest tests/test_response_decoding.py
+"""
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_decoding import (  # noqa: E402
+    SchemaError, TruncatedOutput, decode_json, repair_json, repair_json_checked, validate_detection
+)
+
+REPAIRS = [
+    # (input, parsed result)
+    ('{"a": 1}', {"a": 1}),
+    ('Sure! Here is the plan:\n{"a": 1}\nEnjoy!', {"a": 1}),
+    ("{'a': 'it\\'s'}", {"a": "it's"}),
+    ("{'a': 'say \"hi\"'}", {"a": 'say "hi"'}),
+    ('{"a": "line one\nline two\ttab"}', {"a": "line one\nline two\ttab"}),
+    ('{a: 1, b_c: x}', {"a": 1, "b_c": "x"}),
+    ('{"a": 1,}', {"a": 1}),
+    ('[1, 2, ]', [1, 2]),
+    ('{"a": [1, 2,],}', {"a": [1, 2]}),
+    ('{"w": 15g, "c": 250 kcal, "p": 12.5 grams, "f": 5%}', {"w": 15, "c": 250, "p": 12.5, "f": 5}),
+    ('{"n": -1.5e3}', {"n": -1500.0}),
+    ('{"a": true, "b": null, "c": false}', {"a": True, "b": None, "c": False}),
+    ('{"a": 1 // the first\n, "b": 2}', {"a": 1, "b": 2}),
+    ('{"a": 1, /* skip\nthis */ "b": 2}', {"a": 1, "b": 2}),
+    ('// leading\n{"a": [1 /* one */, 2]}', {"a": [1, 2]}),
+    # Slashes inside bare tokens and strings are not comments
+    ('{"url": http://x.com/a}', {"url": "http://x.com/a"}),
+    ('{"url": "http://x.com/a"}', {"url": "http://x.com/a"}),
+    ('{"path": a/b//c, "n": 1}', {"path": "a/b//c", "n": 1}),
+    ('{"links": [http://a.com/x, https://b.org/y]}', {"links": ["http://a.com/x", "https://b.org/y"]}),
+    ('{"url": http://x.com/a // homepage\n}', {"url": "http://x.com/a"}),
+    ('{"time": 12:30, meal: lunch}', {"time": "12:30", "meal": "lunch"}),
+    ('{"ratio": 1/2}', {"ratio": "1/2"}),
+    ('{"a": {"b": [{"c": 1}]}} trailing {"ignored": 2}', {"a": {"b": [{"c": 1}]}}),
+]
+
+TRUNCATED = [
+    # (input, parsed prefix)
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}),
+    ('{"a": "unterminated', {"a": "unterminated"}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1,', {"a": 1}),
+    ('[{"dish": "idli"}, {"dish": "do', [{"dish": "idli"}, {"dish": "do"}]),
+    ('{"url": http://x.com/a', {"url": "http://x.com/a"}),
+]
+
+
+@pytest.mark.parametrize("text, expected", REPAIRS, ids=[r[0][:40] for r in REPAIRS])
+def test_repair(text, expected):
+    repaired, truncated = repair_json_checked(text)
+    assert json.loads(repaired) == expected
+    assert not truncated
+
+
+@pytest.mark.parametrize("text, expected", TRUNCATED, ids=[t[0] for t in TRUNCATED])
+def test_repair_truncated(text, expected):
+    repaired, truncated = repair_json_checked(text)
+    assert json.loads(repaired) == expected
+    assert truncated
+    assert repair_json(text) == repaired
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "just words: and colons"])
+def test_repair_without_json(text):
+    with pytest.raises(ValueError, match="No JSON object or array found"):
+        repair_json(text)
+
+
+DETECTION = {"foods": [{"name": "idli", "weight_g": 100}]}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(DETECTION),
+    "```json\n" + json.dumps(DETECTION) + "\n```",
+    "{foods: [{name: 'idli', weight_g: 100g,},],}",
+    '{"foods": [{"name": "idli", "weight_g": "100 g"}]} // done',
+])
+def test_decode_valid_and_repairable(text):
+    assert decode_json(text, validate_detection) == {"foods": [{"name": "idli", "weight_g": 100}]}
+
+
+def test_decode_truncated_is_rejected_unless_allowed():
+    text = '{"foods": [{"name": "idli", "weight_g": 100}, {"name": "sam'
+    with pytest.raises(TruncatedOutput):
+        decode_json(text, validate_detection)
+    # The partial item fails the schema (no weight_g) even when truncation is allowed
+    with pytest.raises(SchemaError):
+        decode_json(text, validate_detection, allow_truncated=True)
+    partial = decode_json('{"foods": [{"name": "idli", "weight_g": 100}', validate_detection, allow_truncated=True)
+    assert partial == DETECTION
+
+
+@pytest.mark.parametrize("text, message", [
+    ('{"foods": "idli"}', r"\$.foods: expected an array"),
+    ('{"foods": [{"name": "idli"}]}', r"\$.foods\[0\]: missing required field 'weight_g'"),
+    ('{"foods": [{"name": "idli", "weight_g": "heavy"}]}', r"\$.foods\[0\].weight_g: expected a number"),
+    ('{"foods": [{"name": "idli", "weight_g": true}]}', r"\$.foods\[0\].weight_g: expected a number"),
+])
+def test_decode_schema_errors(text, message):
+    with pytest.raises(SchemaError, match=message):
+        decode_json(text, validate_detection)
@@ -0,0 +1,91 @@
+import os
+import io
+import tempfile
+from typing import Optional, Dict
+
+from PIL import ImageFile
+
+CHUNK_SIZE = 64 * 1024
+HEADER_PROBE_BYTES = 1024
+# JPEG frame headers can sit behind large EXIF/ICC segments
+MAX_HEADER_BYTES = 256 * 1024
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def sniff_image_header(stream, max_dimension: int = 5000) -> Dict:
+    """Parse format and dimensions from the first bytes of the stream.
+
+    Starts with HEADER_PROBE_BYTES and keeps feeding chunks only until PIL has
+    seen the frame header. The stream is rewound afterwards.
+    """
+    parser = ImageFile.Parser()
+    consumed = 0
+    size = HEADER_PROBE_BYTES
+    try:
+        while parser.image is None and consumed < MAX_HEADER_BYTES:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            consumed += len(chunk)
+            parser.feed(chunk)
+            size = CHUNK_SIZE
+    except Exception:
+        raise ValueError("Invalid image file")
+    finally:
+        stream.seek(0)
+
+    if parser.image is None:
+        raise ValueError("Invalid image file")
+
+    width, height = parser.image.size
+    if width > max_dimension or height > max_dimension:
+        raise ValueError("Image dimensions too large")
+
+    return {"format": parser.image.format, "width": width, "height": height}
+
+
+def _stream_size(stream) -> Optional[int]:
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def ingest_upload(file_storage, max_bytes: int):
+    """Return (stream, size) for an uploaded file without copying it into bytes.
+
+    Werkzeug has already spooled the part into a BytesIO or a temp file; if it
+    is seekable we only measure it. Otherwise the part is copied chunk by chunk
+    into a SpooledTemporaryFile, aborting as soon as max_bytes is exceeded.
+    """
+    source = file_storage.stream
+    size = _stream_size(source)
+
+    if size is not None:
+        if size > max_bytes:
+            raise UploadTooLarge("Image file too large")
+        # Hand werkzeug's own buffer/temp file to PIL as is
+        source.seek(0)
+        return source, size
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+    size = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            spooled.close()
+            raise UploadTooLarge("Image file too large")
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled, size
@@ -0,0 +1,381 @@
+import time
+import json
+import base64
+import logging
+import threading
+from typing import Callable, Optional, Dict, List, Iterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Last line of an OpenAI-style server-sent event stream
+SSE_DONE = "data: [DONE]"
+
+
+class UpstreamError(RuntimeError):
+    """Raised for transport failures and non-2xx responses from an upstream."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds from a Retry-After header; the HTTP-date form is ignored."""
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class UpstreamClient:
+    """Long-lived pooled HTTP client for one upstream, with basic metrics.
+
+    One instance is created per process and shared by all requests, so TCP and
+    TLS handshakes are paid once per pooled connection rather than per call.
+    """
+
+    def __init__(self, name: str, base_url: str, pool_size: int = 20,
+                 connect_timeout: float = 5, read_timeout: float = 60,
+                 http2: bool = True, headers: Optional[Dict] = None, verify: bool = True, cassette=None):
+        self.name = name
+        # cassettes.Cassette: record every response, or serve them all from disk without a network call
+        self.cassette = cassette
+        self.replaying = cassette is not None and cassette.mode == "replay"
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.connect_timeout = connect_timeout
+        self._client = httpx.Client(
+            base_url=base_url,
+            http2=self.http2,
+            headers=headers or {},
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=120
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "tls_handshakes": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0
+        }
+
+    def _trace(self, event_name: str, info: Dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.stats["connections_opened"] += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.stats["tls_handshakes"] += 1
+
+    def _timeout(self, timeout: Optional[float]):
+        """Per-call read timeout (e.g. what is left of a deadline); None keeps the client default."""
+        if timeout is None:
+            return httpx.USE_CLIENT_DEFAULT
+        timeout = max(0.1, timeout)
+        return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+
+    def post_json(self, path: str, payload: Dict, params: Optional[Dict] = None,
+                  timeout: Optional[float] = None) -> Dict:
+        start = time.perf_counter()
+        if self.replaying:
+            return self._replay(start, path, payload)
+        try:
+            response = self._client.post(
+                path, json=payload, params=params, timeout=self._timeout(timeout),
+                extensions={"trace": self._trace}
+            )
+        except httpx.HTTPError as e:
+            self._record(start, error=True)
+            raise UpstreamError(f"{self.name} request failed: {str(e)}") from e
+
+        if response.status_code >= 400:
+            self._record(start, error=True)
+            raise UpstreamError(
+                f"{self.name} returned HTTP {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                retry_after=_retry_after(response)
+            )
+
+        self._record(start)
+        body = response.json()
+        if self.cassette is not None:
+            self.cassette.record(self.name, path, payload, body, (time.perf_counter() - start) * 1000)
+        return body
+
+    def stream_post_lines(self, path: str, payload: Dict, timeout: Optional[float] = None) -> Iterator[str]:
+        """POST and yield response lines as they arrive (for SSE upstreams)."""
+        start = time.perf_counter()
+        if self.replaying:
+            yield from self._replay(start, path, payload, stream=True)
+            return
+        lines = [] if self.cassette is not None else None
+        try:
+            with self._client.stream("POST", path, json=payload, timeout=self._timeout(timeout),
+                                     extensions={"trace": self._trace}) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    self._record(start, error=True)
+                    raise UpstreamError(
+                        f"{self.name} returned HTTP {response.status_code}: {response.text[:500]}",
+                        status_code=response.status_code,
+                        retry_after=_retry_after(response)
+                    )
+                for line in response.iter_lines():
+                    if lines is not None:
+                        lines.append(line)
+                    yield line
+        except httpx.HTTPError as e:
+            self._record(start, error=True)
+            raise UpstreamError(f"{self.name} stream failed: {str(e)}") from e
+        except GeneratorExit:
+            # Readers stop at the end-of-stream event; a stream abandoned before it is not recorded
+            if lines and lines[-1].strip() == SSE_DONE:
+                self.cassette.record(self.name, path, payload, lines, (time.perf_counter() - start) * 1000,
+                                     stream=True)
+            raise
+        self._record(start)
+        if lines is not None:
+            self.cassette.record(self.name, path, payload, lines, (time.perf_counter() - start) * 1000, stream=True)
+
+    def _replay(self, start: float, path: str, payload: Dict, stream: bool = False):
+        try:
+            response = self.cassette.replay(self.name, path, payload, stream=stream)
+        except UpstreamError:
+            self._record(start, error=True)
+            raise
+        self._record(start)
+        return response
+
+    def _record(self, start: float, error: bool = False) -> None:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats["requests"] += 1
+            if error:
+                self.stats["errors"] += 1
+            self.stats["latency_ms_total"] += elapsed_ms
+            self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], elapsed_ms)
+
+    def info(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        requests = stats["requests"]
+        stats["latency_ms_avg"] = round(stats["latency_ms_total"] / requests, 1) if requests else 0.0
+        stats["latency_ms_total"] = round(stats["latency_ms_total"], 1)
+        stats["latency_ms_max"] = round(stats["latency_ms_max"], 1)
+        stats["http2"] = self.http2
+        return stats
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class TogetherClient(UpstreamClient):
+    """OpenAI-compatible chat completions against Together.ai."""
+
+    def __init__(self, api_key: Optional[str], base_url: str = "https://api.together.xyz/v1", **kwargs):
+        super().__init__(
+            "together", base_url,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            **kwargs
+        )
+
+    def chat_completion(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **params) -> Dict:
+        """Returns the raw completion dict (same shape as openai.ChatCompletion)."""
+        return self.post_json("/chat/completions", {"model": model, "messages": messages, **params}, timeout=timeout)
+
+    def stream_chat_completion(self, model: str, messages: List[Dict], timeout: Optional[float] = None,
+                               **params) -> Iterator[str]:
+        """Yield content deltas from a streamed chat completion."""
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        for line in self.stream_post_lines("/chat/completions", payload, timeout=timeout):
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+class GeminiResponse:
+    """Minimal stand-in for the SDK response object: exposes .text."""
+
+    def __init__(self, payload: Dict):
+        self.payload = payload
+
+    @property
+    def text(self) -> str:
+        candidates = self.payload.get("candidates") or []
+        if not candidates:
+            reason = self.payload.get("promptFeedback", {}).get("blockReason", "no candidates")
+            raise ValueError(f"Gemini returned no content ({reason})")
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+
+class GeminiClient(UpstreamClient):
+    """generateContent over the Gemini REST API."""
+
+    def __init__(self, api_key: Optional[str], model: str = "gemini-1.5-flash",
+                 base_url: str = "https://generativelanguage.googleapis.com/v1beta", **kwargs):
+        super().__init__(
+            "gemini", base_url,
+            headers={"x-goog-api-key": api_key} if api_key else {},
+            **kwargs
+        )
+        self.model = model
+
+    def _request(self, parts: List, system_instruction: Optional[str] = None) -> Dict:
+        payload = {"contents": [{"role": "user", "parts": [self._to_part(part) for part in parts]}]}
+        if system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        return payload
+
+    def generate_content(self, parts: List, generation_config: Optional[Dict] = None,
+                         timeout: Optional[float] = None, system_instruction: Optional[str] = None,
+                         cached_content: Optional[str] = None) -> GeminiResponse:
+        """Parts are prompt strings or {"mime_type", "data"} blobs, as with the SDK.
+
+        cached_content names a context cache (see GeminiPrefixCache) that
+        already holds the system instruction.
+        """
+        payload = self._request(parts, system_instruction)
+        if cached_content:
+            payload["cachedContent"] = cached_content
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return GeminiResponse(self.post_json(f"/models/{self.model}:generateContent", payload, timeout=timeout))
+
+    def create_cached_content(self, system_instruction: str, ttl: float, display_name: str = "",
+                              timeout: Optional[float] = None) -> Dict:
+        """Store a system instruction as a context cache; returns its "name" and "expireTime"."""
+        payload = {
+            "model": f"models/{self.model}",
+            "displayName": display_name,
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "ttl": f"{int(ttl)}s"
+        }
+        return self.post_json("/cachedContents", payload, timeout=timeout)
+
+    def count_tokens(self, parts: List, system_instruction: Optional[str] = None) -> int:
+        payload = {"generateContentRequest": {"model": f"models/{self.model}",
+                                              **self._request(parts, system_instruction)}}
+        return self.post_json(f"/models/{self.model}:countTokens", payload).get("totalTokens", 0)
+
+    @staticmethod
+    def _to_part(part) -> Dict:
+        if isinstance(part, str):
+            return {"text": part}
+        return {
+            "inline_data": {
+                "mime_type": part["mime_type"],
+                "data": base64.b64encode(part["data"]).decode("ascii")
+            }
+        }
+
+
+class GeminiPrefixCache:
+    """Gemini context caches holding the static prefix of each prompt template.
+
+    With caching enabled the first call for a template stores its prefix as
+    cached content (for `ttl` seconds, renewed shortly before it expires) and
+    later calls only send their images and variable text. Gemini refuses to
+    cache prompts below a model-specific minimum size; a template it refuses
+    is sent inline for `retry_after` seconds before trying again. Inline, the
+    prefix goes first as the system instruction so implicit prefix caching
+    can still apply. Each process keeps its own caches.
+    """
+
+    def __init__(self, client_factory, enabled: bool = True, ttl: float = 3600, retry_after: float = 3600,
+                 clock: Callable[[], float] = time.time):
+        self.client_factory = client_factory
+        self.clock = clock
+        self.enabled = enabled
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"cached_calls": 0, "inline_calls": 0, "created": 0, "create_failures": 0, "invalidated": 0}
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _cached_name(self, template, timeout: Optional[float]) -> Optional[str]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(template.key)
+            if entry is not None:
+                if entry.get("name") and entry["expires"] - now > min(300.0, self.ttl / 10):
+                    return entry["name"]
+                if entry.get("creating") or entry.get("failed_until", 0) > now:
+                    return None
+            # One thread (re)creates the cache; the others go inline meanwhile
+            self._entries[template.key] = {**(entry or {}), "creating": True}
+        name = None
+        try:
+            name = self.client_factory().create_cached_content(
+                template.prefix, self.ttl, display_name=template.key, timeout=timeout
+            )["name"]
+        except Exception as e:
+            # Refused (prompt below the minimum size), unreachable, or a malformed answer
+            logger.warning(f"Gemini context cache for {template.key} unavailable, sending it inline: {str(e)[:200]}")
+        finally:
+            # Always clear "creating", or no thread would ever try again
+            with self._lock:
+                if name:
+                    self._entries[template.key] = {"name": name, "expires": now + self.ttl}
+                    self.stats["created"] += 1
+                else:
+                    self._entries[template.key] = {"failed_until": now + self.retry_after}
+                    self.stats["create_failures"] += 1
+        return name
+
+    def invalidate(self, template) -> None:
+        with self._lock:
+            self._entries.pop(template.key, None)
+            self.stats["invalidated"] += 1
+
+    def generate(self, template, parts: List, generation_config: Optional[Dict] = None,
+                 timeout: Optional[float] = None) -> GeminiResponse:
+        """generate_content with the template's prefix cached when possible, else inline."""
+        client = self.client_factory()
+        name = self._cached_name(template, timeout) if self.enabled else None
+        if name:
+            try:
+                response = client.generate_content(parts, generation_config, timeout=timeout, cached_content=name)
+                self._count("cached_calls")
+                return response
+            except UpstreamError as e:
+                # Expired early or deleted; anything else is a real error
+                if e.status_code not in (400, 403, 404):
+                    raise
+                logger.warning(f"Gemini context cache {name} rejected, sending the prefix inline")
+                self.invalidate(template)
+        self._count("inline_calls")
+        return client.generate_content(parts, generation_config, timeout=timeout,
+                                       system_instruction=template.prefix)
+
+    def info(self) -> Dict:
+        now = self.clock()
+        with self._lock:
+            caches = {key: round(entry["expires"] - now) for key, entry in self._entries.items() if entry.get("name")}
+            return {"enabled": self.enabled, **self.stats, "caches_expire_in_s": caches}
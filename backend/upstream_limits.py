@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+
+class UpstreamBusy(RuntimeError):
+    pass
+
+
+class UpstreamLimiter:
+    """Bounded concurrency for one upstream (Together.ai, Gemini, ...).
+
+    Uses threading primitives, which gevent's monkey patching turns into
+    cooperative ones, so the same code bounds OS threads under the dev server
+    and greenlets under gunicorn's gevent worker.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, acquire_timeout: float = 30):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamBusy(f"{self.name} is at its concurrency limit")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,182 @@
+"""Pre-generate meal plans for popular profile buckets into the plan store.
+
+Enumerates gender x activity level x goal x diet x region x weight/height/age
+buckets, maps each profile through calculate_nutrition_requirements and
+plan_cache_key, and generates plans for every bucket that does not yet hold
+PLAN_CACHE_VARIANTS unexpired variants (within PLAN_CACHE_STALE_TTL).
+Because already-filled buckets are skipped, an interrupted run can simply be
+restarted, and a periodic run regenerates buckets whose plans have expired.
+
+Plans are written to the SQLite plan store; run the server with
+PLAN_CACHE_BACKEND=sqlite and the same PLAN_CACHE_PATH to serve them.
+
+    python warm_plan_cache.py --dry-run
+    python warm_plan_cache.py --concurrency 4 --rpm 60
+"""
+import time
+import random
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api.config import PLAN_CACHE_PATH, PLAN_CACHE_VARIANTS, PLAN_CACHE_FRESH_TTL, PLAN_CACHE_STALE_TTL
+from api.meal_plan import build_meal_plan_prompt, request_meal_plan
+from nutrition import ACTIVITY_MULTIPLIERS, GOAL_ADJUSTMENTS, calculate_nutrition_requirements
+from plan_cache import PlanCache, SQLitePlanStore, plan_cache_key
+from rate_limit import RateLimited
+from upstream_client import UpstreamError
+
+logger = logging.getLogger("warm_plan_cache")
+
+# Canonical spellings (see plan_cache.DIET_ALIASES); the profile's "veg" maps to "vegetarian"
+DIETS = ["vegetarian", "non_veg", "vegan", "eggetarian"]
+REGIONS = ["South Indian", "North Indian", "East Indian", "West Indian"]
+GENDERS = ["male", "female"]
+
+
+def parse_range(value):
+    """"50:100:10" -> [50, 60, ..., 100]; "60,70" -> [60, 70]"""
+    if ":" in value:
+        start, stop, step = (int(v) for v in value.split(":"))
+        return list(range(start, stop + 1, step))
+    return [int(v) for v in value.split(",")]
+
+
+def enumerate_buckets(args):
+    """Map every profile combination to its cache key; returns {key: request data}."""
+    buckets = {}
+    profiles = 0
+    for gender in GENDERS:
+        for activity_level in ACTIVITY_MULTIPLIERS:
+            for goal in GOAL_ADJUSTMENTS:
+                for weight in args.weights:
+                    for height in args.heights:
+                        for age in args.ages:
+                            nutrition = calculate_nutrition_requirements({
+                                "weight": weight, "height": height, "age": age,
+                                "gender": gender, "activity_level": activity_level, "goal": goal
+                            })
+                            for diet in args.diets:
+                                for region in args.regions:
+                                    profiles += 1
+                                    data = {"meal_preference": diet, "region": region, "goal": goal}
+                                    key = plan_cache_key(nutrition, data)
+                                    if key not in buckets:
+                                        buckets[key] = (data, nutrition)
+    return profiles, buckets
+
+
+class RateLimiter:
+    """Spaces out calls to at most `rpm` per minute across all threads."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, seconds):
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def generate_with_backoff(prompt, limiter, max_retries):
+    for attempt in range(max_retries + 1):
+        limiter.wait()
+        try:
+            return request_meal_plan(prompt)
+        except RateLimited as e:
+            # Our own Together.ai bucket is empty, or the upstream answered 429
+            if attempt == max_retries:
+                raise
+            logger.warning(f"Rate limited, backing off {e.retry_after:.1f}s")
+            limiter.penalize(e.retry_after)
+        except UpstreamError as e:
+            if e.status_code not in (429, 500, 502, 503, 504) or attempt == max_retries:
+                raise
+            backoff = min(60, 2 ** attempt) + random.random()
+            logger.warning(f"Upstream returned {e.status_code}, backing off {backoff:.1f}s")
+            # Throttling applies to the whole account, so slow every thread down
+            limiter.penalize(backoff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=PLAN_CACHE_PATH)
+    parser.add_argument("--variants", type=int, default=PLAN_CACHE_VARIANTS)
+    parser.add_argument("--weights", type=parse_range, default=parse_range("50:100:10"))
+    parser.add_argument("--heights", type=parse_range, default=parse_range("150:190:10"))
+    parser.add_argument("--ages", type=parse_range, default=parse_range("20:60:10"))
+    parser.add_argument("--diets", type=lambda v: v.split(","), default=DIETS)
+    parser.add_argument("--regions", type=lambda v: v.split(","), default=REGIONS)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=60, help="max upstream requests per minute")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=0, help="generate at most this many plans")
+    parser.add_argument("--dry-run", action="store_true", help="only count profiles and buckets")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    profiles, buckets = enumerate_buckets(args)
+    logger.info(f"{profiles} profiles map to {len(buckets)} buckets")
+    if args.dry_run:
+        print(f"profiles: {profiles}\nbuckets: {len(buckets)}\n"
+              f"plans needed (at {args.variants} variants): {len(buckets) * args.variants}")
+        return
+
+    cache = PlanCache(SQLitePlanStore(args.store), variants=args.variants,
+                      fresh_ttl=PLAN_CACHE_FRESH_TTL, stale_ttl=PLAN_CACHE_STALE_TTL)
+    work = []
+    for key, (data, nutrition) in buckets.items():
+        # Expired variants are never served, so they do not count towards a full bucket
+        missing = args.variants - len(cache.live_variants(key))
+        work.extend([(key, data, nutrition)] * max(missing, 0))
+    if args.limit:
+        work = work[:args.limit]
+    logger.info(f"{len(work)} plans to generate ({len(buckets) * args.variants - len(work)} already stored)")
+
+    limiter = RateLimiter(args.rpm)
+    done = failed = 0
+    start = time.monotonic()
+
+    def run(key, data, nutrition):
+        plan = generate_with_backoff(build_meal_plan_prompt(data, nutrition), limiter, args.max_retries)
+        cache.add(key, plan)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(run, *item) for item in work]
+        try:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Plan generation failed: {str(e)}")
+                finished = done + failed
+                if finished % 10 == 0 or finished == len(work):
+                    elapsed = time.monotonic() - start
+                    rate = finished / elapsed if elapsed else 0
+                    eta = (len(work) - finished) / rate if rate else 0
+                    logger.info(f"{finished}/{len(work)} ({failed} failed), {rate * 60:.1f}/min, ETA {eta / 60:.1f} min")
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; stored plans are kept and will be skipped on the next run")
+            for future in futures:
+                future.cancel()
+            raise
+
+    logger.info(f"Done: {done} generated, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
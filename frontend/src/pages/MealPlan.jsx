@@ -91,31 +91,59 @@ export default function MealPlan() {
         fat: formData.fat
       };
   
-      const res = await axios.post(
-        "http://localhost:5050/generate-meal-plan",
-        requestData
-      );
-      
-      if (res.data?.error) {
-        console.error("Backend error:", res.data.error);
-        console.log("Debug info:", res.data.debug_info);
-        toast.error(res.data.error);
+      // Sections arrive as server-sent events as soon as each one is generated
+      const res = await fetch("http://localhost:5050/generate-meal-plan/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(requestData)
+      });
+
+      if (!res.ok || !res.body) {
+        const errorData = await res.json().catch(() => ({}));
+        toast.error(errorData.error || "Failed to generate meal plan");
         return;
       }
-  
-      if (res.data?.plan) {
-        setPlan(res.data.plan);
-        setRequirements(res.data.nutrition_requirements);
-        toast.success("Meal plan generated successfully!");
-      } else {
-        throw new Error("Invalid response format");
+
+      setPlan({});
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const eventLine = raw.split("\n").find(line => line.startsWith("event:"));
+          const dataLine = raw.split("\n").find(line => line.startsWith("data:"));
+          if (!eventLine || !dataLine) continue;
+          const event = eventLine.slice(6).trim();
+          const data = JSON.parse(dataLine.slice(5));
+
+          if (event === "requirements") {
+            setRequirements(data);
+          } else if (event === "meal") {
+            setPlan(prev => ({ ...prev, [data.meal]: data.items }));
+          } else if (event === "summary") {
+            setPlan(prev => ({ ...prev, nutrition_summary: data }));
+          } else if (event === "done") {
+            setPlan(data.plan);
+            toast.success("Meal plan generated successfully!");
+          } else if (event === "error") {
+            console.error("Backend error:", data);
+            toast.error(data.error);
+          }
+        }
       }
     } catch (error) {
       console.error("Error:", {
         message: error.message,
         response: error.response?.data
       });
-      toast.error(error.response?.data?.error || "Failed to generate meal plan");
+      toast.error(error.message || "Failed to generate meal plan");
     } finally {
       setLoading(false);
     }